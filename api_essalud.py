@@ -0,0 +1,145 @@
+"""
+Cálculo masivo de ESSALUD por HTTP, sin pasar por Excel.
+
+Los registros llegan como CSV, NDJSON (un objeto JSON por línea) o un arreglo
+JSON y se responden en el mismo formato. CSV y NDJSON se leen por bloques a
+medida que llega el cuerpo de la solicitud y cada bloque se responde apenas se
+calcula, así que decenas de miles de filas pasan en una sola llamada sin
+cargarlas completas en memoria. Las reglas son las de reglas_essalud.
+
+Un error en el primer bloque se responde con un código de error. Si falla un
+bloque posterior la respuesta ya empezó (código 200): se cierra con un registro
+de error ({"error": ..., "registro": N} en JSON y NDJSON, una línea #ERROR en
+CSV) y no se envían más filas, así que el cliente debe revisar el final.
+"""
+import os
+import json
+import logging
+import pandas as pd
+from metricas import medir_etapa
+from reglas_essalud import procesar_archivo_essalud, COLUMNAS_REQUERIDAS, COLUMNAS_CALCULADAS
+
+logger = logging.getLogger(__name__)
+
+# Filas que se calculan y se envían juntas
+FILAS_POR_BLOQUE = int(os.environ.get('FILAS_POR_BLOQUE_API', 5000))
+
+TIPOS_FORMATO = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json': 'json'
+}
+
+# mimetype de la respuesta (Flask agrega charset=utf-8 a los tipos text/*)
+TIPOS_RESPUESTA = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+COLUMNAS_FECHA = ['fecha_ingreso', 'fecha_cese']
+
+# Inicio de la línea con la que termina una respuesta CSV cortada por un error
+MARCA_ERROR_CSV = '#ERROR'
+
+
+def formato_de(content_type):
+    """Formato ('csv', 'ndjson' o 'json') según el Content-Type, o None si no se admite"""
+    tipo = (content_type or '').split(';')[0].strip().lower()
+    return TIPOS_FORMATO.get(tipo)
+
+
+def leer_bloques(stream, formato, filas_por_bloque=None):
+    """Lee los registros del cuerpo de la solicitud y los entrega en DataFrames de hasta `filas_por_bloque` filas"""
+    filas_por_bloque = filas_por_bloque or FILAS_POR_BLOQUE
+
+    if formato == 'csv':
+        # Las fechas se leen como texto para aplicarles el mismo formato DD/MM/YYYY que al Excel
+        yield from pd.read_csv(stream, chunksize=filas_por_bloque, encoding='utf-8',
+                               dtype={columna: str for columna in COLUMNAS_FECHA})
+    elif formato == 'ndjson':
+        yield from pd.read_json(stream, lines=True, chunksize=filas_por_bloque, dtype=False, convert_dates=False)
+    else:
+        # Un arreglo JSON no se puede leer por partes: se carga y se divide en bloques
+        datos = json.load(stream)
+        if isinstance(datos, dict):
+            datos = datos.get('registros', [])
+        if not isinstance(datos, list):
+            raise ValueError('Se esperaba un arreglo de registros')
+        for inicio in range(0, len(datos), filas_por_bloque):
+            yield pd.DataFrame.from_records(datos[inicio:inicio + filas_por_bloque])
+
+
+def validar_columnas(df):
+    """Lanza ValueError si al bloque le faltan columnas requeridas"""
+    faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
+    if faltantes:
+        raise ValueError(f"Columnas faltantes: {', '.join(faltantes)}")
+
+
+def calcular_bloque(df, variante='tambo', solo_calculadas=False, periodo=None):
+    """Aplica las reglas de ESSALUD a un bloque y deja las fechas en DD/MM/YYYY para responder"""
+    validar_columnas(df)
+    with medir_etapa('calculo_essalud'):
+        resultado, error = procesar_archivo_essalud(df, variante=variante, periodo=periodo)
+    if resultado is None:
+        raise ValueError(error)
+
+    if solo_calculadas:
+        return resultado[COLUMNAS_CALCULADAS]
+    for columna in COLUMNAS_FECHA:
+        resultado[columna] = resultado[columna].dt.strftime('%d/%m/%Y')
+    return resultado
+
+
+def escribir_bloque(df, formato, primero):
+    """Serializa un bloque calculado; `primero` indica si es el inicio de la respuesta"""
+    if formato == 'csv':
+        return df.to_csv(index=False, header=primero, lineterminator='\n')
+    if formato == 'ndjson':
+        return df.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n') + '\n'
+    # Arreglo JSON: cada bloque aporta sus registros sin los corchetes
+    registros = df.to_json(orient='records', force_ascii=False)[1:-1]
+    return ('' if primero else ',') + registros
+
+
+def escribir_error(mensaje, registro, formato):
+    """Registro con el que se cierra una respuesta ya iniciada cuando falla un bloque posterior"""
+    if formato == 'csv':
+        return f"{MARCA_ERROR_CSV} registro {registro}: {' '.join(mensaje.split())}\n"
+    error = json.dumps({'error': mensaje, 'registro': registro}, ensure_ascii=False)
+    return error + '\n' if formato == 'ndjson' else ',' + error
+
+
+def generar_respuesta(bloques, formato, variante='tambo', solo_calculadas=False, periodo=None):
+    """
+    Calcula y serializa los bloques uno a uno. El primer bloque se calcula antes
+    de devolver el generador, así un error de formato o de columnas se puede
+    responder con un código de error en lugar de cortar la respuesta a medias;
+    un error posterior cierra la respuesta con escribir_error.
+    """
+    bloques = iter(bloques)
+    primero = next((bloque for bloque in bloques if not bloque.empty), None)
+    if primero is None:
+        raise ValueError('No se recibieron registros')
+    primer_resultado = calcular_bloque(primero, variante, solo_calculadas, periodo)
+
+    def partes():
+        if formato == 'json':
+            yield '['
+        yield escribir_bloque(primer_resultado, formato, True)
+        # Número (desde 1) del primer registro del bloque siguiente
+        registro = len(primer_resultado) + 1
+        try:
+            for bloque in bloques:
+                if not bloque.empty:
+                    yield escribir_bloque(calcular_bloque(bloque, variante, solo_calculadas, periodo), formato, False)
+                    registro += len(bloque)
+        except ValueError as e:
+            logger.warning(f"Respuesta de la API cortada en el registro {registro}: {e}")
+            yield escribir_error(str(e), registro, formato)
+        if formato == 'json':
+            yield ']'
+
+    return partes()
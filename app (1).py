@@ -1,35 +1,620 @@
 import os
+import time
 import logging
 import uuid
-import tempfile
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, session
+import hashlib
+import hmac
+import unicodedata
+import threading
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, send_file, session, Response, stream_with_context, jsonify, g, abort
 import pandas as pd
 import io
+from functools import partial
+from urllib.parse import quote
+from collections import OrderedDict
 from werkzeug.utils import secure_filename
 from calculadora import calcular_horas_excel
 from horarios_flexibles import calcular_horas_excel_flexibles
-from pdf_protector import procesar_pdf_batch, proteger_pdf
-from boletas_pago import procesar_boletas_excel, numero_a_letras
+from motor_horas import calcular_horas_vectorizado
+from lector_excel import leer_excel
+from boletas_pago import procesar_boletas_excel
 from certificados_utilidades import procesar_certificados_batch
+from protector_paralelo import procesar_pdf_paralelo, generar_zip
+from cifrado_pdf import contraseña_empleado, cifrar_pdf, validar_contraseñas
+from boletas_pdf import generar_boleta_pdf
+from preparacion_boletas import preparar_boletas, registros, resumenes
+from generacion_diferida import crear_artefacto_diferido, es_artefacto_diferido, obtener_contenido, precargar
+from cargas import guardar_carga, flujo_carga, abrir_carga, liberar_carga, huella_cargas, MB
+from metricas import medir_etapa, exponer_metricas, registrar_almacen, registrar_expulsion, LATENCIA_RUTAS, TAMAÑO_CARGAS
+from calentamiento import calentar
+from resultados_paginados import registrar_conjunto, obtener_conjunto, paginar, pagina_publica
+from api_essalud import formato_de, leer_bloques, generar_respuesta, TIPOS_RESPUESTA
+from reglas_essalud import VARIANTES_REGLAS
+from cola_trabajos import (
+    encolar, registrar_resultado, obtener_trabajo, obtener_resultado, reservar_servidor, RUTA_BD_TRABAJOS,
+    ESTADO_PENDIENTE, ESTADO_EN_PROCESO, ESTADO_COMPLETADO, ESTADO_ERROR
+)
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
+# Configurar logging (NIVEL_LOG=DEBUG para depurar; en producción el detalle por archivo cuesta rendimiento)
+logging.basicConfig(level=os.environ.get('NIVEL_LOG', 'INFO').upper())
+logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "clave_secreta_calculadora_horas")
+class SolicitudCargaEnDisco(Request):
+    """Solicitud que recibe en disco las cargas que superan UMBRAL_CARGA_DISCO, en archivos que guardar_carga conserva sin copiarlos"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return flujo_carga(total_content_length)
+
+# Configuración por entorno (variable ENTORNO); crear_app aplica la que corresponda
+CONFIGURACIONES = {
+    'desarrollo': {
+        'DEBUG': True,
+        'TEMPLATES_AUTO_RELOAD': True,
+        'CALENTAR': False
+    },
+    'produccion': {
+        'DEBUG': False,
+        'TEMPLATES_AUTO_RELOAD': False,
+        'SESSION_COOKIE_HTTPONLY': True,
+        'SESSION_COOKIE_SAMESITE': 'Lax',
+        'SEND_FILE_MAX_AGE_DEFAULT': 12 * 3600,
+        'CALENTAR': True
+    }
+}
 
 # Configurar las extensiones permitidas para archivos Excel y PDF
 EXTENSIONES_EXCEL_PERMITIDAS = {'xlsx', 'xls'}
 EXTENSIONES_PDF_PERMITIDAS = {'pdf'}
 
-# Almacenamiento temporal para PDFs procesados
-PDF_PROCESADOS = {}
+# Tamaño máximo de carga (MB) por ruta
+LIMITES_CARGA_MB = {
+    'index': float(os.environ.get('LIMITE_CARGA_HORAS_MB', 50)),
+    'proteger_pdf': float(os.environ.get('LIMITE_CARGA_PDF_MB', 200)),
+    'boletas_pago': float(os.environ.get('LIMITE_CARGA_BOLETAS_MB', 20)),
+    'certificados_utilidades': float(os.environ.get('LIMITE_CARGA_CERTIFICADOS_MB', 20)),
+    'api_essalud': float(os.environ.get('LIMITE_CARGA_API_MB', 50))
+}
+
+# Rutas que responden JSON en lugar de páginas (sus errores no redirigen)
+RUTAS_API = {'api_essalud'}
+
+# Acceso a /metrics: con TOKEN_METRICAS se exige "Authorization: Bearer <token>";
+# sin token solo responde si METRICAS_PUBLICAS=1 (p. ej. en una red interna)
+TOKEN_METRICAS = os.environ.get('TOKEN_METRICAS')
+METRICAS_PUBLICAS = os.environ.get('METRICAS_PUBLICAS') == '1'
+
+# Motor para el cálculo de horas: 'vectorizado' (motor_horas, por defecto) o 'clasico'
+# (calculadora / horarios_flexibles). Si el vectorizado falla o no puede leer el libro, la
+# carga se calcula con el clásico; MOTOR_HORAS=clasico lo usa siempre (por ejemplo si
+# benchmarks/benchmark_motor_horas.py --excel muestra diferencias con libros reales)
+MOTOR_HORAS = os.environ.get('MOTOR_HORAS', 'vectorizado')
+
+# Almacenamiento temporal para PDFs procesados (ID -> (último uso, artefacto)), del uso más
+# antiguo al más reciente; se accede con guardar_pdf y obtener_pdf
+PDF_PROCESADOS = OrderedDict()
+LOCK_PDF = threading.Lock()
+
+# Los PDFs sin descargar ni reutilizar durante DURACION_PDF segundos se descartan, y también
+# los de uso más antiguo cuando hay más de MAX_PDF_PROCESADOS
+DURACION_PDF = int(os.environ.get('DURACION_PDF', 24 * 3600))
+MAX_PDF_PROCESADOS = int(os.environ.get('MAX_PDF_PROCESADOS', 50000))
+
+# ETag (SHA-256 del contenido) de cada PDF ya descargado, por ID (se descarta con el PDF)
+ETAGS_PDF = {}
+
+# Cache-Control de las descargas de PDF: son datos personales, por defecto solo los guarda el navegador
+CACHE_CONTROL_PDF = os.environ.get('CACHE_CONTROL_PDF', 'private, max-age=3600')
+
+# Lotes de PDFs protegidos para la descarga conjunta en ZIP (lote -> [(nombre, id)])
+LOTES_PDF = {}
+
+# Resultados ya procesados, por huella del archivo subido y de las opciones del formulario
+RESULTADOS_POR_HUELLA = OrderedDict()
+LOCK_RESULTADOS = threading.Lock()
+MAX_RESULTADOS_POR_HUELLA = int(os.environ.get('MAX_RESULTADOS_POR_HUELLA', 200))
+
+# Trabajos en segundo plano por huella, para no encolar dos veces la misma carga
+# (mismo límite y política que RESULTADOS_POR_HUELLA)
+TRABAJOS_POR_HUELLA = OrderedDict()
+
+# Vistas que crear_app registra en cada aplicación: (regla, vista, opciones de add_url_rule)
+RUTAS = []
+
+def ruta(regla, **opciones):
+    """Como app.route, pero la vista se registra al crear la aplicación (el endpoint es el nombre de la función)"""
+    def registrar(vista):
+        RUTAS.append((regla, vista, opciones))
+        return vista
+    return registrar
+
+def tamaño_artefacto(data):
+    """Bytes ocupados por un artefacto ya generado (0 si todavía no se generó)"""
+    if isinstance(data, dict) and 'pdf_data' in data:
+        data = data['pdf_data']
+    if isinstance(data, io.BytesIO):
+        try:
+            return data.getbuffer().nbytes
+        except ValueError:
+            return 0
+    if es_artefacto_diferido(data) and data['contenido'] is not None:
+        return len(data['contenido'])
+    return 0
+
+def _expulsar_pdfs():
+    """Descarta los PDFs vencidos o que exceden MAX_PDF_PROCESADOS (con LOCK_PDF tomado)"""
+    limite = time.time() - DURACION_PDF
+    while PDF_PROCESADOS and (len(PDF_PROCESADOS) > MAX_PDF_PROCESADOS or next(iter(PDF_PROCESADOS.values()))[0] < limite):
+        file_id, _ = PDF_PROCESADOS.popitem(last=False)
+        ETAGS_PDF.pop(file_id, None)
+        registrar_expulsion('pdf')
+
+def guardar_pdf(file_id, data):
+    with LOCK_PDF:
+        PDF_PROCESADOS[file_id] = (time.time(), data)
+        _expulsar_pdfs()
+
+def obtener_pdf(file_id):
+    """Artefacto guardado con el ID, o None si no existe o ya se descartó; cuenta como uso"""
+    with LOCK_PDF:
+        _expulsar_pdfs()
+        entrada = PDF_PROCESADOS.get(file_id)
+        if entrada is None:
+            return None
+        PDF_PROCESADOS[file_id] = (time.time(), entrada[1])
+        PDF_PROCESADOS.move_to_end(file_id)
+        return entrada[1]
+
+def medir_almacen_pdf():
+    with LOCK_PDF:
+        artefactos = [data for _, data in PDF_PROCESADOS.values()]
+    return {'pdf': (len(artefactos), sum(tamaño_artefacto(data) for data in artefactos))}
+
+registrar_almacen(medir_almacen_pdf)
+
+def iniciar_medicion():
+    g.inicio_solicitud = time.perf_counter()
+    if request.method == 'POST' and request.content_length and request.endpoint in LIMITES_CARGA_MB:
+        TAMAÑO_CARGAS.observar(request.endpoint, request.content_length)
+
+def medir_respuesta_en_flujo(response):
+    # Las respuestas en flujo se miden cuando el servidor termina de enviar el cuerpo
+    if response.is_streamed and 'inicio_solicitud' in g:
+        ruta, inicio = request.endpoint or 'desconocida', g.pop('inicio_solicitud')
+        response.call_on_close(lambda: LATENCIA_RUTAS.observar(ruta, time.perf_counter() - inicio))
+    return response
+
+def registrar_latencia(error=None):
+    # Se ejecuta también cuando la vista lanza una excepción (after_request no)
+    if 'inicio_solicitud' in g:
+        LATENCIA_RUTAS.observar(request.endpoint or 'desconocida', time.perf_counter() - g.pop('inicio_solicitud'))
+
+def validar_tamaño_carga():
+    # Rechazar la carga antes de leer el cuerpo si supera el límite de la ruta
+    limite = LIMITES_CARGA_MB.get(request.endpoint)
+    if limite and request.method == 'POST' and (request.content_length or 0) > limite * MB:
+        if request.endpoint in RUTAS_API:
+            return jsonify({'error': f'El cuerpo supera el tamaño máximo permitido ({limite:g} MB)'}), 413
+        flash(f'El archivo supera el tamaño máximo permitido ({limite:g} MB)', 'danger')
+        return redirect(request.url)
 
 def extension_permitida(filename, extensiones):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in extensiones
 
-@app.route('/', methods=['GET', 'POST'])
+def es_columna_dni(columna):
+    return 'dni' in str(columna).lower()
+
+def dni_empleado_certificado(fila):
+    """Obtiene el DNI de la fila del empleado, si la hoja tiene una columna de DNI"""
+    for col in fila.index:
+        if es_columna_dni(col) and pd.notna(fila[col]):
+            return fila[col]
+    return None
+
+def generar_certificado(contenido, contraseña=None):
+    """Devuelve los bytes del certificado ya renderizado, cifrado si se indica una contraseña"""
+    if contraseña:
+        with medir_etapa('cifrado_pdf'):
+            contenido = cifrar_pdf(contenido, contraseña)
+    return contenido
+
+def generar_boleta(datos, contraseña=None):
+    """
+    Genera la boleta de pago de un empleado y devuelve los bytes del PDF, cifrado
+    si se indica una contraseña (con el mismo AES-256 que los certificados)
+    """
+    with medir_etapa('render_pdf'):
+        contenido = generar_boleta_pdf(datos).getvalue()
+    if contraseña:
+        with medir_etapa('cifrado_pdf'):
+            contenido = cifrar_pdf(contenido, contraseña)
+    return contenido
+
+def procesar_horas(carga, nombre_hoja, columnas, usar_horarios_flexibles, progreso=None):
+    """
+    Calcula las horas trabajadas del Excel y devuelve el reporte listo para descargar.
+    `columnas` contiene col_inicio, col_fin, col_refrigerio_inicio y col_refrigerio_fin.
+    """
+    # Procesar el archivo con la función de cálculo según el motor y el modo seleccionados
+    try:
+        df_resultado = None
+        if MOTOR_HORAS == 'vectorizado':
+            logger.debug(f"Usando motor de horas vectorizado (flexible={usar_horarios_flexibles})")
+            try:
+                df_resultado, mensaje = calcular_horas_vectorizado(
+                    abrir_carga(carga), nombre_hoja=nombre_hoja, flexible=usar_horarios_flexibles, **columnas
+                )
+            except Exception as e:
+                mensaje = str(e)
+            if df_resultado is None:
+                # El motor clásico vuelve a leer el libro y da su propio mensaje si tampoco puede
+                logger.warning(f"Motor de horas vectorizado sin resultado, se usa el clásico: {mensaje}")
+        
+        if df_resultado is None and usar_horarios_flexibles:
+            logger.debug("Usando cálculo de horarios flexibles")
+            with medir_etapa('calculo_horas'):
+                df_resultado, mensaje = calcular_horas_excel_flexibles(abrir_carga(carga), nombre_hoja=nombre_hoja, **columnas)
+        elif df_resultado is None:
+            logger.debug("Usando cálculo de horarios normal")
+            with medir_etapa('calculo_horas'):
+                df_resultado, mensaje = calcular_horas_excel(abrir_carga(carga), nombre_hoja=nombre_hoja, **columnas)
+    finally:
+        liberar_carga(carga)
+    
+    if df_resultado is None:
+        raise ValueError(mensaje)
+    
+    # Guardar el DataFrame en un buffer de bytes para descargarlo
+    output = io.BytesIO()
+    with medir_etapa('escritura_excel'), pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df_resultado.to_excel(writer, index=False, sheet_name='Reporte')
+    
+    if progreso is not None:
+        progreso(1, 1)
+    
+    return {
+        'contenido': output.getvalue(),
+        'nombre_archivo': 'reporte_horas_calculadas.xlsx'
+    }
+
+def procesar_proteccion_pdf(archivos_para_procesar, usar_nombre_archivo, contraseña_manual, progreso=None):
+    """Protege los PDFs y los deja disponibles para descarga individual y en ZIP"""
+    resultados = {}
+    lote_id = None
+    
+    # Proteger PDFs repartiendo el cifrado entre varios procesos
+    try:
+        with medir_etapa('cifrado_pdf'):
+            resultados_procesamiento = procesar_pdf_paralelo(
+                archivos_para_procesar,
+                usar_nombre_archivo=usar_nombre_archivo,
+                contraseña_manual=contraseña_manual,
+                progreso=(lambda nombre, completados, total, exito: progreso(completados, total)) if progreso else None
+            )
+    finally:
+        for _, carga in archivos_para_procesar:
+            liberar_carga(carga)
+    
+    # Preparar resultados para la vista
+    lote = []
+    for nombre, (pdf_data, mensaje_o_contraseña) in resultados_procesamiento.items():
+        if pdf_data is not None:
+            # Éxito - guardar en memoria y generar ID único
+            file_id = str(uuid.uuid4())
+            guardar_pdf(file_id, pdf_data)
+            lote.append((nombre, file_id))
+            resultados[nombre] = {
+                'exito': True,
+                'contraseña': mensaje_o_contraseña,
+                'id': file_id
+            }
+        else:
+            # Error
+            resultados[nombre] = {
+                'exito': False,
+                'mensaje': mensaje_o_contraseña,
+                'contraseña': None
+            }
+    
+    if lote:
+        lote_id = str(uuid.uuid4())
+        LOTES_PDF[lote_id] = lote
+    
+    return {'resultados': resultados, 'lote_id': lote_id}
+
+def procesar_boletas(carga, nombre_hoja, proteger_con_dni, progreso=None):
+    """Lee las boletas del Excel y registra los datos para generar cada PDF al descargarlo"""
+    try:
+        with medir_etapa('lectura_excel'):
+            empleados, mensaje = procesar_boletas_excel(abrir_carga(carga), hoja=nombre_hoja)
+    finally:
+        liberar_carga(carga)
+    
+    if empleados is None:
+        raise ValueError(mensaje)
+    
+    # Neto, neto en letras, totales y periodo se normalizan una vez para toda la carga
+    with medir_etapa('preparacion_boletas'):
+        tabla = preparar_boletas(empleados)
+    
+    filas = registros(tabla)
+    
+    # Con la protección activada, una boleta sin DNI saldría sin cifrar: se rechaza la carga
+    if proteger_con_dni:
+        contraseñas = [contraseña_empleado(fila['dni']) for fila in filas]
+        validar_contraseñas([fila['nombre'] for fila in filas], contraseñas, 'las boletas')
+    else:
+        contraseñas = [None] * len(filas)
+    
+    boletas_generadas = {}
+    total = len(empleados)
+    
+    filas = zip(empleados.values(), filas, resumenes(tabla), contraseñas)
+    for completados, (datos, fila, resumen, contraseña) in enumerate(filas, start=1):
+        # Generar un ID único para la boleta
+        boleta_id = str(uuid.uuid4())
+        
+        # Guardar datos para mostrar en la plantilla de resultados
+        boletas_generadas[fila['nombre']] = {
+            'id': boleta_id,
+            'dni': fila['dni'],
+            'periodo': fila['periodo'],
+            'neto_pagar': fila['neto_pagar'],
+            'neto_pagar_letras': fila['neto_pagar_letras'],
+            'contraseña': contraseña
+        }
+        
+        # La boleta se renderiza en la primera descarga y queda en caché para las siguientes
+        guardar_pdf(boleta_id, crear_artefacto_diferido(
+            partial(generar_boleta, {**datos, 'resumen': resumen}, contraseña),
+            f"BOLETA_{fila['dni']}_{fila['periodo_archivo']}.pdf",
+            tipo='boleta'
+        ))
+        
+        if progreso is not None:
+            progreso(completados, total)
+    
+    # Periodo de la carga (el de la primera boleta), como texto
+    periodo = str(tabla['periodo'].iloc[0]) if total else ''
+    
+    return {'boletas': boletas_generadas, 'periodo': periodo}
+
+def procesar_certificados(carga, nombre_hoja, proteger_con_dni, progreso=None):
+    """
+    Genera los certificados de la carga con una sola llamada a
+    procesar_certificados_batch, dentro de la solicitud (el módulo no genera
+    certificados sueltos), y registra cada uno para cifrarlo al descargarlo.
+    Los PDFs sin cifrar quedan en memoria hasta entonces.
+    """
+    certificados_generados = {}
+    
+    try:
+        with medir_etapa('render_pdf'):
+            certificados, mensaje = procesar_certificados_batch(abrir_carga(carga), hoja=nombre_hoja)
+        if not certificados:
+            raise ValueError(mensaje or f'La hoja {nombre_hoja} no contiene empleados')
+        
+        # Los DNI salen de la misma hoja (solo se leen sus columnas de DNI); el módulo
+        # genera un certificado por fila, en orden. Una fila sin DNI no se puede asociar
+        with medir_etapa('lectura_excel'):
+            df_empleados = leer_excel(abrir_carga(carga), hoja=nombre_hoja, columnas=es_columna_dni).dropna(how='all')
+    finally:
+        liberar_carga(carga)
+    
+    if proteger_con_dni and df_empleados.columns.empty:
+        raise ValueError(f'La hoja {nombre_hoja} no tiene una columna de DNI para proteger los certificados')
+    if len(df_empleados) == len(certificados):
+        dnis = [contraseña_empleado(dni_empleado_certificado(fila)) for _, fila in df_empleados.iterrows()]
+    elif proteger_con_dni:
+        raise ValueError(
+            f'No se pudo asociar cada certificado con el DNI de su fila en la hoja {nombre_hoja}: '
+            f'hay {len(certificados)} certificados y {len(df_empleados)} filas con DNI'
+        )
+    else:
+        dnis = [None] * len(certificados)
+    
+    # Con la protección activada, un certificado sin DNI saldría sin cifrar: se rechaza la carga
+    if proteger_con_dni:
+        validar_contraseñas(list(certificados), dnis, 'los certificados')
+    
+    artefactos = []
+    total = len(certificados)
+    for posicion, ((nombre_empleado, pdf_data), dni) in enumerate(zip(certificados.items(), dnis), start=1):
+        nombre_archivo = f"Certificado_Liquidacion_{nombre_empleado}.pdf"
+        contraseña = dni if proteger_con_dni else None
+        
+        # Generar ID único para acceder al PDF
+        certificado_id = str(uuid.uuid4())
+        
+        # El PDF ya está renderizado; el cifrado se aplica en la primera descarga
+        artefacto = crear_artefacto_diferido(
+            partial(generar_certificado, pdf_data.getvalue(), contraseña),
+            nombre_archivo
+        )
+        guardar_pdf(certificado_id, artefacto)
+        artefactos.append(artefacto)
+        
+        # Guardar datos para mostrar en la plantilla
+        certificados_generados[nombre_empleado] = {
+            'id': certificado_id,
+            'nombre': nombre_empleado.replace('_', ' '),
+            'nombre_archivo': nombre_archivo,
+            'dni': dni,
+            'contraseña': contraseña
+        }
+        
+        if progreso is not None:
+            progreso(posicion, total)
+    
+    # Adelantar en segundo plano el cifrado de los primeros certificados de la lista
+    precargar(artefactos)
+    mensaje = f"Se prepararon {len(certificados_generados)} certificados"
+    
+    return {'certificados': certificados_generados, 'mensaje': mensaje}
+
+def en_segundo_plano():
+    """Indica si el formulario pidió procesar el archivo como trabajo en segundo plano"""
+    return 'en_segundo_plano' in request.form
+
+def respuesta_trabajo(trabajo_id):
+    """Respuesta inmediata al encolar un trabajo, con las URLs para seguirlo"""
+    return jsonify({
+        'id': trabajo_id,
+        'estado': url_for('estado_trabajo', trabajo_id=trabajo_id),
+        'resultado': url_for('resultado_trabajo', trabajo_id=trabajo_id)
+    }), 202
+
+def descargar_reporte_horas(resultado):
+    return send_file(
+        io.BytesIO(resultado['contenido']),
+        as_attachment=True,
+        download_name=resultado['nombre_archivo'],
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+def mostrar_proteccion_pdf(resultado):
+    resultados = resultado['resultados']
+    if all(not info['exito'] for info in resultados.values()):
+        flash('No se pudo proteger ningún archivo. Verifica el formato de los nombres.', 'danger')
+    return render_template('pdf_protector.html', resultados=resultados, lote_id=resultado['lote_id'])
+
+def pagina_resultados(resultado, clave, pagina=None):
+    """
+    Página de resultado[clave] que se muestra: la indicada o la que piden los
+    parámetros pagina, q y por_pagina (la primera al terminar de procesar).
+    Incluye las URLs de la página anterior y siguiente con la misma búsqueda.
+    """
+    if pagina is None:
+        conjunto_id = registrar_conjunto(resultado, clave)
+        pagina = paginar(
+            obtener_conjunto(conjunto_id),
+            request.args.get('q', ''),
+            request.args.get('pagina', 1, type=int),
+            request.args.get('por_pagina', type=int)
+        )
+    else:
+        conjunto_id = resultado['conjunto_id']
+    
+    def url_pagina(numero):
+        return url_for('resultados_paginados', conjunto_id=conjunto_id, pagina=numero,
+                       q=pagina['consulta'] or None, por_pagina=pagina['por_pagina'])
+    
+    return dict(
+        pagina,
+        conjunto_id=conjunto_id,
+        url_busqueda=url_for('resultados_paginados', conjunto_id=conjunto_id),
+        anterior=url_pagina(pagina['pagina'] - 1) if pagina['pagina'] > 1 else None,
+        siguiente=url_pagina(pagina['pagina'] + 1) if pagina['pagina'] < pagina['paginas'] else None
+    )
+
+def mostrar_boletas(resultado, pagina=None):
+    paginacion = pagina_resultados(resultado, 'boletas', pagina)
+    return render_template(
+        'boletas_resultado.html', 
+        boletas=paginacion['filas'],
+        periodo=resultado['periodo'],
+        paginacion=paginacion
+    )
+
+def mostrar_certificados(resultado, pagina=None):
+    paginacion = pagina_resultados(resultado, 'certificados', pagina)
+    return render_template(
+        'certificados_resultado.html', 
+        certificados=paginacion['filas'],
+        mensaje=resultado['mensaje'],
+        paginacion=paginacion
+    )
+
+# Vista de cada tipo de conjunto de resultados paginado
+VISTAS_CONJUNTO = {
+    'boletas': mostrar_boletas,
+    'certificados': mostrar_certificados
+}
+
+# Vista que muestra el resultado de cada tipo de trabajo y página a la que se vuelve si falla
+VISTAS_TRABAJO = {
+    'horas': (descargar_reporte_horas, 'index'),
+    'protector_pdf': (mostrar_proteccion_pdf, 'proteger_pdf'),
+    'boletas': (mostrar_boletas, 'boletas_pago'),
+    'certificados': (mostrar_certificados, 'certificados_utilidades')
+}
+
+def recordar_resultado(huella, resultado):
+    with LOCK_RESULTADOS:
+        RESULTADOS_POR_HUELLA[huella] = resultado
+        RESULTADOS_POR_HUELLA.move_to_end(huella)
+        while len(RESULTADOS_POR_HUELLA) > MAX_RESULTADOS_POR_HUELLA:
+            RESULTADOS_POR_HUELLA.popitem(last=False)
+            registrar_expulsion('resultados')
+
+def procesar_y_recordar(huella, funcion, *args, progreso=None):
+    """Ejecuta el procesamiento y guarda el resultado para reutilizarlo si se repite la carga"""
+    resultado = funcion(*args, progreso=progreso)
+    recordar_resultado(huella, resultado)
+    return resultado
+
+def ids_artefactos(resultado):
+    """IDs de PDF_PROCESADOS que usa un resultado (boletas, certificados o PDFs protegidos)"""
+    for clave in ('boletas', 'certificados', 'resultados'):
+        for info in resultado.get(clave, {}).values():
+            if info.get('id'):
+                yield info['id']
+
+def resultado_reutilizable(huella):
+    """
+    Devuelve el resultado previo de la misma carga si todos sus artefactos siguen
+    disponibles (y los marca como usados, para que no venzan enseguida)
+    """
+    with LOCK_RESULTADOS:
+        resultado = RESULTADOS_POR_HUELLA.get(huella)
+        if resultado is None:
+            return None
+        if not all(obtener_pdf(artefacto_id) is not None for artefacto_id in ids_artefactos(resultado)):
+            del RESULTADOS_POR_HUELLA[huella]
+            return None
+        RESULTADOS_POR_HUELLA.move_to_end(huella)
+        return resultado
+
+def procesar_o_reutilizar(tipo, cargas, opciones, funcion, *args):
+    """
+    Procesa la carga en línea o en segundo plano según el formulario. Si ya se
+    procesó el mismo contenido con las mismas opciones, se reutilizan el resultado
+    y los IDs de sus artefactos en lugar de volver a calcularlos.
+    """
+    vista, _ = VISTAS_TRABAJO[tipo]
+    huella = huella_cargas(cargas, dict(opciones, tipo=tipo))
+    
+    resultado = resultado_reutilizable(huella)
+    if resultado is not None:
+        logger.debug(f"Reutilizando el resultado de {tipo} con huella {huella[:12]}")
+        for carga in cargas:
+            liberar_carga(carga)
+        if en_segundo_plano():
+            return respuesta_trabajo(registrar_resultado(tipo, resultado))
+        return vista(resultado)
+    
+    if en_segundo_plano():
+        # Si la misma carga ya está en cola, se devuelve ese trabajo
+        with LOCK_RESULTADOS:
+            trabajo_id = TRABAJOS_POR_HUELLA.get(huella)
+        trabajo = obtener_trabajo(trabajo_id) if trabajo_id else None
+        if trabajo is not None and trabajo['estado'] in (ESTADO_PENDIENTE, ESTADO_EN_PROCESO):
+            for carga in cargas:
+                liberar_carga(carga)
+            return respuesta_trabajo(trabajo_id)
+        
+        trabajo_id = encolar(tipo, procesar_y_recordar, huella, funcion, *args)
+        with LOCK_RESULTADOS:
+            TRABAJOS_POR_HUELLA[huella] = trabajo_id
+            TRABAJOS_POR_HUELLA.move_to_end(huella)
+            while len(TRABAJOS_POR_HUELLA) > MAX_RESULTADOS_POR_HUELLA:
+                TRABAJOS_POR_HUELLA.popitem(last=False)
+        return respuesta_trabajo(trabajo_id)
+    
+    return vista(procesar_y_recordar(huella, funcion, *args))
+
+
+@ruta('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
         # Verificar si se recibió el archivo
@@ -54,70 +639,39 @@ def index():
             nombre_hoja = request.form.get('nombre_hoja', 'Horas')
             
             # Obtener las columnas personalizadas si se especificaron
-            columna_inicio = request.form.get('columna_inicio', 'Hora Inicio')
-            columna_fin = request.form.get('columna_fin', 'Hora Fin')
-            columna_refrigerio_inicio = request.form.get('columna_refrigerio_inicio', 'Hora Refrigerio Inicio')
-            columna_refrigerio_fin = request.form.get('columna_refrigerio_fin', 'Hora Refrigerio Fin')
+            columnas = {
+                'col_inicio': request.form.get('columna_inicio', 'Hora Inicio'),
+                'col_fin': request.form.get('columna_fin', 'Hora Fin'),
+                'col_refrigerio_inicio': request.form.get('columna_refrigerio_inicio', 'Hora Refrigerio Inicio'),
+                'col_refrigerio_fin': request.form.get('columna_refrigerio_fin', 'Hora Refrigerio Fin')
+            }
             
             # Verificar si se seleccionó el modo horarios flexibles
             usar_horarios_flexibles = 'usar_horarios_flexibles' in request.form
             
-            # Leer el archivo
-            bytes_data = io.BytesIO()
-            archivo.save(bytes_data)
-            bytes_data.seek(0)
-            
-            # Procesar el archivo con la función de cálculo según el modo seleccionado
-            if usar_horarios_flexibles:
-                app.logger.info("Usando cálculo de horarios flexibles")
-                df_resultado, mensaje = calcular_horas_excel_flexibles(
-                    bytes_data, 
-                    nombre_hoja=nombre_hoja,
-                    col_inicio=columna_inicio,
-                    col_fin=columna_fin,
-                    col_refrigerio_inicio=columna_refrigerio_inicio,
-                    col_refrigerio_fin=columna_refrigerio_fin
-                )
-            else:
-                app.logger.info("Usando cálculo de horarios normal")
-                df_resultado, mensaje = calcular_horas_excel(
-                    bytes_data, 
-                    nombre_hoja=nombre_hoja,
-                    col_inicio=columna_inicio,
-                    col_fin=columna_fin,
-                    col_refrigerio_inicio=columna_refrigerio_inicio,
-                    col_refrigerio_fin=columna_refrigerio_fin
-                )
-            
-            if df_resultado is None:
-                flash(mensaje, 'danger')
-                return redirect(request.url)
-            
-            # Guardar el DataFrame en un buffer de bytes para descargarlo
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df_resultado.to_excel(writer, index=False, sheet_name='Reporte')
-            output.seek(0)
+            # Guardar el archivo (en disco si es grande)
+            carga = guardar_carga(archivo)
             
-            # Guardar el resultado en la sesión para mostrarlo en la página de resultados
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name='reporte_horas_calculadas.xlsx',
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            opciones = dict(
+                columnas, nombre_hoja=nombre_hoja, usar_horarios_flexibles=usar_horarios_flexibles, motor=MOTOR_HORAS
+            )
+            return procesar_o_reutilizar(
+                'horas', [carga], opciones,
+                procesar_horas, carga, nombre_hoja, columnas, usar_horarios_flexibles
             )
             
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
         except Exception as e:
-            app.logger.error(f"Error al procesar el archivo: {str(e)}")
+            logger.error(f"Error al procesar el archivo: {str(e)}")
             flash(f'Error al procesar el archivo: {str(e)}', 'danger')
             return redirect(request.url)
     
     return render_template('index.html')
 
-@app.route('/protector-pdf', methods=['GET', 'POST'])
+@ruta('/protector-pdf', methods=['GET', 'POST'])
 def proteger_pdf():
-    resultados = {}
-    
     if request.method == 'POST':
         # Verificar si se recibieron archivos
         if 'archivos' not in request.files:
@@ -140,10 +694,8 @@ def proteger_pdf():
                 flash(f'El archivo {archivo.filename} no es un PDF válido', 'warning')
                 continue
             
-            # Guardar temporalmente el archivo
-            bytes_data = io.BytesIO()
-            archivo.save(bytes_data)
-            archivos_para_procesar.append((archivo.filename, bytes_data))
+            # Guardar el archivo (en disco si es grande) hasta protegerlo
+            archivos_para_procesar.append((archivo.filename, guardar_carga(archivo)))
         
         if not archivos_para_procesar:
             flash('No se procesó ningún archivo. Verifica que sean PDFs válidos.', 'danger')
@@ -152,331 +704,107 @@ def proteger_pdf():
         # Obtener configuración
         usar_nombre_archivo = 'usar_nombre_archivo' in request.form
         contraseña_manual = request.form.get('contraseña', '')
+        contraseña_manual = contraseña_manual if not usar_nombre_archivo and contraseña_manual else None
         
-        # Proteger PDFs
-        resultados_procesamiento = procesar_pdf_batch(
-            archivos_para_procesar,
-            usar_nombre_archivo=usar_nombre_archivo,
-            contraseña_manual=contraseña_manual if not usar_nombre_archivo and contraseña_manual else None
+        # Los nombres forman parte de la huella porque de ellos puede salir la contraseña
+        opciones = {
+            'nombres': [nombre for nombre, _ in archivos_para_procesar],
+            'usar_nombre_archivo': usar_nombre_archivo,
+            'contraseña': contraseña_manual
+        }
+        return procesar_o_reutilizar(
+            'protector_pdf', [carga for _, carga in archivos_para_procesar], opciones,
+            procesar_proteccion_pdf, archivos_para_procesar, usar_nombre_archivo, contraseña_manual
         )
-        
-        # Preparar resultados para la vista
-        for nombre, (pdf_data, mensaje_o_contraseña) in resultados_procesamiento.items():
+    
+    return render_template('pdf_protector.html', resultados={}, lote_id=None)
+
+@ruta('/descargar-zip/<lote_id>')
+def descargar_zip(lote_id):
+    if lote_id not in LOTES_PDF:
+        flash('El lote solicitado no está disponible o ha expirado.', 'danger')
+        return redirect(url_for('proteger_pdf'))
+    
+    def archivos_del_lote():
+        for nombre, file_id in LOTES_PDF[lote_id]:
+            pdf_data = obtener_pdf(file_id)
             if pdf_data is not None:
-                # Éxito - guardar en memoria y generar ID único
-                file_id = str(uuid.uuid4())
-                PDF_PROCESADOS[file_id] = pdf_data
-                resultados[nombre] = {
-                    'exito': True,
-                    'contraseña': mensaje_o_contraseña,
-                    'id': file_id
-                }
-            else:
-                # Error
-                resultados[nombre] = {
-                    'exito': False,
-                    'mensaje': mensaje_o_contraseña,
-                    'contraseña': None
-                }
-        
-        if all(not info['exito'] for info in resultados.values()):
-            flash('No se pudo proteger ningún archivo. Verifica el formato de los nombres.', 'danger')
+                yield nombre, pdf_data.getvalue()
     
-    return render_template('pdf_protector.html', resultados=resultados)
+    # El ZIP se envía por partes a medida que se agregan los PDFs
+    return Response(
+        stream_with_context(generar_zip(archivos_del_lote())),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=pdfs_protegidos.zip'}
+    )
+
+PAGINAS_ARTEFACTO = {
+    'certificado': ('el certificado', 'certificados_utilidades'),
+    'boleta': ('la boleta de pago', 'boletas_pago')
+}
+
+def contenido_artefacto(data):
+    """
+    Devuelve (bytes, nombre_archivo) de un artefacto de PDF_PROCESADOS.
+    Los bytes no se copian: un BytesIO creado a partir de bytes devuelve ese
+    mismo objeto en getvalue(), y los artefactos diferidos guardan sus bytes.
+    """
+    nombre_archivo = None
+    if isinstance(data, dict) and 'pdf_data' in data:
+        # Certificado en formato anidado
+        nombre_archivo = data.get('nombre_archivo')
+        data = data['pdf_data']
+    if es_artefacto_diferido(data):
+        # Boleta o certificado pendiente: se genera en la primera descarga y queda en caché
+        return obtener_contenido(data), data['nombre_archivo']
+    # PDF ya generado (protegido)
+    return data.getvalue(), nombre_archivo
+
+def parametros_nombre_descarga(download_name):
+    """Parámetros de Content-Disposition para el nombre, como los arma send_file (RFC 6266)"""
+    try:
+        download_name.encode('ascii')
+        return {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
 
-@app.route('/descargar-pdf/<filename>/<nombre_original>')
+def etag_artefacto(filename, contenido):
+    """ETag del artefacto; el contenido de un ID no cambia, así que se calcula una sola vez"""
+    etag = ETAGS_PDF.get(filename)
+    if etag is None:
+        etag = ETAGS_PDF[filename] = hashlib.sha256(contenido).hexdigest()
+    return etag
+
+@ruta('/descargar-pdf/<filename>/<nombre_original>')
 def descargar_pdf(filename, nombre_original):
     # Verificar si el archivo existe en el almacenamiento temporal
-    if filename not in PDF_PROCESADOS:
+    data = obtener_pdf(filename)
+    if data is None:
         flash('El archivo solicitado no está disponible o ha expirado.', 'danger')
         return redirect(url_for('proteger_pdf'))
     
-    # Obtener los datos del PDF
-    data = PDF_PROCESADOS[filename]
-    
-    # Verificar si es un diccionario con pdf_data, un BytesIO directamente o si son datos para generar boleta
-    if isinstance(data, dict) and 'pdf_data' in data:
-        # Es un certificado en formato anidado
-        pdf_data = data['pdf_data']
-        try:
-            pdf_data.tell()  # Comprueba si el archivo está cerrado
-        except ValueError:
-            # Si el archivo está cerrado, usar una copia del contenido
-            app.logger.warning(f"El archivo {filename} (pdf_data) estaba cerrado, creando una nueva copia.")
-            contenido = pdf_data.getvalue() if hasattr(pdf_data, 'getvalue') else None
-            if contenido:
-                pdf_data = io.BytesIO(contenido)
-            else:
-                flash('Error al procesar el archivo PDF.', 'danger')
-                return redirect(url_for('index'))
-        pdf_data.seek(0)
-    elif isinstance(data, io.BytesIO):
-        # Es un PDF ya generado (protegido)
-        # Verificar si el archivo no está cerrado
-        try:
-            data.tell()  # Comprueba si el archivo está cerrado
-        except ValueError:
-            # Si el archivo está cerrado, usar una copia del contenido
-            app.logger.warning(f"El archivo {filename} estaba cerrado, creando una nueva copia.")
-            contenido = data.getvalue() if hasattr(data, 'getvalue') else None
-            if contenido:
-                data = io.BytesIO(contenido)
-            else:
-                flash('Error al procesar el archivo PDF.', 'danger')
-                return redirect(url_for('index'))
-        
-        pdf_data = data
-        pdf_data.seek(0)
-    elif isinstance(data, dict) and 'datos' in data:
-        # Son datos para generar una boleta de pago
-        try:
-            # Generar la boleta de pago con diseño mejorado
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.units import inch
-            import textwrap
-            import datetime
-            from boletas_pago import numero_a_letras
-            
-            # Crear un buffer para el PDF
-            pdf_buffer = io.BytesIO()
-            
-            # Crear el canvas
-            c = canvas.Canvas(pdf_buffer, pagesize=letter)
-            width, height = letter
-            
-            # Obtener los datos
-            datos_empleado = data['datos']['datos_personales']
-            ingresos = data['datos']['ingresos']
-            descuentos = data['datos']['descuentos']
-            aportes = data['datos']['aportes']
-            
-            # Convertir periodo a formato conveniente
-            periodo_str = str(datos_empleado.get('periodo', ''))
-            periodo_partes = periodo_str.split('/')
-            mes = ""
-            año = ""
-            
-            if len(periodo_partes) >= 2:
-                try:
-                    mes_num = int(periodo_partes[0])
-                    meses = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", 
-                             "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
-                    if 1 <= mes_num <= 12:
-                        mes = meses[mes_num - 1]
-                    año = periodo_partes[1]
-                except (ValueError, IndexError):
-                    mes = periodo_partes[0]
-                    año = periodo_partes[1]
-            
-            # Encabezado de la boleta
-            c.setFont("Helvetica-Bold", 12)
-            c.drawRightString(width - 50, height - 40, f"BOLETA DE PAGO {mes} {año}")
-            c.drawRightString(width - 50, height - 55, "D.S. N°017-2001-TR DEL 07-06-01")
-            
-            # Información de la empresa
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(50, height - 80, "Razon Social:")
-            c.drawString(50, height - 95, "Domicilio   :")
-            c.drawString(50, height - 110, "R.U.C.      :")
-            
-            c.setFont("Helvetica", 10)
-            c.drawString(130, height - 80, "EMPRESA S.A.C")
-            c.drawString(130, height - 95, "AV. PRINCIPAL 123 - CIUDAD")
-            c.drawString(130, height - 110, "20XXXXXXXXX")
-            
-            # Línea separadora
-            c.line(50, height - 125, width - 50, height - 125)
-            
-            # Datos del trabajador
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(50, height - 145, "DATOS DEL TRABAJADOR")
-            
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(50, height - 165, "Nombre :")
-            c.drawString(50, height - 180, "Cargo :")
-            
-            c.setFont("Helvetica", 10)
-            c.drawString(130, height - 165, f"{datos_empleado.get('nombre', '')}")
-            c.drawString(130, height - 180, f"{datos_empleado.get('cargo', '')}")
-            
-            # Segunda fila de datos
-            c.setFont("Helvetica-Bold", 9)
-            y_pos = height - 200
-            c.drawString(50, y_pos, "Código :")
-            c.drawString(120, y_pos, f"{datos_empleado.get('dni', '')}")
-            c.drawString(180, y_pos, "T.Pensión :")
-            c.drawString(250, y_pos, "AFP Integra")
-            c.drawString(350, y_pos, "F.Ingr.:")
-            fecha_ingreso = str(datos_empleado.get('fecha_ingreso', ''))
-            c.drawString(400, y_pos, f"{fecha_ingreso}")
-            c.drawString(480, y_pos, "D.Trab :")
-            c.drawString(525, y_pos, "30")
-            
-            # Línea separadora
-            y_pos -= 20
-            c.line(50, y_pos, width - 50, y_pos)
-            
-            # Encabezados de secciones
-            y_pos -= 15
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(50, y_pos, "REMUNERACIONES")
-            c.drawString(300, y_pos, "DESCUENTOS TRABAJADOR")
-            c.drawString(480, y_pos, "APORTES EMPLEADOR")
-            
-            # Línea separadora
-            y_pos -= 10
-            c.line(50, y_pos, width - 50, y_pos)
-            
-            # Contenido de secciones
-            y_pos -= 25
-            c.setFont("Helvetica", 9)
-            
-            # Calcular altura máxima para las columnas
-            max_items = max(len(ingresos), len(descuentos), len(aportes))
-            item_height = 15
-            
-            # Ingresos
-            ingreso_y = y_pos
-            for ingreso in ingresos:
-                c.drawString(50, ingreso_y, f"{ingreso['concepto']}")
-                c.drawRightString(250, ingreso_y, f"S/ {ingreso['monto']:.2f}")
-                ingreso_y -= item_height
-            
-            # Descuentos
-            descuento_y = y_pos
-            for descuento in descuentos:
-                c.drawString(300, descuento_y, f"{descuento['concepto']}")
-                c.drawRightString(450, descuento_y, f"S/ {descuento['monto']:.2f}")
-                descuento_y -= item_height
-            
-            # Aportes
-            aporte_y = y_pos
-            for aporte in aportes:
-                c.drawString(480, aporte_y, f"{aporte['concepto']}")
-                c.drawRightString(550, aporte_y, f"S/ {aporte['monto']:.2f}")
-                aporte_y -= item_height
-            
-            # Calcular espacio usado
-            min_y = min(ingreso_y, descuento_y, aporte_y)
-            
-            # Línea separadora
-            min_y -= 10
-            c.line(50, min_y, width - 50, min_y)
-            
-            # Totales
-            min_y -= 25
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(50, min_y, "TOTAL HABER")
-            c.drawRightString(250, min_y, f"S/ {datos_empleado.get('total_remuneracion', 0):.2f}")
-            
-            c.drawString(300, min_y, "TOTAL DESCUENTOS")
-            c.drawRightString(450, min_y, f"S/ {datos_empleado.get('total_descuentos', 0):.2f}")
-            
-            c.drawString(480, min_y, "TOTAL APORTES")
-            c.drawRightString(550, min_y, f"S/ {datos_empleado.get('total_aportes', 0):.2f}")
-            
-            # Línea separadora
-            min_y -= 10
-            c.line(50, min_y, width - 50, min_y)
-            
-            # Neto a pagar
-            min_y -= 20
-            c.drawString(50, min_y, "NETO A PAGAR EN:")
-            
-            # Asegurarse de que neto_pagar sea un número
-            neto_pagar = datos_empleado.get('neto_pagar', 0)
-            if not isinstance(neto_pagar, (int, float)):
-                try:
-                    neto_pagar = float(neto_pagar)
-                except (ValueError, TypeError):
-                    neto_pagar = 0.0
-            
-            c.drawRightString(250, min_y, f"S/ {neto_pagar:.2f}")
-            
-            # Fecha de pago
-            min_y -= 20
-            fecha_actual = datetime.datetime.now()
-            
-            # Intentar obtener año y mes del periodo
-            año_pago = año if año else str(fecha_actual.year)
-            try:
-                mes_pago = int(mes_num) if 'mes_num' in locals() and mes_num is not None and 1 <= int(mes_num) <= 12 else fecha_actual.month
-            except:
-                mes_pago = fecha_actual.month
-            
-            # Crear fecha de pago (último día del mes)
-            try:
-                # Calcular el siguiente mes y año
-                if mes_pago == 12:
-                    siguiente_mes = 1
-                    siguiente_año = int(año_pago) + 1
-                else:
-                    siguiente_mes = mes_pago + 1
-                    siguiente_año = int(año_pago)
-                
-                # El último día del mes es un día antes del primer día del siguiente mes
-                ultimo_dia = (datetime.datetime(siguiente_año, siguiente_mes, 1) - datetime.timedelta(days=1)).day
-                fecha_pago = f"{ultimo_dia:02d}/{mes_pago:02d}/{año_pago}"
-            except (ValueError, TypeError):
-                fecha_pago = f"{fecha_actual.strftime('%d/%m/%Y')}"
-            
-            c.drawString(50, min_y, "Fecha de Pago :")
-            c.drawString(130, min_y, fecha_pago)
-            
-            # Firmas
-            min_y -= 60
-            c.line(100, min_y, 250, min_y)
-            c.line(350, min_y, 500, min_y)
-            
-            min_y -= 10
-            c.drawCentredString(175, min_y, "Empleador")
-            c.drawCentredString(425, min_y, "Trabajador")
-            
-            # Finalizar el PDF
-            c.showPage()
-            c.save()
-            
-            pdf_buffer.seek(0)
-            pdf_data = pdf_buffer
-            
-        except Exception as e:
-            app.logger.error(f"Error al generar la boleta de pago: {str(e)}")
-            flash(f'Error al generar la boleta de pago: {str(e)}', 'danger')
-            return redirect(url_for('boletas_pago'))
-    
-    # Eliminar el archivo del almacenamiento después de descargarlo
-    # (comentado para poder descargar múltiples veces durante la misma sesión)
-    # del PDF_PROCESADOS[filename]
+    try:
+        contenido, nombre_archivo = contenido_artefacto(data)
+    except Exception as e:
+        descripcion, pagina = PAGINAS_ARTEFACTO.get(data.get('tipo') if isinstance(data, dict) else None, ('el PDF', 'index'))
+        logger.error(f"Error al generar {descripcion}: {str(e)}")
+        flash(f'Error al generar {descripcion}: {str(e)}', 'danger')
+        return redirect(url_for(pagina))
     
     # Determinar el nombre de archivo para la descarga
-    # Inicializar variable de nombre de descarga con valor predeterminado
-    download_name = nombre_original if nombre_original.lower().endswith('.pdf') else f"{nombre_original}.pdf"
-    
-    if isinstance(data, io.BytesIO):
-        # Es un certificado o PDF protegido (dato directo)
-        if filename in PDF_PROCESADOS:
-            if isinstance(PDF_PROCESADOS[filename], dict) and 'nombre_archivo' in PDF_PROCESADOS[filename]:
-                # Es una boleta o certificado con nombre específico
-                download_name = PDF_PROCESADOS[filename]['nombre_archivo']
-            elif 'pdf_data' in PDF_PROCESADOS[filename]:
-                # Es un certificado con estructura anidada
-                download_name = PDF_PROCESADOS[filename].get('nombre_archivo', download_name)
-    else:
-        # Es una boleta, usar el nombre almacenado
-        download_name = data.get('nombre_archivo', download_name)
+    download_name = nombre_archivo or (nombre_original if nombre_original.lower().endswith('.pdf') else f"{nombre_original}.pdf")
     
-    return send_file(
-        pdf_data,
-        as_attachment=True,
-        download_name=download_name,
-        mimetype='application/pdf'
-    )
+    # Se responde con los mismos bytes del almacén; make_conditional resuelve
+    # If-None-Match (304) y Range (206) sin generar ni copiar el PDF completo
+    response = Response(contenido, mimetype='application/pdf')
+    response.set_etag(etag_artefacto(filename, contenido))
+    response.headers['Cache-Control'] = CACHE_CONTROL_PDF
+    response.headers.set('Content-Disposition', 'attachment', **parametros_nombre_descarga(download_name))
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(contenido))
 
-@app.route('/boletas-pago', methods=['GET', 'POST'])
+@ruta('/boletas-pago', methods=['GET', 'POST'])
 def boletas_pago():
-    resultados = {}
-    
     if request.method == 'POST':
         # Verificar si se recibió el archivo
         if 'archivo' not in request.files:
@@ -500,78 +828,32 @@ def boletas_pago():
             # Obtener el nombre de la hoja
             nombre_hoja = request.form.get('nombre_hoja', 'Empleados')
             
-            # Leer el archivo
-            bytes_data = io.BytesIO()
-            archivo.save(bytes_data)
-            bytes_data.seek(0)
-            
-            # Procesar boletas
-            empleados, mensaje = procesar_boletas_excel(bytes_data, hoja=nombre_hoja)
+            # Proteger cada boleta con el DNI del empleado como contraseña
+            proteger_con_dni = 'proteger_con_dni' in request.form
             
-            if empleados is None:
-                flash(mensaje, 'danger')
-                return redirect(request.url)
+            # Guardar el archivo (en disco si es grande)
+            carga = guardar_carga(archivo)
             
-            # Generar PDFs (simulado para prueba)
-            boletas_generadas = {}
-            
-            for nombre, datos in empleados.items():
-                # Generar un ID único para la boleta
-                boleta_id = str(uuid.uuid4())
-                
-                # Convertir neto a pagar a palabras
-                neto_pagar = datos['datos_personales'].get('neto_pagar', 0)
-                # Asegurarse de que neto_pagar sea un número
-                if not isinstance(neto_pagar, (int, float)):
-                    try:
-                        neto_pagar = float(neto_pagar)
-                    except (ValueError, TypeError):
-                        neto_pagar = 0.0
-                
-                neto_pagar_letras = numero_a_letras(neto_pagar)
-                
-                # Guardar datos para mostrar en la plantilla de resultados
-                boletas_generadas[nombre] = {
-                    'id': boleta_id,
-                    'dni': datos['datos_personales'].get('dni', ''),
-                    'periodo': datos['datos_personales'].get('periodo', ''),
-                    'neto_pagar': neto_pagar,
-                    'neto_pagar_letras': neto_pagar_letras
-                }
-                
-                # Guardar los datos para generar el PDF cuando se solicite
-                periodo_str = str(datos['datos_personales'].get('periodo', '')).replace('/', '_')
-                
-                PDF_PROCESADOS[boleta_id] = {
-                    'datos': datos,
-                    'nombre_archivo': f"BOLETA_{datos['datos_personales'].get('dni', '')}_{periodo_str}.pdf"
-                }
-            
-            # Obtener el periodo y asegurarse de que sea un string
-            periodo = ''
-            if empleados:
-                periodo_raw = list(empleados.values())[0]['datos_personales'].get('periodo', '')
-                periodo = str(periodo_raw)
-            
-            return render_template(
-                'boletas_resultado.html', 
-                boletas=boletas_generadas,
-                periodo=periodo
+            opciones = {'nombre_hoja': nombre_hoja, 'proteger_con_dni': proteger_con_dni}
+            return procesar_o_reutilizar(
+                'boletas', [carga], opciones,
+                procesar_boletas, carga, nombre_hoja, proteger_con_dni
             )
             
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
         except Exception as e:
             import traceback
-            app.logger.error(f"Error al procesar el archivo de boletas: {str(e)}")
-            app.logger.error(traceback.format_exc())
+            logger.error(f"Error al procesar el archivo de boletas: {str(e)}")
+            logger.error(traceback.format_exc())
             flash(f'Error al procesar el archivo: {str(e)}', 'danger')
             return redirect(request.url)
     
     return render_template('boletas_pago.html')
 
-@app.route('/certificados-utilidades', methods=['GET', 'POST'])
+@ruta('/certificados-utilidades', methods=['GET', 'POST'])
 def certificados_utilidades():
-    certificados_generados = {}
-    
     if request.method == 'POST':
         # Verificar si se recibió el archivo
         if 'archivo' not in request.files:
@@ -594,60 +876,192 @@ def certificados_utilidades():
         try:
             nombre_hoja = request.form.get('nombre_hoja', 'Empleados')
             
-            # Leer el archivo
-            bytes_data = io.BytesIO()
-            archivo.save(bytes_data)
-            bytes_data.seek(0)
-            
-            # Procesar el archivo con la función de certificados
-            certificados, mensaje = procesar_certificados_batch(bytes_data, hoja=nombre_hoja)
+            # Proteger cada certificado con el DNI del empleado como contraseña
+            proteger_con_dni = 'proteger_con_dni' in request.form
             
-            if certificados is None:
-                flash(mensaje, 'danger')
-                return redirect(request.url)
-            
-            # Guardar certificados para mostrar en la plantilla
-            for nombre_empleado, pdf_data in certificados.items():
-                # Generar ID único para acceder al PDF
-                certificado_id = str(uuid.uuid4())
-                
-                # Guardar en memoria con nombre de archivo específico
-                PDF_PROCESADOS[certificado_id] = {
-                    'pdf_data': pdf_data,
-                    'nombre_archivo': f"Certificado_Liquidacion_{nombre_empleado}.pdf"
-                }
-                
-                # Guardar datos para mostrar en la plantilla
-                certificados_generados[nombre_empleado] = {
-                    'id': certificado_id,
-                    'nombre': nombre_empleado.replace('_', ' '),
-                    'nombre_archivo': f"Certificado_Liquidacion_{nombre_empleado}.pdf"
-                }
+            # Guardar el archivo (en disco si es grande)
+            carga = guardar_carga(archivo)
             
             # Mostrar resultados
-            return render_template(
-                'certificados_resultado.html', 
-                certificados=certificados_generados,
-                mensaje=mensaje
+            opciones = {'nombre_hoja': nombre_hoja, 'proteger_con_dni': proteger_con_dni}
+            return procesar_o_reutilizar(
+                'certificados', [carga], opciones,
+                procesar_certificados, carga, nombre_hoja, proteger_con_dni
             )
             
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
         except Exception as e:
             import traceback
-            app.logger.error(f"Error al procesar el archivo de certificados: {str(e)}")
-            app.logger.error(traceback.format_exc())
+            logger.error(f"Error al procesar el archivo de certificados: {str(e)}")
+            logger.error(traceback.format_exc())
             flash(f'Error al procesar el archivo: {str(e)}', 'danger')
             return redirect(request.url)
     
     return render_template('certificados_utilidades.html')
 
-@app.errorhandler(404)
+@ruta('/trabajos/<trabajo_id>')
+def estado_trabajo(trabajo_id):
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'El trabajo solicitado no existe o ha expirado.'}), 404
+    
+    return jsonify({
+        'id': trabajo['id'],
+        'tipo': trabajo['tipo'],
+        'estado': trabajo['estado'],
+        'completados': trabajo['completados'],
+        'total': trabajo['total'],
+        'progreso': trabajo['progreso'],
+        'mensaje': trabajo['mensaje'],
+        'resultado': url_for('resultado_trabajo', trabajo_id=trabajo_id) if trabajo['estado'] == ESTADO_COMPLETADO else None
+    })
+
+@ruta('/trabajos/<trabajo_id>/resultado')
+def resultado_trabajo(trabajo_id):
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        flash('El trabajo solicitado no existe o ha expirado.', 'danger')
+        return redirect(url_for('index'))
+    
+    vista, pagina_origen = VISTAS_TRABAJO[trabajo['tipo']]
+    
+    if trabajo['estado'] == ESTADO_ERROR:
+        flash(trabajo['mensaje'] or 'Error al procesar el archivo.', 'danger')
+        return redirect(url_for(pagina_origen))
+    
+    if trabajo['estado'] != ESTADO_COMPLETADO:
+        # Aún en proceso: el cliente debe seguir consultando el estado
+        return redirect(url_for('estado_trabajo', trabajo_id=trabajo_id))
+    
+    resultado = obtener_resultado(trabajo_id)
+    if resultado is None:
+        # El resultado expiró, se descartó por límite o el servidor se reinició
+        flash('El resultado del trabajo ya no está disponible. Vuelve a procesar el archivo.', 'danger')
+        return redirect(url_for(pagina_origen))
+    
+    return vista(resultado)
+
+@ruta('/resultados/<conjunto_id>')
+def resultados_paginados(conjunto_id):
+    """
+    Página de un resultado de boletas o certificados. Parámetros: pagina,
+    q (búsqueda por nombre o DNI, por prefijo), por_pagina y formato=json.
+    """
+    conjunto = obtener_conjunto(conjunto_id)
+    if conjunto is None:
+        flash('Los resultados solicitados ya no están disponibles. Vuelve a procesar el archivo.', 'danger')
+        return redirect(url_for('index'))
+    
+    pagina = paginar(
+        conjunto,
+        request.args.get('q', ''),
+        request.args.get('pagina', 1, type=int),
+        request.args.get('por_pagina', type=int)
+    )
+    if request.args.get('formato') == 'json':
+        return jsonify(dict(pagina_publica(pagina), conjunto_id=conjunto_id))
+    
+    return VISTAS_CONJUNTO[conjunto['clave']](conjunto['resultado'], pagina)
+
+@ruta('/api/essalud', methods=['POST'])
+def api_essalud():
+    """
+    Calcula ESSALUD para un lote de registros en CSV, NDJSON o arreglo JSON
+    (según el Content-Type) y responde en el mismo formato, por partes.
+    Parámetros: variante=tambo|corregida (u otra de ARCHIVO_VARIANTES_REGLAS),
+    periodo=AAAAMM para prorratear los días por ingreso y cese, y
+    solo_calculadas=1 para devolver únicamente las columnas calculadas, en el
+    mismo orden de los registros. Si falla un bloque posterior al primero la
+    respuesta termina con un registro de error (api_essalud.escribir_error).
+    """
+    formato = formato_de(request.content_type)
+    if formato is None:
+        return jsonify({'error': 'Content-Type no admitido: usa text/csv, application/x-ndjson o application/json'}), 415
+    
+    variante = request.args.get('variante', 'tambo')
+    if variante not in VARIANTES_REGLAS:
+        return jsonify({'error': f"Variante desconocida: {variante} (opciones: {', '.join(VARIANTES_REGLAS)})"}), 400
+    solo_calculadas = request.args.get('solo_calculadas') in ('1', 'true', 'si')
+    periodo = request.args.get('periodo') or None
+    
+    try:
+        partes = generar_respuesta(leer_bloques(request.stream, formato), formato, variante, solo_calculadas, periodo)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return Response(stream_with_context(partes), mimetype=TIPOS_RESPUESTA[formato])
+
+@ruta('/metrics')
+def metrics():
+    # La dirección de origen no sirve para restringir el acceso detrás de un proxy local
+    if TOKEN_METRICAS:
+        autorizacion = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(autorizacion.encode('utf-8'), f'Bearer {TOKEN_METRICAS}'.encode('utf-8')):
+            abort(404)
+    elif not METRICAS_PUBLICAS:
+        abort(404)
+    return Response(exponer_metricas(), mimetype='text/plain; version=0.0.4')
+
+def carga_demasiado_grande(e):
+    if request.endpoint in RUTAS_API:
+        return jsonify({'error': 'El cuerpo supera el tamaño máximo permitido.'}), 413
+    flash('El archivo supera el tamaño máximo permitido.', 'danger')
+    return redirect(request.url)
+
 def page_not_found(e):
     return render_template('index.html'), 404
 
-@app.errorhandler(500)
 def internal_server_error(e):
     flash('Error interno del servidor. Por favor, intenta nuevamente.', 'danger')
     return render_template('index.html'), 500
 
+def crear_app(entorno=None):
+    """
+    Crea la aplicación para el entorno ('produccion' o 'desarrollo'; por defecto
+    la variable ENTORNO), con las rutas de RUTAS y, en producción, ya calentada.
+    Los resultados y PDFs guardados (PDF_PROCESADOS, RESULTADOS_POR_HUELLA...)
+    son del módulo: las aplicaciones creadas en un mismo proceso los comparten.
+    """
+    entorno = entorno or os.environ.get('ENTORNO', 'produccion')
+    if entorno not in CONFIGURACIONES:
+        raise ValueError(f"Entorno desconocido: {entorno} (opciones: {', '.join(CONFIGURACIONES)})")
+    
+    app = Flask(__name__)
+    app.request_class = SolicitudCargaEnDisco
+    app.secret_key = os.environ.get("SESSION_SECRET", "clave_secreta_calculadora_horas")
+    app.config['MAX_CONTENT_LENGTH'] = int(max(LIMITES_CARGA_MB.values()) * MB)
+    app.config.from_mapping(CONFIGURACIONES[entorno])
+    
+    if entorno == 'produccion' and 'SESSION_SECRET' not in os.environ:
+        logger.warning("SESSION_SECRET no está definida: se usa la clave de desarrollo")
+    
+    app.before_request(iniciar_medicion)
+    app.before_request(validar_tamaño_carga)
+    app.after_request(medir_respuesta_en_flujo)
+    app.teardown_request(registrar_latencia)
+    for regla, vista, opciones in RUTAS:
+        app.add_url_rule(regla, view_func=vista, **opciones)
+    app.register_error_handler(413, carga_demasiado_grande)
+    app.register_error_handler(404, page_not_found)
+    app.register_error_handler(500, internal_server_error)
+    
+    # Los resultados y los PDFs viven en la memoria de este proceso: un segundo
+    # proceso no los vería, así que no arranca. En modo debug el proceso que
+    # vigila los cambios (recargador de Flask) no atiende y no reserva.
+    if not (app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true') and not reservar_servidor():
+        raise RuntimeError(
+            "Otro proceso ya atiende la aplicación (base de trabajos: "
+            f"{RUTA_BD_TRABAJOS}). Los resultados y los PDFs viven en la memoria "
+            "de un solo proceso: detén el otro proceso o usa un solo worker "
+            "con varios hilos (gunicorn -c gunicorn.conf.py wsgi:app)."
+        )
+    
+    if app.config['CALENTAR']:
+        calentar(app)
+    return app
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desarrollo; en producción usar wsgi.py con un servidor que precargue la aplicación
+    crear_app(os.environ.get('ENTORNO', 'desarrollo')).run(host='0.0.0.0', port=int(os.environ.get('PUERTO', 5000)))
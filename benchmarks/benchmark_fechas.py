@@ -0,0 +1,62 @@
+"""
+Benchmark del normalizador de fechas: valores únicos con tipos mezclados
+frente a pd.to_datetime con formato sobre todas las filas.
+
+Uso:
+    python benchmarks/benchmark_fechas.py --filas 200000 --distintas 300
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalizador_fechas import normalizar_fechas, resumen_lectura
+
+
+def columna_mezclada(filas, distintas, semilla=0):
+    """Columna como la entrega read_excel: textos DD/MM/YYYY, fechas nativas, seriales y vacíos"""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, distintas), unit='D')
+    seriales = (fechas - pd.Timestamp('1899-12-30')).days
+    elegidas = rng.integers(0, distintas, filas)
+    tipo = rng.integers(0, 10, filas)
+    valores = np.empty(filas, dtype='object')
+    valores[:] = [fecha.strftime('%d/%m/%Y') for fecha in fechas[elegidas]]
+    nativas = tipo == 7
+    valores[nativas] = list(fechas[elegidas[nativas]].to_pydatetime())
+    con_serial = tipo == 8
+    valores[con_serial] = seriales[elegidas[con_serial]].tolist()
+    valores[tipo == 9] = None
+    return pd.Series(valores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--distintas', type=int, default=300)
+    args = parser.parse_args()
+
+    serie = columna_mezclada(args.filas, args.distintas)
+
+    inicio = time.perf_counter()
+    referencia = pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+    tiempo_referencia = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    normalizadas, conteo = normalizar_fechas(serie)
+    tiempo_normalizador = time.perf_counter() - inicio
+
+    print(f"{args.filas} filas, {args.distintas} fechas distintas")
+    print(f"pd.to_datetime por fila: {tiempo_referencia * 1000:8.1f} ms   fechas leídas: {referencia.notna().sum()}")
+    print(f"normalizar_fechas:       {tiempo_normalizador * 1000:8.1f} ms   fechas leídas: {normalizadas.notna().sum()}")
+    coinciden = (normalizadas[referencia.notna()] == referencia[referencia.notna()].dt.normalize()).all()
+    print(f"Coinciden donde pd.to_datetime leyó la fecha: {coinciden}")
+    print(resumen_lectura({'fecha': conteo}).to_string())
+
+
+if __name__ == '__main__':
+    main()
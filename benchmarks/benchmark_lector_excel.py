@@ -0,0 +1,103 @@
+"""
+Benchmark de los lectores de Excel (openpyxl frente a calamine, con y sin
+proyección de columnas) sobre libros con la forma de nuestras planillas, y de
+la reapertura desde la caché de cache_libros.
+
+Uso:
+    python benchmarks/benchmark_lector_excel.py --filas 20000
+    python benchmarks/benchmark_lector_excel.py --archivo planilla.xlsx --hoja Empleados --columnas "Importe Bruto,Dias_Mes"
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import importlib.util
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lector_excel
+import cache_libros
+from lector_excel import leer_excel
+
+COLUMNAS_ESSALUD = ['fecha_ingreso', 'fecha_cese', 'Importe Bruto', 'Días Subsidio', 'Dias_Mes', 'Importe ESSALUD EJB']
+
+
+def generar_planilla(filas, semilla=0):
+    """Planilla ESSALUD sintética: las columnas requeridas más datos de empleado y conceptos"""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range('2015-01-01', '2024-12-31', freq='D').strftime('%d/%m/%Y').to_numpy()
+    df = pd.DataFrame({
+        'DNI': rng.integers(10000000, 99999999, filas),
+        'Apellidos y Nombres': [f"EMPLEADO {n}" for n in range(filas)],
+        'Sede': rng.choice(['LIMA', 'CUSCO', 'PIURA', 'PUNO'], filas),
+        'Centro de Costo': rng.choice([f"CC{n:03d}" for n in range(40)], filas),
+        'fecha_ingreso': rng.choice(fechas, filas),
+        'fecha_cese': np.where(rng.random(filas) < 0.1, rng.choice(fechas, filas), None),
+        'Importe Bruto': np.round(rng.uniform(900, 6000, filas), 2),
+        'Días Subsidio': np.where(rng.random(filas) < 0.15, rng.integers(1, 30, filas), 0),
+        'Dias_Mes': 30,
+        'Importe ESSALUD EJB': np.round(rng.uniform(80, 540, filas), 2),
+    })
+    # Conceptos adicionales que la calculadora no necesita
+    for n in range(1, 21):
+        df[f"Concepto {n:02d}"] = np.round(rng.uniform(0, 500, filas), 2)
+    return df
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"{nombre:<35} {min(tiempos) * 1000:>10.1f} ms   {df.shape[0]} x {df.shape[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--archivo', help='Libro real a medir en lugar del sintético')
+    parser.add_argument('--hoja', default=0)
+    parser.add_argument('--columnas', help='Columnas a proyectar, separadas por comas')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.archivo:
+        with open(args.archivo, 'rb') as archivo:
+            contenido = archivo.read()
+    else:
+        libro = io.BytesIO()
+        generar_planilla(args.filas).to_excel(libro, index=False)
+        contenido = libro.getvalue()
+    columnas = args.columnas.split(',') if args.columnas else COLUMNAS_ESSALUD
+    print(f"Libro: {len(contenido) / 1024:.0f} KB")
+
+    motores = ['openpyxl']
+    if lector_excel._calamine_disponible():
+        motores.append('calamine')
+    else:
+        print("python-calamine no está instalado: solo se mide openpyxl")
+
+    # Los motores se miden sin caché; la reapertura, con una caché vacía en un directorio temporal
+    cache_libros.CACHE_LIBROS = '0'
+    for motor in motores:
+        lector_excel.MOTOR_EXCEL = motor
+        medir(f"{motor} (todas las columnas)", lambda: leer_excel(io.BytesIO(contenido), hoja=args.hoja), args.repeticiones)
+        medir(f"{motor} (columnas proyectadas)", lambda: leer_excel(io.BytesIO(contenido), hoja=args.hoja, columnas=columnas), args.repeticiones)
+
+    if importlib.util.find_spec('pyarrow') is None:
+        print("pyarrow no está instalado: no se mide la caché")
+        return
+    with tempfile.TemporaryDirectory() as directorio:
+        cache_libros.CACHE_LIBROS = 'auto'
+        cache_libros.DIRECTORIO_CACHE_LIBROS = directorio
+        leer_excel(io.BytesIO(contenido), hoja=args.hoja)
+        medir("caché (reapertura)", lambda: leer_excel(io.BytesIO(contenido), hoja=args.hoja), args.repeticiones)
+
+
+if __name__ == '__main__':
+    main()
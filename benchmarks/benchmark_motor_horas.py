@@ -0,0 +1,157 @@
+"""
+Benchmark del motor de horas vectorizado frente a las implementaciones actuales.
+
+Uso:
+    python benchmarks/benchmark_motor_horas.py --filas 200000
+    python benchmarks/benchmark_motor_horas.py --filas 50000 --excel
+
+    python benchmarks/benchmark_motor_horas.py --libro marcaciones_reales.xlsx --hoja Horas
+
+Sin --excel se mide solo el cálculo sobre un DataFrame ya leído (el motor
+vectorizado contra un cálculo fila por fila con el mismo intérprete de horas).
+Con --excel (o --libro) se mide el flujo completo contra calcular_horas_excel
+y calcular_horas_excel_flexibles y se comparan sus resultados con los del
+motor vectorizado: columnas que solo tiene uno de los dos y filas con valores
+distintos en las columnas comunes. Si esa comparación muestra diferencias con
+libros reales, MOTOR_HORAS=clasico vuelve a los módulos clásicos en la app.
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_horas import calcular_horas_df, calcular_horas_vectorizado, _hora_a_minutos, MINUTOS_DIA
+
+COLUMNAS = ['Hora Inicio', 'Hora Fin', 'Hora Refrigerio Inicio', 'Hora Refrigerio Fin']
+
+
+def generar_marcaciones(filas, semilla=0):
+    """Genera marcaciones sintéticas con textos, objetos time y turnos nocturnos"""
+    rng = np.random.default_rng(semilla)
+    inicio = rng.integers(5 * 60, 23 * 60, filas)
+    jornada = rng.integers(4 * 60, 12 * 60, filas)
+    fin = (inicio + jornada) % MINUTOS_DIA
+    refrigerio_inicio = (inicio + jornada // 2) % MINUTOS_DIA
+    refrigerio_fin = (refrigerio_inicio + rng.choice([30, 45, 60], filas)) % MINUTOS_DIA
+
+    def como_texto(minutos):
+        return [f"{m // 60:02d}:{m % 60:02d}" for m in minutos]
+
+    def como_time(minutos):
+        return [datetime.time(m // 60, m % 60) for m in minutos]
+
+    return pd.DataFrame({
+        'DNI': rng.integers(10000000, 99999999, filas),
+        'Hora Inicio': como_texto(inicio),
+        'Hora Fin': como_time(fin),
+        'Hora Refrigerio Inicio': como_texto(refrigerio_inicio),
+        'Hora Refrigerio Fin': como_texto(refrigerio_fin),
+    })
+
+
+def calcular_fila_por_fila(df):
+    """Referencia con el enfoque anterior: se interpreta y calcula cada fila por separado"""
+    def horas_fila(fila):
+        inicio = _hora_a_minutos(fila['Hora Inicio'])
+        fin = _hora_a_minutos(fila['Hora Fin'])
+        refrigerio = (_hora_a_minutos(fila['Hora Refrigerio Fin']) - _hora_a_minutos(fila['Hora Refrigerio Inicio'])) % MINUTOS_DIA
+        return round(max((fin - inicio) % MINUTOS_DIA - refrigerio, 0) / 60, 2)
+
+    df = df.copy()
+    df['Horas Trabajadas'] = df.apply(horas_fila, axis=1)
+    return df
+
+
+def comparar_resultados(nombre, vectorizado, clasico):
+    """Imprime las diferencias entre el resultado del motor vectorizado y el de un módulo clásico"""
+    if vectorizado is None or clasico is None:
+        print(f"{nombre}: uno de los cálculos no devolvió resultado")
+        return
+    solo_vectorizado = [col for col in vectorizado.columns if col not in clasico.columns]
+    solo_clasico = [col for col in clasico.columns if col not in vectorizado.columns]
+    print(f"{nombre}: filas {len(vectorizado)} / {len(clasico)}")
+    if solo_vectorizado:
+        print(f"  solo en el motor vectorizado: {solo_vectorizado}")
+    if solo_clasico:
+        print(f"  solo en el módulo clásico: {solo_clasico}")
+    if len(vectorizado) != len(clasico):
+        return
+    for columna in vectorizado.columns.intersection(clasico.columns):
+        a = vectorizado[columna].reset_index(drop=True)
+        b = clasico[columna].reset_index(drop=True)
+        numericos_a, numericos_b = pd.to_numeric(a, errors='coerce'), pd.to_numeric(b, errors='coerce')
+        if numericos_a.notna().any() or numericos_b.notna().any():
+            distintas = ~(np.isclose(numericos_a, numericos_b, atol=0.01) | (numericos_a.isna() & numericos_b.isna()))
+        else:
+            distintas = a.astype(str) != b.astype(str)
+        if distintas.any():
+            print(f"  {columna}: {int(distintas.sum())} filas distintas (primera: fila {int(np.flatnonzero(distintas)[0])})")
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"{nombre:<45} {min(tiempos) * 1000:>10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--excel', action='store_true', help='Medir el flujo completo y comparar con los módulos clásicos')
+    parser.add_argument('--libro', help='Libro de marcaciones real para el flujo completo (en lugar del sintético)')
+    parser.add_argument('--hoja', default='Horas')
+    args = parser.parse_args()
+
+    df = generar_marcaciones(args.filas)
+    print(f"Marcaciones: {args.filas}")
+
+    df_vectorizado, _ = medir('Motor vectorizado', lambda: calcular_horas_df(df), args.repeticiones)
+    medir('Motor vectorizado (flexible)', lambda: calcular_horas_df(df, flexible=True), args.repeticiones)
+    df_fila = medir('Cálculo fila por fila', lambda: calcular_fila_por_fila(df), 1)
+
+    diferencias = int((df_vectorizado['Horas Trabajadas'] != df_fila['Horas Trabajadas']).sum())
+    print(f"Filas con resultado distinto: {diferencias}")
+
+    if not (args.excel or args.libro):
+        return
+
+    if args.libro:
+        with open(args.libro, 'rb') as archivo:
+            contenido = archivo.read()
+    else:
+        libro = io.BytesIO()
+        df.to_excel(libro, index=False, sheet_name=args.hoja)
+        contenido = libro.getvalue()
+
+    try:
+        from calculadora import calcular_horas_excel
+        from horarios_flexibles import calcular_horas_excel_flexibles
+    except ImportError:
+        print("calculadora / horarios_flexibles no disponibles: no se puede comparar con los módulos clásicos")
+        return
+
+    modos = [
+        ('normal', calcular_horas_excel, False),
+        ('flexible', calcular_horas_excel_flexibles, True)
+    ]
+    for modo, clasico, flexible in modos:
+        vectorizado, _ = medir(f'Excel + motor vectorizado ({modo})',
+                               lambda: calcular_horas_vectorizado(io.BytesIO(contenido), nombre_hoja=args.hoja, flexible=flexible), 1)
+        referencia, _ = medir(f'Excel + {clasico.__name__}',
+                              lambda: clasico(io.BytesIO(contenido), nombre_hoja=args.hoja), 1)
+        comparar_resultados(modo, vectorizado, referencia)
+
+
+if __name__ == '__main__':
+    main()
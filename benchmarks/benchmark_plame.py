@@ -0,0 +1,74 @@
+"""
+Benchmark de la exportación a PLAME: escritura por bloques frente a armar las
+líneas fila por fila.
+
+Uso:
+    python benchmarks/benchmark_plame.py --filas 200000
+"""
+import os
+import io
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_lector_excel import generar_planilla
+from reglas_essalud import procesar_archivo_essalud
+from cifrado_pdf import contraseña_empleado
+from exportar_plame import (
+    generar_plame, exportar_plame_zip, ARCHIVOS_PLAME, HORAS_POR_DIA, SEPARADOR, FIN_LINEA,
+    TIPO_DOCUMENTO_DNI, CONCEPTO_REMUNERACION_BASICA, SUSPENSION_INCAPACIDAD_TEMPORAL
+)
+
+
+def plame_fila_por_fila(df, extension):
+    """Referencia: una cadena por fila, como al armar los archivos a mano"""
+    lineas = []
+    for _, fila in df.iterrows():
+        dni = contraseña_empleado(fila['DNI'])
+        if not dni:
+            continue
+        if extension == 'jor':
+            campos = [TIPO_DOCUMENTO_DNI, dni, str(int(round(max(fila['DIAS PLAME'], 0) * HORAS_POR_DIA))), '0', '0', '0']
+        elif extension == 'snl':
+            if not fila['Días Subsidio'] > 0:
+                continue
+            campos = [TIPO_DOCUMENTO_DNI, dni, SUSPENSION_INCAPACIDAD_TEMPORAL, str(int(round(fila['Días Subsidio'])))]
+        else:
+            importe = f"{fila['Importe Bruto']:.2f}"
+            campos = [TIPO_DOCUMENTO_DNI, dni, CONCEPTO_REMUNERACION_BASICA, importe, importe]
+        lineas.append(SEPARADOR.join(campos) + SEPARADOR + FIN_LINEA)
+    return ''.join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--sin-referencia', action='store_true', help='No medir la versión fila por fila')
+    args = parser.parse_args()
+
+    df, _ = procesar_archivo_essalud(generar_planilla(args.filas))
+    print(f"Planilla: {len(df)} filas")
+
+    for extension in ARCHIVOS_PLAME:
+        inicio = time.perf_counter()
+        vectorizado = ''.join(generar_plame(df, extension))
+        tiempo_vectorizado = time.perf_counter() - inicio
+        linea = f"{extension}: por bloques {tiempo_vectorizado * 1000:>8.1f} ms"
+
+        if not args.sin_referencia:
+            inicio = time.perf_counter()
+            referencia = plame_fila_por_fila(df, extension)
+            tiempo_referencia = time.perf_counter() - inicio
+            linea += f"   fila por fila {tiempo_referencia * 1000:>8.1f} ms   idénticos: {vectorizado == referencia}"
+        print(linea)
+
+    inicio = time.perf_counter()
+    resumen = exportar_plame_zip(df, '20123456789', '202401', io.BytesIO())
+    print(f"ZIP completo: {(time.perf_counter() - inicio) * 1000:.1f} ms {resumen}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark de las reglas de ESSALUD: plan compilado de motor_reglas frente a la
+cadena if/elif aplicada fila por fila con df.apply.
+
+Con --periodo se prorratean además los días por ingreso y cese (la referencia
+fila por fila no prorratea, así que entonces no se compara).
+
+Uso:
+    python benchmarks/benchmark_reglas.py --filas 200000 [--periodo 202401]
+"""
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_lector_excel import generar_planilla
+from reglas_essalud import procesar_archivo_essalud, VARIANTES_REGLAS
+from motor_reglas import resumen_ramas
+from prorrateo_essalud import resumen_prorrateo
+
+# Importe para quien tiene días de subsidio en cada variante de la referencia
+IMPORTE_SUBSIDIO_REFERENCIA = {'tambo': 1130 * 0.09, 'corregida': 0}
+
+
+def calcular_importe(row, variante):
+    """Referencia: la regla original, fila por fila"""
+    if pd.notna(row['fecha_cese']):
+        return row['Importe Bruto'] * 0.09
+    elif row['Días Subsidio'] > 0:
+        return IMPORTE_SUBSIDIO_REFERENCIA[variante]
+    elif row['Importe Bruto'] < 1130 and row['Importe Bruto'] > 0:
+        return 1130 * 0.09
+    else:
+        return row['Importe Bruto'] * 0.09
+
+
+def calcular_calculo_dias_plame(row):
+    """Referencia: la regla original, fila por fila"""
+    if row['Días Subsidio'] > 0:
+        return round((101.70 / row['Dias_Mes']) * row['DIAS PLAME'], 2)
+    else:
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--sin-referencia', action='store_true', help='No medir la versión fila por fila')
+    parser.add_argument('--periodo', help='Periodo AAAAMM para prorratear los días')
+    args = parser.parse_args()
+
+    planilla = generar_planilla(args.filas)
+    print(f"Planilla: {len(planilla)} filas")
+
+    for variante in VARIANTES_REGLAS:
+        inicio = time.perf_counter()
+        df, error = procesar_archivo_essalud(planilla, variante, args.periodo)
+        if error:
+            print(f"{variante}: {error}")
+            continue
+        linea = f"{variante}: procesar_archivo_essalud {(time.perf_counter() - inicio) * 1000:>8.1f} ms"
+
+        if not args.sin_referencia and not args.periodo and variante in IMPORTE_SUBSIDIO_REFERENCIA:
+            inicio = time.perf_counter()
+            importe = df.apply(calcular_importe, axis=1, variante=variante)
+            calculo = df.apply(calcular_calculo_dias_plame, axis=1)
+            tiempo_referencia = time.perf_counter() - inicio
+            identicos = (importe.equals(df['Importe_Calculado'])
+                         and calculo.equals(df['CALCULO DIAS PLAME']))
+            linea += f"   reglas fila por fila {tiempo_referencia * 1000:>8.1f} ms   idénticos: {identicos}"
+        print(linea)
+        print(resumen_ramas(df.attrs['ramas_reglas']).to_string())
+        if args.periodo:
+            print(resumen_prorrateo(df.attrs['prorrateo']).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""
+Prueba de carga local de todas las rutas de la aplicación Flask.
+
+Genera libros de Excel y PDFs sintéticos del tamaño indicado, levanta el
+servidor en un proceso local (o usa uno ya levantado con --url) y ejecuta cada
+escenario con la concurrencia pedida, incluyendo las descargas posteriores de
+/descargar-pdf y /descargar-zip. Informa por ruta: solicitudes, errores,
+solicitudes por segundo, latencias p50/p95/p99 y el RSS máximo del servidor
+(proceso principal más sus hijos) mientras corría el escenario.
+
+Uso:
+    python benchmarks/prueba_carga.py --concurrencia 8 --iteraciones 40
+    python benchmarks/prueba_carga.py --escenarios boletas certificados --empleados 200
+    python benchmarks/prueba_carga.py --gunicorn 1 --hilos 16 --concurrencia 16
+    python benchmarks/prueba_carga.py --url http://127.0.0.1:5000 --pid 12345
+
+El formato de los libros de boletas y certificados depende de boletas_pago y
+certificados_utilidades; si la hoja sintética no coincide con el de producción,
+pasar un libro real con --libro-boletas / --libro-certificados.
+Por defecto se desactiva la reutilización de resultados (MAX_RESULTADOS_POR_HUELLA=0)
+para que cada carga se procese de verdad; --reutilizar la mantiene.
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import html
+import uuid
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from reportlab.pdfgen import canvas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_motor_horas import generar_marcaciones
+from benchmark_lector_excel import generar_planilla
+
+ESCENARIOS = ['paginas', 'horas', 'protector', 'boletas', 'certificados', 'api', 'segundo_plano']
+
+_PATRON_ID = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+
+# --- Datos sintéticos -------------------------------------------------------
+
+def libro_excel(df, hoja):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=hoja)
+    return buffer.getvalue()
+
+
+def libro_empleados(empleados, semilla=0):
+    """Hoja 'Empleados' con datos personales y conceptos, para boletas y certificados"""
+    rng = np.random.default_rng(semilla)
+    basico = np.round(rng.uniform(1130, 6000, empleados), 2)
+    df = pd.DataFrame({
+        'dni': [f"{n:08d}" for n in rng.integers(10000000, 99999999, empleados)],
+        'nombre': [f"EMPLEADO {n} PRUEBA" for n in range(empleados)],
+        'cargo': rng.choice(['ASISTENTE', 'ANALISTA', 'COORDINADOR'], empleados),
+        'periodo': '03/2024',
+        'fecha_ingreso': '01/01/2020',
+        'sueldo_basico': basico,
+        'asignacion_familiar': 113.0,
+        'descuento_afp': np.round(basico * 0.13, 2),
+        'aporte_essalud': np.round(np.maximum(basico, 1130) * 0.09, 2),
+    })
+    df['neto'] = np.round(df['sueldo_basico'] + df['asignacion_familiar'] - df['descuento_afp'], 2)
+    return libro_excel(df, 'Empleados')
+
+
+def pdf_sintetico(paginas, semilla=0):
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer)
+    for pagina in range(paginas):
+        for linea in range(40):
+            lienzo.drawString(50, 800 - linea * 18, f"Documento {semilla} - página {pagina + 1} - línea {linea + 1} " * 2)
+        lienzo.showPage()
+    lienzo.save()
+    return buffer.getvalue()
+
+
+# --- Cliente HTTP -----------------------------------------------------------
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_CLIENTE = urllib.request.build_opener(_SinRedirecciones)
+
+
+def multipart(campos, archivos):
+    """Cuerpo multipart/form-data: campos [(nombre, valor)], archivos [(campo, nombre_archivo, bytes)]"""
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos:
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode('utf-8'))
+    for campo, nombre_archivo, contenido in archivos:
+        partes.append(
+            f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nombre_archivo}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+        )
+        partes.append(contenido)
+        partes.append(b'\r\n')
+    partes.append(f'--{limite}--\r\n'.encode('ascii'))
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+
+def solicitar(url, cuerpo=None, tipo=None):
+    """Devuelve (código, cuerpo, segundos). Las redirecciones no se siguen."""
+    solicitud = urllib.request.Request(url, data=cuerpo, method='POST' if cuerpo is not None else 'GET')
+    if tipo:
+        solicitud.add_header('Content-Type', tipo)
+    inicio = time.perf_counter()
+    try:
+        with _CLIENTE.open(solicitud, timeout=600) as respuesta:
+            datos = respuesta.read()
+            codigo = respuesta.status
+    except urllib.error.HTTPError as e:
+        datos = e.read()
+        codigo = e.code
+    return codigo, datos, time.perf_counter() - inicio
+
+
+# --- Registro de resultados -------------------------------------------------
+
+class Registro:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def anotar(self, ruta, codigo, segundos, esperado=200):
+        with self._lock:
+            self.latencias[ruta].append(segundos)
+            if codigo != esperado:
+                self.errores[ruta] += 1
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    posicion = max(0, min(len(ordenados) - 1, int(np.ceil(p / 100 * len(ordenados))) - 1))
+    return ordenados[posicion]
+
+
+# --- Memoria del servidor ---------------------------------------------------
+
+def _rss_proceso(pid):
+    try:
+        with open(f'/proc/{pid}/status') as archivo:
+            for linea in archivo:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) * 1024
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return 0
+
+
+def _hijos(pid):
+    hijos = []
+    try:
+        for tarea in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{tarea}/children') as archivo:
+                hijos.extend(int(hijo) for hijo in archivo.read().split())
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return hijos
+
+
+def rss_arbol(pid):
+    """RSS del proceso y de todos sus descendientes (workers, procesos de cifrado)"""
+    total, pendientes = 0, [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        total += _rss_proceso(actual)
+        pendientes.extend(_hijos(actual))
+    return total
+
+
+class MonitorMemoria:
+    """Muestrea el RSS del servidor en segundo plano y guarda el máximo del periodo en curso"""
+
+    def __init__(self, pid, intervalo=0.05):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def __enter__(self):
+        self.maximo = rss_arbol(self.pid) if self.pid else 0
+        if self.pid:
+            self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+            self._hilo.start()
+        return self
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            self.maximo = max(self.maximo, rss_arbol(self.pid))
+
+    def __exit__(self, *args):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+        return False
+
+
+# --- Escenarios -------------------------------------------------------------
+
+def ids_descarga(pagina):
+    """IDs de PDF enlazados en la página de resultados (o todos los UUID si la plantilla no los enlaza)"""
+    texto = html.unescape(pagina.decode('utf-8', errors='replace'))
+    ids = re.findall(rf'/descargar-pdf/({_PATRON_ID})/', texto)
+    return ids or re.findall(_PATRON_ID, texto)
+
+
+def descargar_pdfs(base, registro, pagina, limite, etiqueta):
+    for artefacto_id in ids_descarga(pagina)[:limite]:
+        codigo, _, segundos = solicitar(f"{base}/descargar-pdf/{artefacto_id}/documento.pdf")
+        if codigo == 302:
+            # El UUID no era de un PDF (por ejemplo, el ID del lote)
+            continue
+        registro.anotar(f"GET /descargar-pdf ({etiqueta})", codigo, segundos)
+
+
+def esc_paginas(base, registro, datos, args):
+    for ruta in ('/', '/protector-pdf', '/boletas-pago', '/certificados-utilidades'):
+        codigo, _, segundos = solicitar(base + ruta)
+        registro.anotar(f"GET {ruta}", codigo, segundos)
+
+
+def esc_horas(base, registro, datos, args):
+    cuerpo, tipo = multipart([('nombre_hoja', 'Horas')], [('archivo', 'horas.xlsx', datos['horas'])])
+    codigo, _, segundos = solicitar(base + '/', cuerpo, tipo)
+    registro.anotar('POST / (horas)', codigo, segundos)
+
+
+def esc_protector(base, registro, datos, args):
+    archivos = [('archivos', f'documento_{n}.pdf', pdf) for n, pdf in enumerate(datos['pdfs'])]
+    cuerpo, tipo = multipart([('contraseña', 'clave123')], archivos)
+    codigo, pagina, segundos = solicitar(base + '/protector-pdf', cuerpo, tipo)
+    registro.anotar('POST /protector-pdf', codigo, segundos)
+    if codigo != 200:
+        return
+    descargar_pdfs(base, registro, pagina, args.descargas, 'protegido')
+    texto = html.unescape(pagina.decode('utf-8', errors='replace'))
+    lote = re.search(rf'descargar-zip/({_PATRON_ID})', texto) or re.search(rf'lote[^0-9a-f]{{0,20}}({_PATRON_ID})', texto)
+    if lote:
+        codigo, _, segundos = solicitar(f"{base}/descargar-zip/{lote.group(1)}")
+        registro.anotar('GET /descargar-zip', codigo, segundos)
+
+
+def _esc_excel_empleados(ruta, etiqueta, libro, base, registro, args, extra=()):
+    campos = [('nombre_hoja', 'Empleados'), ('proteger_con_dni', 'on')] + list(extra)
+    cuerpo, tipo = multipart(campos, [('archivo', 'empleados.xlsx', libro)])
+    codigo, pagina, segundos = solicitar(base + ruta, cuerpo, tipo)
+    registro.anotar(f"POST {ruta}", codigo, segundos)
+    if codigo == 200:
+        descargar_pdfs(base, registro, pagina, args.descargas, etiqueta)
+
+
+def esc_boletas(base, registro, datos, args):
+    _esc_excel_empleados('/boletas-pago', 'boleta', datos['boletas'], base, registro, args)
+
+
+def esc_certificados(base, registro, datos, args):
+    _esc_excel_empleados('/certificados-utilidades', 'certificado', datos['certificados'], base, registro, args)
+
+
+def esc_api(base, registro, datos, args):
+    codigo, _, segundos = solicitar(base + '/api/essalud?solo_calculadas=1', datos['api'], 'text/csv')
+    registro.anotar('POST /api/essalud', codigo, segundos)
+
+
+def esc_segundo_plano(base, registro, datos, args):
+    """Boletas en segundo plano: encolar, consultar el estado hasta terminar y pedir el resultado"""
+    cuerpo, tipo = multipart([('nombre_hoja', 'Empleados'), ('en_segundo_plano', 'on')],
+                             [('archivo', 'empleados.xlsx', datos['boletas'])])
+    codigo, respuesta, segundos = solicitar(base + '/boletas-pago', cuerpo, tipo)
+    registro.anotar('POST /boletas-pago (segundo plano)', codigo, segundos, esperado=202)
+    if codigo != 202:
+        return
+    trabajo = json.loads(respuesta)
+    while True:
+        codigo, respuesta, segundos = solicitar(base + trabajo['estado'])
+        registro.anotar('GET /trabajos/<id>', codigo, segundos)
+        if codigo != 200 or json.loads(respuesta)['estado'] in ('completado', 'error'):
+            break
+        time.sleep(0.2)
+    codigo, _, segundos = solicitar(base + trabajo['resultado'])
+    registro.anotar('GET /trabajos/<id>/resultado', codigo, segundos)
+
+
+FUNCIONES_ESCENARIO = {
+    'paginas': esc_paginas,
+    'horas': esc_horas,
+    'protector': esc_protector,
+    'boletas': esc_boletas,
+    'certificados': esc_certificados,
+    'api': esc_api,
+    'segundo_plano': esc_segundo_plano
+}
+
+
+# --- Servidor ---------------------------------------------------------------
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(args):
+    """Arranca el servidor en un proceso hijo y espera a que responda. Devuelve (proceso, url)."""
+    puerto = puerto_libre()
+    entorno = dict(os.environ, ENTORNO='produccion', NIVEL_LOG=os.environ.get('NIVEL_LOG', 'WARNING'))
+    if not args.reutilizar:
+        entorno['MAX_RESULTADOS_POR_HUELLA'] = '0'
+    if args.gunicorn:
+        comando = ['gunicorn', '--preload', '--workers', str(args.gunicorn), '--threads', str(args.hilos),
+                   '--bind', f'127.0.0.1:{puerto}', '--timeout', '600', 'wsgi:app']
+    else:
+        comando = [sys.executable, '-c',
+                   f"import wsgi; wsgi.app.run(host='127.0.0.1', port={puerto}, threaded=True, use_reloader=False)"]
+    # Sesión propia para poder terminar también los procesos de cifrado y los workers
+    salida = None if args.mostrar_servidor else subprocess.DEVNULL
+    proceso = subprocess.Popen(comando, cwd=RAIZ, env=entorno, stdout=salida, stderr=salida, start_new_session=True)
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.time() + 60
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al iniciar (código {proceso.returncode})")
+        try:
+            solicitar(url + '/metrics')
+            return proceso, url
+        except OSError:
+            time.sleep(0.2)
+    detener_servidor(proceso)
+    raise RuntimeError('El servidor no respondió en 60 s')
+
+
+def detener_servidor(proceso):
+    try:
+        os.killpg(proceso.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        proceso.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proceso.pid, signal.SIGKILL)
+
+
+# --- Principal --------------------------------------------------------------
+
+def preparar_datos(args):
+    def leer(ruta):
+        with open(ruta, 'rb') as archivo:
+            return archivo.read()
+
+    libro = leer(args.libro_boletas) if args.libro_boletas else libro_empleados(args.empleados)
+    return {
+        'horas': libro_excel(generar_marcaciones(args.filas_horas), 'Horas'),
+        'boletas': libro,
+        'certificados': leer(args.libro_certificados) if args.libro_certificados else libro,
+        'pdfs': [pdf_sintetico(args.paginas, semilla=n) for n in range(args.pdfs)],
+        'api': generar_planilla(args.filas_api).to_csv(index=False).encode('utf-8')
+    }
+
+
+def ejecutar_escenario(nombre, base, datos, args, pid):
+    registro = Registro()
+    funcion = FUNCIONES_ESCENARIO[nombre]
+    with MonitorMemoria(pid) as monitor:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as ejecutor:
+            for futuro in [ejecutor.submit(funcion, base, registro, datos, args) for _ in range(args.iteraciones)]:
+                futuro.result()
+        duracion = time.perf_counter() - inicio
+    return registro, duracion, monitor.maximo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=ESCENARIOS)
+    parser.add_argument('--concurrencia', type=int, default=4, help='Clientes simultáneos')
+    parser.add_argument('--iteraciones', type=int, default=20, help='Ejecuciones de cada escenario')
+    parser.add_argument('--empleados', type=int, default=50, help='Filas del libro de boletas y certificados')
+    parser.add_argument('--filas-horas', type=int, default=5000)
+    parser.add_argument('--filas-api', type=int, default=10000)
+    parser.add_argument('--pdfs', type=int, default=5, help='PDFs por carga al protector')
+    parser.add_argument('--paginas', type=int, default=10, help='Páginas de cada PDF sintético')
+    parser.add_argument('--descargas', type=int, default=5, help='PDFs que se descargan después de cada carga')
+    parser.add_argument('--libro-boletas', help='Libro real para /boletas-pago')
+    parser.add_argument('--libro-certificados', help='Libro real para /certificados-utilidades')
+    parser.add_argument('--reutilizar', action='store_true', help='Mantener la reutilización de cargas repetidas')
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS', help='Levantar gunicorn con esta cantidad de workers')
+    parser.add_argument('--hilos', type=int, default=4, help='Hilos por worker de gunicorn')
+    parser.add_argument('--mostrar-servidor', action='store_true', help='Mostrar el registro de solicitudes del servidor')
+    parser.add_argument('--url', help='Usar un servidor ya levantado en lugar de iniciar uno')
+    parser.add_argument('--pid', type=int, help='PID del servidor indicado con --url, para medir su memoria')
+    parser.add_argument('--json', help='Guardar los resultados también en este archivo')
+    args = parser.parse_args()
+
+    print('Generando datos sintéticos...')
+    datos = preparar_datos(args)
+    print(f"  horas {len(datos['horas']) / 1024:.0f} KB, empleados {len(datos['boletas']) / 1024:.0f} KB, "
+          f"{args.pdfs} PDFs de {sum(map(len, datos['pdfs'])) / args.pdfs / 1024:.0f} KB, api {len(datos['api']) / 1024:.0f} KB")
+
+    proceso = None
+    if args.url:
+        base, pid = args.url.rstrip('/'), args.pid
+    else:
+        proceso, base = levantar_servidor(args)
+        pid = proceso.pid
+
+    filas = []
+    try:
+        for nombre in args.escenarios:
+            registro, duracion, rss = ejecutar_escenario(nombre, base, datos, args, pid)
+            for ruta, latencias in registro.latencias.items():
+                filas.append({
+                    'escenario': nombre,
+                    'ruta': ruta,
+                    'solicitudes': len(latencias),
+                    'errores': registro.errores[ruta],
+                    'por_segundo': len(latencias) / duracion,
+                    'p50_ms': percentil(latencias, 50) * 1000,
+                    'p95_ms': percentil(latencias, 95) * 1000,
+                    'p99_ms': percentil(latencias, 99) * 1000,
+                    'rss_max_mb': rss / 1024 / 1024
+                })
+    finally:
+        if proceso is not None:
+            detener_servidor(proceso)
+
+    tabla = pd.DataFrame(filas)
+    print(f"\nConcurrencia {args.concurrencia}, {args.iteraciones} iteraciones por escenario")
+    print(tabla.to_string(index=False, float_format=lambda valor: f"{valor:.1f}"))
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump(filas, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Generación del PDF de la boleta de pago a partir de los datos de un empleado.
+"""
+import io
+import datetime
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+
+MESES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+         "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+
+TOTALES_BOLETA = ['total_remuneracion', 'total_descuentos', 'total_aportes']
+
+
+def numero_o_cero(valor):
+    """Convierte un importe leído del Excel a número (0.0 si no lo es)"""
+    if isinstance(valor, (int, float)):
+        return valor
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def periodo_boleta(periodo):
+    """
+    Interpreta el periodo MM/AAAA de la boleta.
+    Devuelve (número de mes o None, nombre del mes, año) para el encabezado.
+    """
+    periodo_partes = str(periodo).split('/')
+    mes_num = None
+    mes = ""
+    año = ""
+
+    if len(periodo_partes) >= 2:
+        try:
+            mes_num = int(periodo_partes[0])
+            if 1 <= mes_num <= 12:
+                mes = MESES[mes_num - 1]
+            año = periodo_partes[1]
+        except (ValueError, IndexError):
+            mes = periodo_partes[0]
+            año = periodo_partes[1]
+
+    return mes_num, mes, año
+
+
+def fecha_pago_boleta(mes_num, año, fecha_actual=None):
+    """Fecha de pago DD/MM/AAAA: último día del mes del periodo (o la fecha actual si no se puede calcular)"""
+    fecha_actual = fecha_actual or datetime.datetime.now()
+
+    # Intentar obtener año y mes del periodo
+    año_pago = año if año else str(fecha_actual.year)
+    mes_pago = mes_num if mes_num is not None and 1 <= mes_num <= 12 else fecha_actual.month
+
+    # Crear fecha de pago (último día del mes)
+    try:
+        # Calcular el siguiente mes y año
+        if mes_pago == 12:
+            siguiente_mes = 1
+            siguiente_año = int(año_pago) + 1
+        else:
+            siguiente_mes = mes_pago + 1
+            siguiente_año = int(año_pago)
+
+        # El último día del mes es un día antes del primer día del siguiente mes
+        ultimo_dia = (datetime.datetime(siguiente_año, siguiente_mes, 1) - datetime.timedelta(days=1)).day
+        return f"{ultimo_dia:02d}/{mes_pago:02d}/{año_pago}"
+    except (ValueError, TypeError):
+        return f"{fecha_actual.strftime('%d/%m/%Y')}"
+
+
+def resumen_boleta(datos_empleado):
+    """Periodo, fecha de pago, totales y neto de una boleta que no pasó por preparacion_boletas"""
+    mes_num, mes, año = periodo_boleta(datos_empleado.get('periodo', ''))
+    return {
+        'mes': mes,
+        'año': año,
+        'fecha_pago': fecha_pago_boleta(mes_num, año),
+        'neto_pagar': numero_o_cero(datos_empleado.get('neto_pagar', 0)),
+        **{total: datos_empleado.get(total, 0) for total in TOTALES_BOLETA}
+    }
+
+
+def generar_boleta_pdf(datos):
+    """Genera la boleta de pago de un empleado y devuelve el PDF (sin cifrar) en un BytesIO"""
+    # Crear un buffer para el PDF
+    pdf_buffer = io.BytesIO()
+
+    # Crear el canvas
+    c = canvas.Canvas(pdf_buffer, pagesize=letter)
+    width, height = letter
+
+    # Obtener los datos
+    datos_empleado = datos['datos_personales']
+    ingresos = datos['ingresos']
+    descuentos = datos['descuentos']
+    aportes = datos['aportes']
+
+    # Periodo, totales y neto ya normalizados al preparar las boletas (preparacion_boletas);
+    # si no vienen, se calculan aquí
+    resumen = datos.get('resumen') or resumen_boleta(datos_empleado)
+    mes = resumen['mes']
+    año = resumen['año']
+
+    # Encabezado de la boleta
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(width - 50, height - 40, f"BOLETA DE PAGO {mes} {año}")
+    c.drawRightString(width - 50, height - 55, "D.S. N°017-2001-TR DEL 07-06-01")
+
+    # Información de la empresa
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, height - 80, "Razon Social:")
+    c.drawString(50, height - 95, "Domicilio   :")
+    c.drawString(50, height - 110, "R.U.C.      :")
+
+    c.setFont("Helvetica", 10)
+    c.drawString(130, height - 80, "EMPRESA S.A.C")
+    c.drawString(130, height - 95, "AV. PRINCIPAL 123 - CIUDAD")
+    c.drawString(130, height - 110, "20XXXXXXXXX")
+
+    # Línea separadora
+    c.line(50, height - 125, width - 50, height - 125)
+
+    # Datos del trabajador
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(50, height - 145, "DATOS DEL TRABAJADOR")
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, height - 165, "Nombre :")
+    c.drawString(50, height - 180, "Cargo :")
+
+    c.setFont("Helvetica", 10)
+    c.drawString(130, height - 165, f"{datos_empleado.get('nombre', '')}")
+    c.drawString(130, height - 180, f"{datos_empleado.get('cargo', '')}")
+
+    # Segunda fila de datos
+    c.setFont("Helvetica-Bold", 9)
+    y_pos = height - 200
+    c.drawString(50, y_pos, "Código :")
+    c.drawString(120, y_pos, f"{datos_empleado.get('dni', '')}")
+    c.drawString(180, y_pos, "T.Pensión :")
+    c.drawString(250, y_pos, "AFP Integra")
+    c.drawString(350, y_pos, "F.Ingr.:")
+    fecha_ingreso = str(datos_empleado.get('fecha_ingreso', ''))
+    c.drawString(400, y_pos, f"{fecha_ingreso}")
+    c.drawString(480, y_pos, "D.Trab :")
+    c.drawString(525, y_pos, "30")
+
+    # Línea separadora
+    y_pos -= 20
+    c.line(50, y_pos, width - 50, y_pos)
+
+    # Encabezados de secciones
+    y_pos -= 15
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, y_pos, "REMUNERACIONES")
+    c.drawString(300, y_pos, "DESCUENTOS TRABAJADOR")
+    c.drawString(480, y_pos, "APORTES EMPLEADOR")
+
+    # Línea separadora
+    y_pos -= 10
+    c.line(50, y_pos, width - 50, y_pos)
+
+    # Contenido de secciones
+    y_pos -= 25
+    c.setFont("Helvetica", 9)
+
+    # Alto de cada concepto; la altura de las columnas sale de la posición final de cada una (min_y)
+    item_height = 15
+
+    # Ingresos
+    ingreso_y = y_pos
+    for ingreso in ingresos:
+        c.drawString(50, ingreso_y, f"{ingreso['concepto']}")
+        c.drawRightString(250, ingreso_y, f"S/ {ingreso['monto']:.2f}")
+        ingreso_y -= item_height
+
+    # Descuentos
+    descuento_y = y_pos
+    for descuento in descuentos:
+        c.drawString(300, descuento_y, f"{descuento['concepto']}")
+        c.drawRightString(450, descuento_y, f"S/ {descuento['monto']:.2f}")
+        descuento_y -= item_height
+
+    # Aportes
+    aporte_y = y_pos
+    for aporte in aportes:
+        c.drawString(480, aporte_y, f"{aporte['concepto']}")
+        c.drawRightString(550, aporte_y, f"S/ {aporte['monto']:.2f}")
+        aporte_y -= item_height
+
+    # Calcular espacio usado
+    min_y = min(ingreso_y, descuento_y, aporte_y)
+
+    # Línea separadora
+    min_y -= 10
+    c.line(50, min_y, width - 50, min_y)
+
+    # Totales
+    min_y -= 25
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(50, min_y, "TOTAL HABER")
+    c.drawRightString(250, min_y, f"S/ {resumen['total_remuneracion']:.2f}")
+
+    c.drawString(300, min_y, "TOTAL DESCUENTOS")
+    c.drawRightString(450, min_y, f"S/ {resumen['total_descuentos']:.2f}")
+
+    c.drawString(480, min_y, "TOTAL APORTES")
+    c.drawRightString(550, min_y, f"S/ {resumen['total_aportes']:.2f}")
+
+    # Línea separadora
+    min_y -= 10
+    c.line(50, min_y, width - 50, min_y)
+
+    # Neto a pagar
+    min_y -= 20
+    c.drawString(50, min_y, "NETO A PAGAR EN:")
+
+    c.drawRightString(250, min_y, f"S/ {resumen['neto_pagar']:.2f}")
+
+    # Fecha de pago
+    min_y -= 20
+    c.drawString(50, min_y, "Fecha de Pago :")
+    c.drawString(130, min_y, resumen['fecha_pago'])
+
+    # Firmas
+    min_y -= 60
+    c.line(100, min_y, 250, min_y)
+    c.line(350, min_y, 500, min_y)
+
+    min_y -= 10
+    c.drawCentredString(175, min_y, "Empleador")
+    c.drawCentredString(425, min_y, "Trabajador")
+
+    # Finalizar el PDF
+    c.showPage()
+    c.save()
+
+    pdf_buffer.seek(0)
+    return pdf_buffer
@@ -0,0 +1,301 @@
+"""
+Caché persistente de hojas de Excel ya leídas (y de resultados procesados) en
+archivos Arrow IPC.
+
+Leer un XLSX es el paso más caro y la misma planilla mensual se vuelve a abrir
+muchas veces (reruns de Streamlit, varias sesiones, reinicios del servidor).
+Cada DataFrame se guarda en DIRECTORIO_CACHE_LIBROS con una clave derivada del
+hash del contenido subido; las siguientes aperturas mapean el archivo en memoria
+en lugar de volver a leer el Excel. Las columnas numéricas y de fechas quedan
+respaldadas por el mapeo sin copiarse, así que los procesos que abren la misma
+planilla comparten esas páginas a través de la caché del sistema operativo.
+
+Los DataFrames que salen de la caché tienen columnas de solo lectura: quien
+quiera modificar valores en su lugar debe trabajar sobre una copia (df.copy()),
+como ya hacen procesar_archivo_essalud y el motor de horas.
+
+Las planillas tienen datos personales: por defecto la caché vive en el
+directorio de caché del usuario (no en /tmp), el directorio se crea con
+permisos 0700 y cada archivo con 0600.
+
+pyarrow es opcional: si no está instalado (o CACHE_LIBROS=0) la caché no se usa.
+Cuando el directorio supera MAX_CACHE_LIBROS_MB se borran los archivos usados
+hace más tiempo.
+"""
+import os
+import json
+import hashlib
+import logging
+import datetime
+import threading
+import importlib.util
+import numpy as np
+import pandas as pd
+from metricas import registrar_almacen, registrar_expulsion
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+CACHE_LIBROS = os.environ.get('CACHE_LIBROS', 'auto')
+DIRECTORIO_CACHE_LIBROS = (os.environ.get('DIRECTORIO_CACHE_LIBROS')
+                           or os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                           'essalud_cache_libros'))
+MAX_CACHE_LIBROS_MB = float(os.environ.get('MAX_CACHE_LIBROS_MB', 512))
+
+# Cambia cuando cambia la forma en que se guardan los archivos
+VERSION_CACHE = 1
+
+EXTENSION = '.arrow'
+CLAVE_METADATOS = b'cache_libros'
+
+# Prefijo con el que se guarda cada tipo de valor de una columna con tipos mezclados
+# (por ejemplo fechas nativas y textos en la misma columna de fechas)
+_ETIQUETAS = {
+    'b': lambda texto: texto == '1',
+    'i': int,
+    'f': float,
+    'T': pd.Timestamp,
+    'd': datetime.datetime.fromisoformat,
+    'D': datetime.date.fromisoformat,
+    't': datetime.time.fromisoformat,
+    'r': lambda texto: datetime.timedelta(seconds=float(texto)),
+    's': str
+}
+
+
+def cache_disponible():
+    """Indica si la caché está habilitada y pyarrow instalado"""
+    return CACHE_LIBROS != '0' and MAX_CACHE_LIBROS_MB > 0 and importlib.util.find_spec('pyarrow') is not None
+
+
+def huella_origen(origen):
+    """
+    SHA-256 del contenido de una ruta, bytes u objeto tipo archivo (BytesIO,
+    UploadedFile de Streamlit). Un objeto tipo archivo queda en la posición en
+    que estaba.
+    """
+    resumen = hashlib.sha256()
+    if isinstance(origen, (bytes, bytearray, memoryview)):
+        resumen.update(origen)
+    elif isinstance(origen, (str, os.PathLike)):
+        with open(origen, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(MB), b''):
+                resumen.update(bloque)
+    elif hasattr(origen, 'getbuffer'):
+        resumen.update(origen.getbuffer())
+    else:
+        posicion = origen.tell()
+        origen.seek(0)
+        for bloque in iter(lambda: origen.read(MB), b''):
+            resumen.update(bloque)
+        origen.seek(posicion)
+    return resumen.hexdigest()
+
+
+def huella_codigo(*modulos):
+    """SHA-256 del código fuente de los módulos: invalida los resultados guardados si cambian las reglas"""
+    resumen = hashlib.sha256()
+    for modulo in modulos:
+        with open(modulo.__file__, 'rb') as archivo:
+            resumen.update(archivo.read())
+    return resumen.hexdigest()
+
+
+def clave_cache(*partes):
+    """Clave del archivo de caché a partir de la huella del contenido y de las opciones de lectura"""
+    texto = json.dumps([VERSION_CACHE, *partes], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _preparar_directorio():
+    """Crea DIRECTORIO_CACHE_LIBROS solo para el usuario (0700); rechaza un directorio de otro usuario"""
+    os.makedirs(DIRECTORIO_CACHE_LIBROS, mode=0o700, exist_ok=True)
+    estado = os.stat(DIRECTORIO_CACHE_LIBROS)
+    if hasattr(os, 'getuid') and estado.st_uid != os.getuid():
+        raise OSError(f"{DIRECTORIO_CACHE_LIBROS} pertenece a otro usuario")
+    if estado.st_mode & 0o077:
+        os.chmod(DIRECTORIO_CACHE_LIBROS, 0o700)
+
+
+def ruta_cache(clave):
+    return os.path.join(DIRECTORIO_CACHE_LIBROS, clave + EXTENSION)
+
+
+def _etiquetar(valor):
+    """Texto con prefijo de tipo para un valor de una columna mezclada (TypeError si no se puede guardar)"""
+    if isinstance(valor, (bool, np.bool_)):
+        return f"b:{int(valor)}"
+    if isinstance(valor, (int, np.integer)):
+        return f"i:{int(valor)}"
+    if isinstance(valor, (float, np.floating)):
+        return f"f:{float(valor)!r}"
+    if isinstance(valor, pd.Timestamp):
+        return f"T:{valor.isoformat()}"
+    if isinstance(valor, datetime.datetime):
+        return f"d:{valor.isoformat()}"
+    if isinstance(valor, datetime.date):
+        return f"D:{valor.isoformat()}"
+    if isinstance(valor, datetime.time):
+        return f"t:{valor.isoformat()}"
+    if isinstance(valor, datetime.timedelta):
+        return f"r:{valor.total_seconds()!r}"
+    if isinstance(valor, str):
+        return f"s:{valor}"
+    raise TypeError(f"Tipo no admitido en la caché: {type(valor).__name__}")
+
+
+def _columna_mezclada(pa, serie):
+    """Columna con tipos mezclados -> diccionario de textos etiquetados (se etiquetan solo los valores únicos)"""
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    diccionario = pa.array([_etiquetar(valor) for valor in unicos], type=pa.string())
+    indices = pa.array(codigos, type=pa.int32(), mask=codigos < 0)
+    return pa.DictionaryArray.from_arrays(indices, diccionario)
+
+
+def _restaurar_mezclada(columna):
+    """Diccionario de textos etiquetados -> Series object con los valores originales (nulos como NaN)"""
+    columna = columna.combine_chunks()
+    unicos = [_ETIQUETAS[texto[0]](texto[2:]) for texto in columna.dictionary.to_pylist()]
+    indices = columna.indices.fill_null(len(unicos)).to_numpy()
+    return pd.Series(np.array(unicos + [np.nan], dtype='object')[indices], dtype='object')
+
+
+def _tabla(pa, df):
+    """DataFrame -> (tabla Arrow, columnas mezcladas) o None si el DataFrame no se puede guardar tal cual"""
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        return None
+    if not all(isinstance(columna, str) for columna in df.columns) or df.columns.has_duplicates:
+        return None
+
+    arreglos, mezcladas = [], []
+    for columna in df.columns:
+        try:
+            arreglos.append(pa.array(df[columna], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            arreglos.append(_columna_mezclada(pa, df[columna]))
+            mezcladas.append(columna)
+    return pa.Table.from_arrays(arreglos, names=list(df.columns)), mezcladas
+
+
+def guardar_frame(clave, df):
+    """
+    Guarda el DataFrame (y sus attrs) con la clave indicada. Devuelve False si
+    la caché no está disponible o el DataFrame no se puede guardar; un error
+    aquí nunca interrumpe a quien llama.
+    """
+    if not cache_disponible():
+        return False
+    import pyarrow as pa
+
+    ruta = ruta_cache(clave)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        convertido = _tabla(pa, df)
+        if convertido is None:
+            return False
+        tabla, mezcladas = convertido
+        metadatos = {'mezcladas': mezcladas, 'attrs': df.attrs}
+        tabla = tabla.replace_schema_metadata({CLAVE_METADATOS: json.dumps(metadatos, default=str)})
+
+        _preparar_directorio()
+        # El archivo se crea con 0600 antes de que pyarrow escriba en él
+        os.close(os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        with pa.OSFile(temporal, 'wb') as archivo:
+            with pa.ipc.new_file(archivo, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        # El reemplazo atómico evita que otro proceso mapee un archivo a medio escribir
+        os.replace(temporal, ruta)
+    except (TypeError, ValueError, OSError) as e:
+        logger.warning(f"No se pudo guardar en la caché de libros: {str(e)}")
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        return False
+
+    recortar_cache(conservar=ruta)
+    return True
+
+
+def cargar_frame(clave):
+    """DataFrame guardado con la clave (mapeado en memoria) o None si no está en la caché"""
+    if not cache_disponible():
+        return None
+    import pyarrow as pa
+
+    ruta = ruta_cache(clave)
+    try:
+        # Sin cerrar el mapa: los arreglos del DataFrame apuntan a él y lo mantienen vivo
+        tabla = pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+    except FileNotFoundError:
+        return None
+    except (pa.ArrowInvalid, OSError) as e:
+        logger.warning(f"Archivo de caché dañado, se descarta: {ruta} ({str(e)})")
+        _eliminar(ruta)
+        return None
+
+    metadatos = json.loads((tabla.schema.metadata or {}).get(CLAVE_METADATOS, b'{}'))
+    mezcladas = set(metadatos.get('mezcladas', []))
+    df = tabla.drop_columns(list(mezcladas)).to_pandas(split_blocks=True)
+    for columna in mezcladas:
+        df[columna] = _restaurar_mezclada(tabla.column(columna))
+    df = df[tabla.column_names]
+    df.attrs.update(metadatos.get('attrs', {}))
+
+    # La fecha de modificación marca el último uso (para expulsar los menos usados)
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return df
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _archivos_cache():
+    """[(fecha de último uso, tamaño, ruta)] de los archivos de la caché"""
+    try:
+        entradas = list(os.scandir(DIRECTORIO_CACHE_LIBROS))
+    except FileNotFoundError:
+        return []
+    archivos = []
+    for entrada in entradas:
+        if entrada.name.endswith(EXTENSION):
+            try:
+                estado = entrada.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, entrada.path))
+    return archivos
+
+
+def recortar_cache(conservar=None):
+    """
+    Borra los archivos usados hace más tiempo hasta que la caché quede bajo
+    MAX_CACHE_LIBROS_MB. Un proceso que tenga mapeado un archivo borrado lo
+    sigue leyendo sin problemas.
+    """
+    archivos = sorted(_archivos_cache())
+    total = sum(tamaño for _, tamaño, _ in archivos)
+    limite = MAX_CACHE_LIBROS_MB * MB
+    for _, tamaño, ruta in archivos:
+        if total <= limite:
+            break
+        if ruta == conservar:
+            continue
+        if _eliminar(ruta):
+            registrar_expulsion('cache_libros')
+        total -= tamaño
+
+
+def medir_cache():
+    archivos = _archivos_cache()
+    return {'cache_libros': (len(archivos), sum(tamaño for _, tamaño, _ in archivos))}
+
+
+registrar_almacen(medir_cache)
@@ -2,6 +2,14 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from lector_excel import leer_excel
+from reglas_essalud import procesar_archivo_essalud_cacheado, COLUMNAS_REQUERIDAS
+from cache_libros import huella_origen
+from normalizador_fechas import resumen_lectura
+from motor_reglas import resumen_ramas
+from prorrateo_essalud import resumen_prorrateo
+from exportar_plame import exportar_plame_zip, columna_documento, validar_ruc_periodo
+from resumen_essalud import construir_cubo, totales, resumir
 
 # Configuración de la página
 st.set_page_config(
@@ -10,50 +18,6 @@ st.set_page_config(
     layout="wide"
 )
 
-def calcular_importe(row):
-    """Función para calcular el importe según las condiciones específicas"""
-    if pd.notna(row['fecha_cese']):  # Si hay fecha de cese
-        return row['Importe Bruto'] * 0.09
-    elif row['Días Subsidio'] > 0:
-        return 0  # Corregido: cuando hay días de subsidio, el importe calculado es 0
-    elif row['Importe Bruto'] < 1130 and row['Importe Bruto'] > 0:
-        return 1130 * 0.09
-    else:
-        return row['Importe Bruto'] * 0.09
-
-def calcular_calculo_dias_plame(row):
-    """Función para calcular CALCULO DIAS PLAME"""
-    if row['Días Subsidio'] > 0:
-        return round((101.70 / row['Dias_Mes']) * row['DIAS PLAME'], 2)
-    else:
-        return 0
-
-def procesar_archivo_essalud(df_input):
-    """Procesa el archivo aplicando todas las fórmulas de ESSALUD"""
-    try:
-        df = df_input.copy()
-        
-        # Convertir fechas
-        df['fecha_ingreso'] = pd.to_datetime(df['fecha_ingreso'], format='%d/%m/%Y', errors='coerce')
-        df['fecha_cese'] = pd.to_datetime(df['fecha_cese'], format='%d/%m/%Y', errors='coerce')
-        
-        # Calcular DIAS PLAME
-        df['DIAS PLAME'] = df['Dias_Mes'] - df['Días Subsidio']
-        
-        # Calcular Importe_Calculado
-        df['Importe_Calculado'] = df.apply(calcular_importe, axis=1)
-        
-        # Calcular CALCULO DIAS PLAME
-        df['CALCULO DIAS PLAME'] = df.apply(calcular_calculo_dias_plame, axis=1)
-        
-        # Calcular IMPORTE ESSALUD FINAL
-        df['IMPORTE ESSALUD FINAL'] = df[['Importe_Calculado', 'CALCULO DIAS PLAME', 'Importe ESSALUD EJB']].max(axis=1)
-        
-        return df, None
-        
-    except Exception as e:
-        return None, f"Error al procesar: {str(e)}"
-
 @st.cache_data
 def convertir_df_a_excel(df):
     """Convierte DataFrame a Excel para descarga"""
@@ -85,11 +49,12 @@ with st.sidebar:
     st.markdown("""
     ### Columnas requeridas en el Excel:
     
-    - `fecha_ingreso` (DD/MM/YYYY)
-    - `fecha_cese` (DD/MM/YYYY, opcional)
+    - `fecha_ingreso` (DD/MM/YYYY o fecha de Excel)
+    - `fecha_cese` (DD/MM/YYYY o fecha de Excel, opcional)
     - `Importe Bruto` (número)
     - `Días Subsidio` (número)
-    - `Dias_Mes` (número)
+    - `Dias_Mes` (número, días del mes completo)
+    - `Periodo` (AAAAMM o MM/AAAA, opcional: prorratea por ingreso y cese)
     - `Importe ESSALUD EJB` (número)
     
     ### Proceso:
@@ -99,6 +64,14 @@ with st.sidebar:
     4. Descarga el resultado
     """)
 
+    st.markdown("### 📄 Exportación PLAME")
+    ruc_empleador = st.text_input("RUC del empleador", max_chars=11)
+    periodo_plame = st.text_input("Periodo (AAAAMM)", value=datetime.now().strftime("%Y%m"), max_chars=6)
+    prorratear_periodo = st.checkbox(
+        "Prorratear días por ingreso y cese en este periodo", value=False,
+        help="Sin marcar, se prorratea solo si el Excel trae una columna Periodo"
+    )
+
 # Cargar archivo
 st.header("📂 Cargar Archivo Excel")
 archivo_subido = st.file_uploader(
@@ -110,7 +83,7 @@ archivo_subido = st.file_uploader(
 if archivo_subido is not None:
     try:
         # Leer archivo
-        df_original = pd.read_excel(archivo_subido)
+        df_original = leer_excel(archivo_subido)
         
         st.success("✅ Archivo cargado correctamente")
         
@@ -128,7 +101,7 @@ if archivo_subido is not None:
         st.dataframe(df_original.head(), use_container_width=True)
         
         # Verificar columnas
-        columnas_requeridas = ['fecha_ingreso', 'fecha_cese', 'Importe Bruto', 'Días Subsidio', 'Dias_Mes', 'Importe ESSALUD EJB']
+        columnas_requeridas = COLUMNAS_REQUERIDAS
         columnas_faltantes = [col for col in columnas_requeridas if col not in df_original.columns]
         
         if columnas_faltantes:
@@ -136,52 +109,119 @@ if archivo_subido is not None:
         else:
             st.success("✅ Todas las columnas requeridas están presentes")
             
-            # Procesar
+            # Procesar: el resultado queda en la sesión para que las descargas sigan
+            # disponibles en los reruns (al pulsar un botón de descarga, por ejemplo)
+            periodo_calculo = periodo_plame if prorratear_periodo else None
+            clave_resultado = (huella_origen(archivo_subido), periodo_calculo)
             if st.button("🚀 Procesar Cálculos de ESSALUD", type="primary"):
                 with st.spinner("Procesando..."):
-                    df_resultado, error = procesar_archivo_essalud(df_original)
+                    df_resultado, error = procesar_archivo_essalud_cacheado(df_original, clave_resultado[0], variante='corregida',
+                                                                            periodo=periodo_calculo)
                     
                     if error:
+                        st.session_state.pop('resultado_calculadora', None)
                         st.error(f"❌ Error: {error}")
                     else:
-                        st.success("✅ ¡Procesamiento completado!")
-                        
-                        # Métricas de resultados
-                        st.header("📈 Resultados")
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        with col1:
-                            total_final = df_resultado['IMPORTE ESSALUD FINAL'].sum()
-                            st.metric("Total ESSALUD Final", f"S/ {total_final:,.2f}")
-                        
-                        with col2:
-                            empleados_subsidio = (df_resultado['Días Subsidio'] > 0).sum()
-                            st.metric("Empleados con Subsidio", empleados_subsidio)
-                        
-                        with col3:
-                            empleados_cese = df_resultado['fecha_cese'].notna().sum()
-                            st.metric("Empleados con Cese", empleados_cese)
-                        
-                        with col4:
-                            promedio_plame = df_resultado['DIAS PLAME'].mean()
-                            st.metric("Promedio Días PLAME", f"{promedio_plame:.1f}")
-                        
-                        # Tabla de resultados
-                        st.subheader("Resultados completos:")
-                        st.dataframe(df_resultado, use_container_width=True)
-                        
-                        # Descarga
-                        st.header("💾 Descargar Resultados")
-                        
-                        excel_data = convertir_df_a_excel(df_resultado)
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        nombre_archivo = f"essalud_procesado_{timestamp}.xlsx"
-                        
+                        st.session_state['resultado_calculadora'] = {
+                            'clave': clave_resultado,
+                            'df': df_resultado,
+                            'cubo': construir_cubo(df_resultado),
+                            'descargas': {}
+                        }
+            
+            resultado = st.session_state.get('resultado_calculadora')
+            if resultado is not None and resultado['clave'] == clave_resultado:
+                df_resultado = resultado['df']
+                cubo = resultado['cubo']
+                st.success("✅ ¡Procesamiento completado!")
+                
+                # Métricas de resultados (del cubo de resumen, en una sola pasada)
+                st.header("📈 Resultados")
+                total = totales(cubo)
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Total ESSALUD Final", f"S/ {total['essalud_final']:,.2f}")
+                
+                with col2:
+                    st.metric("Empleados con Subsidio", int(total['con_subsidio']))
+                
+                with col3:
+                    st.metric("Empleados con Cese", int(total['con_cese']))
+                
+                with col4:
+                    st.metric("Promedio Días PLAME", f"{total['promedio_dias_plame']:.1f}")
+                
+                # Fechas que no se pudieron interpretar y caminos por los que se leyó cada una
+                lectura_fechas = df_resultado.attrs.get('lectura_fechas')
+                if lectura_fechas:
+                    fechas_invalidas = sum(conteo['invalido'] for conteo in lectura_fechas.values())
+                    if fechas_invalidas:
+                        st.warning(f"⚠️ {fechas_invalidas} fechas no se pudieron interpretar y quedaron vacías")
+                    with st.expander("🗓️ Lectura de fechas"):
+                        st.dataframe(resumen_lectura(lectura_fechas), use_container_width=True)
+                
+                # Filas cuyo mes se prorrateó por ingreso o cese (y las que quedaron sin días)
+                prorrateo = df_resultado.attrs.get('prorrateo')
+                if prorrateo and prorrateo['sin_periodo'] < len(df_resultado):
+                    if prorrateo['fuera']:
+                        st.warning(f"⚠️ {prorrateo['fuera']} empleados no tienen días en el periodo (ingreso posterior o cese anterior): su importe queda en 0")
+                    with st.expander("📅 Prorrateo de días por ingreso y cese"):
+                        st.dataframe(resumen_prorrateo(prorrateo), use_container_width=True)
+                
+                # Filas que tomó cada rama de las reglas en este cálculo
+                ramas_reglas = df_resultado.attrs.get('ramas_reglas')
+                if ramas_reglas:
+                    with st.expander(f"🧮 Ramas de las reglas (variante {df_resultado.attrs.get('variante_reglas')})"):
+                        st.dataframe(resumen_ramas(ramas_reglas), use_container_width=True)
+                
+                # Resumen por rama de la regla
+                st.subheader("Resumen por rama de la regla:")
+                st.dataframe(resumir(cubo, ['rama', 'origen_final'], ['empleados', 'essalud_final']), use_container_width=True)
+                
+                # Tabla de resultados
+                st.subheader("Resultados completos:")
+                st.dataframe(df_resultado, use_container_width=True)
+                
+                # Descarga (el Excel se arma una sola vez por resultado)
+                st.header("💾 Descargar Resultados")
+                
+                if 'excel' not in resultado['descargas']:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    resultado['descargas']['excel'] = (f"essalud_procesado_{timestamp}.xlsx", convertir_df_a_excel(df_resultado))
+                nombre_archivo, excel_data = resultado['descargas']['excel']
+                
+                st.download_button(
+                    label="📥 Descargar archivo Excel procesado",
+                    data=excel_data,
+                    file_name=nombre_archivo,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+
+                # Exportación a PLAME (requiere la columna del DNI)
+                st.subheader("📄 Archivos para PLAME")
+                st.caption("El .rem declara el Importe Bruto como remuneración básica (concepto 0121), la base sobre la que "
+                           "PLAME calcula el aporte a ESSALUD; el IMPORTE ESSALUD FINAL de esta tabla no se exporta.")
+                error_plame = validar_ruc_periodo(ruc_empleador, periodo_plame)
+                if error_plame:
+                    st.warning(f"Para exportar a PLAME indica el RUC y el periodo en la barra lateral: {error_plame}")
+                elif columna_documento(df_resultado) is None:
+                    st.warning("No se encontró la columna del DNI, necesaria para los archivos de PLAME")
+                else:
+                    clave_plame = ('plame', ruc_empleador, periodo_plame)
+                    try:
+                        if clave_plame not in resultado['descargas']:
+                            archivo_plame = io.BytesIO()
+                            exportar_plame_zip(df_resultado, ruc_empleador, periodo_plame, archivo_plame)
+                            resultado['descargas'][clave_plame] = archivo_plame.getvalue()
+                    except ValueError as e:
+                        st.error(f"❌ No se pudieron generar los archivos de PLAME: {e}")
+                    else:
                         st.download_button(
-                            label="📥 Descargar archivo Excel procesado",
-                            data=excel_data,
-                            file_name=nombre_archivo,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            label="📥 Descargar archivos PLAME (.jor, .snl, .rem)",
+                            data=resultado['descargas'][clave_plame],
+                            file_name=f"plame_{periodo_plame}_{ruc_empleador}.zip",
+                            mime="application/zip"
                         )
 
     except Exception as e:
@@ -0,0 +1,60 @@
+"""
+Calentamiento de la aplicación antes de atender solicitudes.
+
+Importa y ejercita una vez las dependencias pesadas (reportlab con sus fuentes
+y su cifrado, pypdf, los lectores y escritores de Excel) y compila las
+plantillas, para que ese costo lo pague el arranque y no la primera solicitud
+que atiende el servidor.
+"""
+import io
+import time
+import logging
+import pandas as pd
+from reportlab.pdfgen import canvas
+from cifrado_pdf import cifrar_pdf
+from lector_excel import leer_excel
+
+logger = logging.getLogger(__name__)
+
+# Fuentes que usan las boletas de pago
+FUENTES_PDF = ('Helvetica', 'Helvetica-Bold')
+
+
+def _pagina_pdf():
+    """PDF de una página con las fuentes de las boletas"""
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer)
+    for posicion, fuente in enumerate(FUENTES_PDF):
+        lienzo.setFont(fuente, 10)
+        lienzo.drawString(72, 720 - posicion * 14, 'Calentamiento S/ 1,130.00')
+    lienzo.save()
+    return buffer.getvalue()
+
+
+def _calentar_pdf():
+    """Renderiza una página y la cifra como a las boletas y los certificados"""
+    cifrar_pdf(_pagina_pdf(), 'calentamiento')
+
+
+def _calentar_excel():
+    """Escribe y vuelve a leer un libro mínimo con los mismos motores que usan las rutas"""
+    libro = io.BytesIO()
+    with pd.ExcelWriter(libro, engine='openpyxl') as writer:
+        pd.DataFrame({'Hora Inicio': ['08:00'], 'Importe': [1130.0]}).to_excel(writer, index=False, sheet_name='Hoja')
+    libro.seek(0)
+    leer_excel(libro, hoja='Hoja')
+
+
+def calentar(app):
+    """Carga por adelantado lo que la aplicación haría en su primera solicitud"""
+    inicio = time.perf_counter()
+
+    _calentar_pdf()
+    _calentar_excel()
+
+    # Compilar todas las plantillas (quedan en la caché de Jinja)
+    plantillas = app.jinja_env.list_templates()
+    for nombre in plantillas:
+        app.jinja_env.get_template(nombre)
+
+    logger.info(f"Calentamiento completado en {time.perf_counter() - inicio:.2f} s ({len(plantillas)} plantillas)")
@@ -0,0 +1,115 @@
+"""
+Manejo de archivos subidos sin duplicarlos en memoria.
+
+Las cargas pequeñas se conservan como bytes; las que superan el umbral se
+entregan a los lectores como ruta de un archivo temporal, de modo que varios
+archivos grandes en paralelo no agotan la memoria del worker. El archivo en
+el que la solicitud recibió la carga (flujo_carga) se reutiliza con un enlace
+duro, sin volver a escribir el contenido.
+"""
+import io
+import os
+import json
+import hashlib
+import logging
+import uuid
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Tamaño a partir del cual una carga se guarda en disco en lugar de memoria
+UMBRAL_CARGA_DISCO = int(float(os.environ.get('UMBRAL_CARGA_DISCO_MB', 1)) * MB)
+
+# Directorio para los archivos temporales de las cargas
+DIRECTORIO_CARGAS = os.environ.get('DIRECTORIO_CARGAS') or tempfile.gettempdir()
+
+
+def flujo_carga(tamaño_total):
+    """
+    Archivo donde la solicitud recibe una carga: en memoria si la solicitud es
+    pequeña, o un archivo con nombre en DIRECTORIO_CARGAS (se borra al cerrarse)
+    que guardar_carga puede conservar sin copiarlo.
+    """
+    if tamaño_total is not None and tamaño_total <= UMBRAL_CARGA_DISCO:
+        return io.BytesIO()
+    return tempfile.NamedTemporaryFile(prefix='recepcion_', dir=DIRECTORIO_CARGAS)
+
+
+def guardar_carga(archivo):
+    """
+    Guarda un archivo subido (FileStorage). Devuelve sus bytes si es pequeño
+    o la ruta de un archivo temporal si supera UMBRAL_CARGA_DISCO.
+    """
+    stream = archivo.stream
+    stream.seek(0, os.SEEK_END)
+    tamaño = stream.tell()
+    stream.seek(0)
+
+    if tamaño <= UMBRAL_CARGA_DISCO:
+        return archivo.read()
+
+    _, extension = os.path.splitext(archivo.filename or '')
+    ruta = os.path.join(DIRECTORIO_CARGAS, f"carga_{uuid.uuid4().hex}{extension}")
+
+    # La carga ya está en disco (flujo_carga): se conserva con otro nombre
+    ruta_recibida = getattr(stream, 'name', None)
+    if isinstance(ruta_recibida, str) and os.path.exists(ruta_recibida):
+        stream.flush()
+        try:
+            os.link(ruta_recibida, ruta)
+            logger.debug(f"Carga {archivo.filename} ({tamaño} bytes) conservada en {ruta}")
+            return ruta
+        except OSError as e:
+            logger.debug(f"No se pudo enlazar {ruta_recibida} ({e}); se copia la carga")
+
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    os.close(descriptor)
+    archivo.save(ruta)
+    logger.debug(f"Carga {archivo.filename} ({tamaño} bytes) guardada en {ruta}")
+    return ruta
+
+
+def abrir_carga(carga):
+    """Devuelve algo que los lectores (pandas, openpyxl, pypdf) aceptan: BytesIO o ruta"""
+    if isinstance(carga, (bytes, bytearray)):
+        return io.BytesIO(carga)
+    return carga
+
+
+def leer_carga(carga):
+    """Devuelve el contenido completo de la carga como bytes"""
+    if isinstance(carga, (bytes, bytearray)):
+        return bytes(carga)
+    with open(carga, 'rb') as archivo:
+        return archivo.read()
+
+
+def huella_cargas(cargas, opciones):
+    """
+    Calcula un resumen SHA-256 del contenido de las cargas y de las opciones del
+    formulario, para reconocer cuando se vuelve a subir lo mismo.
+    """
+    resumen = hashlib.sha256()
+    for carga in cargas:
+        # El tamaño delante de cada carga evita que dos listas distintas den el mismo flujo de bytes
+        if isinstance(carga, (bytes, bytearray)):
+            resumen.update(f"{len(carga)}:".encode('ascii'))
+            resumen.update(carga)
+        else:
+            resumen.update(f"{os.path.getsize(carga)}:".encode('ascii'))
+            with open(carga, 'rb') as archivo:
+                for bloque in iter(lambda: archivo.read(MB), b''):
+                    resumen.update(bloque)
+    resumen.update(json.dumps(opciones, sort_keys=True, default=str).encode('utf-8'))
+    return resumen.hexdigest()
+
+
+def liberar_carga(carga):
+    """Elimina el archivo temporal de la carga, si lo tiene"""
+    if isinstance(carga, str):
+        try:
+            os.remove(carga)
+        except FileNotFoundError:
+            pass
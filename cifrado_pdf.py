@@ -0,0 +1,61 @@
+"""
+Utilidades para generar PDFs protegidos con contraseña.
+
+La contraseña de cada documento se deriva del DNI del empleado, igual que
+cuando se protege un PDF usando su nombre de archivo. Boletas y certificados
+se cifran igual, con AES-256 de pypdf sobre el PDF ya generado: el AES-256 de
+reportlab escribe claves (UE/OE) de 48 bytes en lugar de 32 y otros lectores
+no pueden abrir esos PDFs.
+"""
+import io
+
+
+def contraseña_empleado(dni):
+    """
+    Normaliza el DNI leído del Excel para usarlo como contraseña.
+    Excel suele devolverlo como número (12345678.0) y pierde los ceros iniciales.
+    """
+    if dni is None:
+        return None
+    texto = str(dni).strip()
+    if texto.endswith('.0'):
+        texto = texto[:-2]
+    if not texto or texto.lower() == 'nan':
+        return None
+    if texto.isdigit() and len(texto) < 8:
+        texto = texto.zfill(8)
+    return texto
+
+
+def sin_contraseña(nombres, contraseñas):
+    """Nombres (en orden) de los documentos que no tienen contraseña: DNI vacío o no válido"""
+    return [nombre for nombre, contraseña in zip(nombres, contraseñas) if not contraseña]
+
+
+def validar_contraseñas(nombres, contraseñas, documentos='los documentos'):
+    """
+    Lanza ValueError si algún documento quedaría sin contraseña: se rechaza la
+    carga completa antes que entregar un PDF sin cifrar.
+    """
+    faltantes = sin_contraseña(nombres, contraseñas)
+    if faltantes:
+        muestra = ', '.join(str(nombre) for nombre in faltantes[:5])
+        resto = f' y {len(faltantes) - 5} más' if len(faltantes) > 5 else ''
+        raise ValueError(
+            f'No se pueden proteger {documentos} con el DNI porque falta el DNI de: {muestra}{resto}. '
+            f'Completa la columna del DNI o desmarca la protección.'
+        )
+
+
+def cifrar_pdf(contenido, contraseña):
+    """
+    Cifra un PDF ya generado (bytes) con AES-256 y devuelve los bytes protegidos.
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter(clone_from=io.BytesIO(contenido))
+    # AES-256 necesita cryptography (o pycryptodome) junto a pypdf
+    writer.encrypt(user_password=contraseña, algorithm='AES-256')
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
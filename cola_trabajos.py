@@ -0,0 +1,260 @@
+"""
+Cola local de trabajos en segundo plano.
+
+Los trabajos largos (archivos Excel grandes, lotes de PDFs) se ejecutan en un
+pool de hilos sin depender de un broker externo. El estado y el progreso de
+cada trabajo se guardan en una tabla SQLite; el resultado queda en la memoria
+del proceso que ejecutó el trabajo, junto a los PDFs que generó, durante
+DURACION_TRABAJOS y hasta MAX_RESULTADOS_TRABAJOS resultados.
+
+Como los resultados y los PDFs viven en memoria, la aplicación debe atenderse
+desde un solo proceso (con varios hilos): reservar_servidor registra en la
+misma base de datos qué proceso atiende, y la aplicación no arranca en otro
+proceso mientras ese siga activo.
+"""
+import os
+import time
+import uuid
+import logging
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from metricas import registrar_almacen, registrar_expulsion
+
+logger = logging.getLogger(__name__)
+
+# Archivo SQLite con la tabla de trabajos
+RUTA_BD_TRABAJOS = os.environ.get(
+    'RUTA_BD_TRABAJOS', os.path.join(tempfile.gettempdir(), 'essalud_trabajos.db')
+)
+
+# Hilos que ejecutan trabajos en paralelo
+HILOS_TRABAJOS = int(os.environ.get('HILOS_TRABAJOS', 2))
+
+# Antigüedad (en segundos) a partir de la cual se borran los trabajos terminados y sus resultados
+DURACION_TRABAJOS = int(os.environ.get('DURACION_TRABAJOS', 24 * 3600))
+
+# Resultados que se mantienen en memoria (los más antiguos se descartan)
+MAX_RESULTADOS_TRABAJOS = int(os.environ.get('MAX_RESULTADOS_TRABAJOS', 200))
+
+# Intervalo mínimo (en segundos) entre dos limpiezas de la tabla de trabajos
+INTERVALO_PURGA = 600
+
+# Intervalo mínimo (en segundos) entre dos escrituras del progreso de un trabajo
+INTERVALO_PROGRESO = 0.5
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_EN_PROCESO = 'en_proceso'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_ERROR = 'error'
+
+_ejecutor = ThreadPoolExecutor(max_workers=HILOS_TRABAJOS, thread_name_prefix='trabajo')
+
+# Resultados de los trabajos ejecutados por este proceso (id -> (momento, resultado)), del más antiguo al más reciente
+_resultados = OrderedDict()
+_lock = threading.Lock()
+_ultima_purga = [0.0]
+
+
+@contextmanager
+def _conexion():
+    conexion = sqlite3.connect(RUTA_BD_TRABAJOS, timeout=10)
+    conexion.row_factory = sqlite3.Row
+    try:
+        with conexion:
+            yield conexion
+    finally:
+        conexion.close()
+
+
+def _proceso_activo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _inicializar():
+    """Crea la tabla y marca como fallidos los trabajos de procesos que ya no existen"""
+    with _conexion() as conexion:
+        # WAL permite leer el progreso mientras otro proceso lo actualiza
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                completados INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                mensaje TEXT,
+                pid INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )
+        """)
+        conexion.execute("""
+            CREATE TABLE IF NOT EXISTS servidor (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                pid INTEGER NOT NULL
+            )
+        """)
+        conexion.execute(
+            "DELETE FROM trabajos WHERE actualizado < ?",
+            (time.time() - DURACION_TRABAJOS,)
+        )
+        interrumpidos = conexion.execute(
+            "SELECT id, pid FROM trabajos WHERE estado IN (?, ?)",
+            (ESTADO_PENDIENTE, ESTADO_EN_PROCESO)
+        ).fetchall()
+        for fila in interrumpidos:
+            if not _proceso_activo(fila['pid']):
+                conexion.execute(
+                    "UPDATE trabajos SET estado = ?, mensaje = ?, actualizado = ? WHERE id = ?",
+                    (ESTADO_ERROR, 'El trabajo se interrumpió al reiniciar el servidor', time.time(), fila['id'])
+                )
+
+
+def purgar(forzar=False):
+    """
+    Borra los trabajos terminados y los resultados en memoria más antiguos que
+    DURACION_TRABAJOS. Sin `forzar`, limpia como mucho una vez cada INTERVALO_PURGA.
+    """
+    ahora = time.time()
+    if not forzar and ahora - _ultima_purga[0] < INTERVALO_PURGA:
+        return
+    _ultima_purga[0] = ahora
+    limite = ahora - DURACION_TRABAJOS
+
+    with _lock:
+        while _resultados and next(iter(_resultados.values()))[0] < limite:
+            _resultados.popitem(last=False)
+            registrar_expulsion('resultados_trabajos')
+    with _conexion() as conexion:
+        conexion.execute(
+            "DELETE FROM trabajos WHERE actualizado < ? AND estado IN (?, ?)",
+            (limite, ESTADO_COMPLETADO, ESTADO_ERROR)
+        )
+
+
+def _guardar_resultado(trabajo_id, resultado):
+    with _lock:
+        _resultados[trabajo_id] = (time.time(), resultado)
+        while len(_resultados) > MAX_RESULTADOS_TRABAJOS:
+            _resultados.popitem(last=False)
+            registrar_expulsion('resultados_trabajos')
+
+
+def _actualizar(trabajo_id, **campos):
+    campos['actualizado'] = time.time()
+    asignaciones = ', '.join(f"{campo} = ?" for campo in campos)
+    with _conexion() as conexion:
+        conexion.execute(
+            f"UPDATE trabajos SET {asignaciones} WHERE id = ?",
+            (*campos.values(), trabajo_id)
+        )
+
+
+def _ejecutar(trabajo_id, funcion, args, kwargs):
+    _actualizar(trabajo_id, estado=ESTADO_EN_PROCESO)
+
+    ultima_escritura = [0.0]
+
+    def reportar(completados, total):
+        ahora = time.monotonic()
+        if completados < total and ahora - ultima_escritura[0] < INTERVALO_PROGRESO:
+            return
+        ultima_escritura[0] = ahora
+        _actualizar(trabajo_id, completados=completados, total=total)
+
+    try:
+        resultado = funcion(*args, progreso=reportar, **kwargs)
+    except Exception as e:
+        logger.exception(f"Error en el trabajo {trabajo_id}")
+        _actualizar(trabajo_id, estado=ESTADO_ERROR, mensaje=str(e))
+        return
+
+    _guardar_resultado(trabajo_id, resultado)
+    _actualizar(trabajo_id, estado=ESTADO_COMPLETADO)
+
+
+def encolar(tipo, funcion, *args, **kwargs):
+    """
+    Registra un trabajo y lo ejecuta en segundo plano. Devuelve su ID.
+    `funcion` recibe el argumento `progreso`, una función progreso(completados, total)
+    para informar el avance.
+    """
+    purgar()
+    trabajo_id = str(uuid.uuid4())
+    ahora = time.time()
+    with _conexion() as conexion:
+        conexion.execute(
+            "INSERT INTO trabajos (id, tipo, estado, pid, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+            (trabajo_id, tipo, ESTADO_PENDIENTE, os.getpid(), ahora, ahora)
+        )
+    _ejecutor.submit(_ejecutar, trabajo_id, funcion, args, kwargs)
+    return trabajo_id
+
+
+def registrar_resultado(tipo, resultado):
+    """Registra como completado un trabajo cuyo resultado ya se tenía. Devuelve su ID"""
+    purgar()
+    trabajo_id = str(uuid.uuid4())
+    ahora = time.time()
+    _guardar_resultado(trabajo_id, resultado)
+    with _conexion() as conexion:
+        conexion.execute(
+            "INSERT INTO trabajos (id, tipo, estado, completados, total, pid, creado, actualizado) "
+            "VALUES (?, ?, ?, 1, 1, ?, ?, ?)",
+            (trabajo_id, tipo, ESTADO_COMPLETADO, os.getpid(), ahora, ahora)
+        )
+    return trabajo_id
+
+
+def obtener_trabajo(trabajo_id):
+    """Devuelve el estado del trabajo como diccionario, o None si no existe"""
+    with _conexion() as conexion:
+        fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+    if fila is None:
+        return None
+    trabajo = dict(fila)
+    trabajo['progreso'] = round(100 * trabajo['completados'] / trabajo['total'], 1) if trabajo['total'] else 0.0
+    return trabajo
+
+
+def obtener_resultado(trabajo_id):
+    """Devuelve el resultado de un trabajo completado por este proceso (si no expiró), o None"""
+    with _lock:
+        guardado = _resultados.get(trabajo_id)
+    if guardado is None or guardado[0] < time.time() - DURACION_TRABAJOS:
+        return None
+    return guardado[1]
+
+
+def reservar_servidor():
+    """
+    Registra este proceso como el que atiende la aplicación. Devuelve False si
+    ya la atiende otro proceso que sigue activo.
+    """
+    with _conexion() as conexion:
+        # La reserva se lee y se escribe en una sola transacción de escritura
+        conexion.execute("BEGIN IMMEDIATE")
+        fila = conexion.execute("SELECT pid FROM servidor WHERE id = 1").fetchone()
+        if fila is not None and fila['pid'] != os.getpid() and _proceso_activo(fila['pid']):
+            return False
+        conexion.execute("INSERT OR REPLACE INTO servidor (id, pid) VALUES (1, ?)", (os.getpid(),))
+    return True
+
+
+def medir_resultados():
+    with _lock:
+        return {'resultados_trabajos': (len(_resultados), 0)}
+
+
+_inicializar()
+registrar_almacen(medir_resultados)
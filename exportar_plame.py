@@ -0,0 +1,196 @@
+"""
+Exportación de los resultados de ESSALUD a archivos de importación del PDT PLAME.
+
+Se generan los archivos de jornada laboral (.jor), días subsidiados (.snl) y
+remuneraciones (.rem) con el nombre 0601AAAAMMRUC.ext que espera SUNAT. Cada
+archivo se escribe por bloques de filas: los campos de un bloque se arman con
+operaciones sobre columnas y se serializan con el escritor CSV de pandas, sin
+armar las líneas una por una, así que la memoria adicional no crece con la planilla.
+
+El tipo de documento sale de la columna de la planilla cuando la trae (DNI si
+no). Los archivos se escriben en latin-1, la codificación que lee PLAME: un
+carácter que no existe en ella detiene la exportación en lugar de reemplazarse.
+
+El .rem declara el Importe Bruto como remuneración básica (concepto 0121), que
+es la base sobre la que PLAME calcula el aporte a ESSALUD. El IMPORTE ESSALUD
+FINAL de esta aplicación (con sus mínimos y el importe EJB) no se exporta: PLAME
+no lo importa, así que hay que compararlo con el aporte que calcula el PDT.
+"""
+import os
+import re
+import zipfile
+import pandas as pd
+
+SEPARADOR = '|'
+
+# PLAME es una aplicación de Windows: las líneas terminan en CRLF
+FIN_LINEA = '\r\n'
+
+FILAS_POR_BLOQUE = int(os.environ.get('FILAS_POR_BLOQUE_PLAME', 50000))
+
+# PLAME lee los archivos en latin-1
+CODIFICACION = 'latin-1'
+
+# Códigos de las tablas paramétricas de PLAME
+TIPO_DOCUMENTO_DNI = '01'
+# Tabla 3 (tipo de documento de identidad): códigos por su nombre habitual en las planillas
+TIPOS_DOCUMENTO = {
+    'DNI': TIPO_DOCUMENTO_DNI,
+    'CE': '04',
+    'CARNE DE EXTRANJERIA': '04',
+    'CARNÉ DE EXTRANJERÍA': '04',
+    'RUC': '06',
+    'PASAPORTE': '07',
+    'PARTIDA DE NACIMIENTO': '11',
+    'PTP': '23'
+}
+CONCEPTO_REMUNERACION_BASICA = '0121'
+SUSPENSION_INCAPACIDAD_TEMPORAL = '21'
+
+HORAS_POR_DIA = 8
+
+# Nombres con los que suele venir el documento del trabajador en las planillas
+COLUMNAS_DOCUMENTO = ('DNI', 'Dni', 'dni', 'Nro Documento', 'Número de Documento', 'Numero de Documento')
+COLUMNAS_TIPO_DOCUMENTO = ('Tipo Documento', 'Tipo de Documento', 'TIPO DOCUMENTO', 'Tipo Doc', 'tipo_documento')
+
+
+def columna_documento(df):
+    """Nombre de la columna con el DNI del trabajador, o None si no hay ninguna"""
+    return next((col for col in COLUMNAS_DOCUMENTO if col in df.columns), None)
+
+
+def columna_tipo_documento(df):
+    """Nombre de la columna con el tipo de documento, o None si no hay ninguna (se asume DNI)"""
+    return next((col for col in COLUMNAS_TIPO_DOCUMENTO if col in df.columns), None)
+
+
+def _tipos_documento(serie):
+    """
+    Código PLAME del tipo de documento de cada fila: códigos numéricos (1, '04')
+    o nombres de TIPOS_DOCUMENTO; las celdas vacías quedan como DNI.
+    """
+    texto = serie.astype('string').str.strip().str.replace(r'\.0$', '', regex=True).str.upper()
+    codigos = texto.map(TIPOS_DOCUMENTO).astype('string')
+    numericos = texto.str.fullmatch(r'\d{1,2}', na=False)
+    codigos = codigos.mask(numericos, texto.str.zfill(2))
+    desconocidos = texto.notna() & (texto != '') & codigos.isna()
+    if desconocidos.any():
+        raise ValueError(f"Tipo de documento desconocido: {texto[desconocidos].iloc[0]} "
+                         f"(usa el código de PLAME o {', '.join(TIPOS_DOCUMENTO)})")
+    return codigos.fillna(TIPO_DOCUMENTO_DNI)
+
+
+def _documentos(serie, tipos):
+    """Normaliza los documentos; los DNI se completan a 8 dígitos como en cifrado_pdf.contraseña_empleado"""
+    texto = serie.astype('string').str.strip().str.replace(r'\.0$', '', regex=True)
+    es_dni_corto = texto.str.fullmatch(r'\d{1,7}', na=False) & (tipos == TIPO_DOCUMENTO_DNI)
+    return texto.where(~es_dni_corto, texto.str.zfill(8))
+
+
+def _campos_jor(bloque, tipos, documentos):
+    horas = (pd.to_numeric(bloque['DIAS PLAME'], errors='coerce').fillna(0).clip(lower=0) * HORAS_POR_DIA)
+    return pd.DataFrame({
+        'tipo_documento': tipos,
+        'documento': documentos,
+        'horas_ordinarias': horas.round().astype('int64'),
+        'minutos_ordinarios': 0,
+        'horas_sobretiempo': 0,
+        'minutos_sobretiempo': 0
+    })
+
+
+def _campos_snl(bloque, tipos, documentos):
+    dias = pd.to_numeric(bloque['Días Subsidio'], errors='coerce').fillna(0)
+    con_subsidio = (dias > 0).to_numpy()
+    return pd.DataFrame({
+        'tipo_documento': tipos[con_subsidio],
+        'documento': documentos[con_subsidio],
+        'tipo_suspension': SUSPENSION_INCAPACIDAD_TEMPORAL,
+        'dias': dias[con_subsidio].round().astype('int64')
+    })
+
+
+def _campos_rem(bloque, tipos, documentos):
+    # Se declara la remuneración (base del aporte), no el IMPORTE ESSALUD FINAL calculado
+    importe = pd.to_numeric(bloque['Importe Bruto'], errors='coerce').fillna(0).round(2)
+    return pd.DataFrame({
+        'tipo_documento': tipos,
+        'documento': documentos,
+        'concepto': CONCEPTO_REMUNERACION_BASICA,
+        'monto_devengado': importe,
+        'monto_pagado': importe
+    })
+
+
+# Extensión del archivo -> (descripción, función que arma los campos de un bloque)
+ARCHIVOS_PLAME = {
+    'jor': ('Jornada laboral', _campos_jor),
+    'snl': ('Días subsidiados y no laborados', _campos_snl),
+    'rem': ('Remuneraciones', _campos_rem)
+}
+
+
+def nombre_archivo_plame(ruc, periodo, extension):
+    """Nombre que PLAME espera: 0601 + periodo AAAAMM + RUC + extensión"""
+    return f"0601{periodo}{ruc}.{extension}"
+
+
+def validar_ruc_periodo(ruc, periodo):
+    """Devuelve un mensaje de error si el RUC o el periodo no tienen el formato de PLAME, o None"""
+    if not re.fullmatch(r'\d{11}', ruc or ''):
+        return 'El RUC debe tener 11 dígitos'
+    if not re.fullmatch(r'\d{4}(0[1-9]|1[0-2])', periodo or ''):
+        return 'El periodo debe tener el formato AAAAMM'
+    return None
+
+
+def generar_plame(df, extension, filas_por_bloque=None):
+    """
+    Genera el contenido de un archivo PLAME por partes (texto de un bloque de
+    filas a la vez). Las filas sin DNI se omiten.
+    """
+    filas_por_bloque = filas_por_bloque or FILAS_POR_BLOQUE
+    _, armar_campos = ARCHIVOS_PLAME[extension]
+    columna = columna_documento(df)
+    if columna is None:
+        raise ValueError(f"No se encontró la columna del DNI ({', '.join(COLUMNAS_DOCUMENTO)})")
+    columna_tipo = columna_tipo_documento(df)
+
+    for inicio in range(0, len(df), filas_por_bloque):
+        bloque = df.iloc[inicio:inicio + filas_por_bloque]
+        if columna_tipo is None:
+            tipos = pd.Series(TIPO_DOCUMENTO_DNI, index=bloque.index, dtype='string')
+        else:
+            tipos = _tipos_documento(bloque[columna_tipo])
+        documentos = _documentos(bloque[columna], tipos)
+        con_documento = (documentos.fillna('') != '').to_numpy()
+        campos = armar_campos(bloque[con_documento], tipos[con_documento].to_numpy(), documentos[con_documento].to_numpy())
+        if campos.empty:
+            continue
+        # Columna vacía al final para que cada línea termine en el separador, como pide PLAME
+        campos[''] = ''
+        yield campos.to_csv(sep=SEPARADOR, header=False, index=False, float_format='%.2f', lineterminator=FIN_LINEA)
+
+
+def exportar_plame_zip(df, ruc, periodo, destino, filas_por_bloque=None):
+    """
+    Escribe en `destino` (ruta o archivo binario) un ZIP con los archivos .jor,
+    .snl y .rem. Devuelve {nombre_archivo: líneas escritas}. Lanza ValueError
+    si algún dato tiene caracteres que no se pueden escribir en latin-1.
+    """
+    resumen = {}
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for extension in ARCHIVOS_PLAME:
+            nombre = nombre_archivo_plame(ruc, periodo, extension)
+            lineas = 0
+            with zf.open(nombre, 'w') as archivo:
+                for parte in generar_plame(df, extension, filas_por_bloque):
+                    try:
+                        archivo.write(parte.encode(CODIFICACION))
+                    except UnicodeEncodeError as e:
+                        linea = lineas + parte.count(FIN_LINEA, 0, e.start) + 1
+                        raise ValueError(f"{nombre}, línea {linea}: el carácter {e.object[e.start]!r} "
+                                         f"no se puede escribir en {CODIFICACION}") from None
+                    lineas += parte.count(FIN_LINEA)
+            resumen[nombre] = lineas
+    return resumen
@@ -0,0 +1,76 @@
+"""
+Trabajo diferido de los PDFs hasta su primera descarga.
+
+Los artefactos se registran con la función que produce sus bytes finales y
+esa función se ejecuta la primera vez que se descargan (o cuando la precarga
+en segundo plano llega a ellos). Los bytes resultantes quedan en caché para
+las descargas siguientes.
+
+Lo que se difiere depende de quien registra el artefacto: las boletas se
+renderizan y cifran en ese momento (solo se guardan sus datos), mientras que
+los certificados llegan ya renderizados por procesar_certificados_batch, que
+genera todo el lote en una sola llamada, y solo se difiere su cifrado; sus
+bytes sin cifrar quedan en memoria desde la carga.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Hilos dedicados a la precarga en segundo plano
+HILOS_PRECARGA = int(os.environ.get('HILOS_PRECARGA', min(4, os.cpu_count() or 1)))
+
+# Cantidad máxima de artefactos que se precargan por cada lote registrado
+LIMITE_PRECARGA = int(os.environ.get('LIMITE_PRECARGA', 20))
+
+_ejecutor = ThreadPoolExecutor(max_workers=HILOS_PRECARGA, thread_name_prefix='precarga')
+
+
+def crear_artefacto_diferido(generar, nombre_archivo, tipo='certificado'):
+    """
+    Crea la entrada de un artefacto que se completa bajo demanda.
+    `generar` es una función sin argumentos que devuelve los bytes finales del PDF;
+    `tipo` ('certificado' o 'boleta') indica de qué página proviene.
+    """
+    return {
+        'generar': generar,
+        'contenido': None,
+        'nombre_archivo': nombre_archivo,
+        'tipo': tipo,
+        'lock': threading.Lock()
+    }
+
+
+def es_artefacto_diferido(data):
+    return isinstance(data, dict) and 'generar' in data and 'lock' in data
+
+
+def obtener_contenido(artefacto):
+    """
+    Devuelve los bytes del artefacto, generándolo una sola vez aunque
+    varias peticiones (o la precarga) lo pidan al mismo tiempo.
+    """
+    if artefacto['contenido'] is None:
+        with artefacto['lock']:
+            if artefacto['contenido'] is None:
+                artefacto['contenido'] = artefacto['generar']()
+                # Ya no se necesitan los datos de origen
+                artefacto['generar'] = None
+    return artefacto['contenido']
+
+
+def _precargar_artefacto(artefacto):
+    try:
+        obtener_contenido(artefacto)
+    except Exception as e:
+        # El error se volverá a producir (y a reportar) al descargarlo
+        logger.warning(f"No se pudo precargar {artefacto['nombre_archivo']}: {str(e)}")
+
+
+def precargar(artefactos, limite=None):
+    """Encola la generación en segundo plano de los primeros artefactos del lote"""
+    limite = LIMITE_PRECARGA if limite is None else limite
+    for artefacto in list(artefactos)[:limite]:
+        _ejecutor.submit(_precargar_artefacto, artefacto)
@@ -0,0 +1,25 @@
+"""
+Configuración de gunicorn para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Los resultados y los PDFs viven en la memoria del proceso (ver cola_trabajos),
+así que se usa un solo worker con varios hilos. Con preload_app la aplicación
+se crea y se calienta en el proceso principal antes de crear el worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PUERTO', 5000)}"
+workers = 1
+threads = int(os.environ.get('HILOS_SERVIDOR', 8))
+preload_app = True
+
+
+def on_starting(server):
+    # Con preload_app la reserva de crear_app la hace el proceso principal, así
+    # que un segundo worker no fallaría por sí solo: se rechaza aquí
+    if server.cfg.workers != 1:
+        raise RuntimeError(
+            f"La aplicación se atiende con un solo worker (se pidieron {server.cfg.workers}): "
+            "los resultados y los PDFs viven en la memoria del proceso. Usa --threads para más concurrencia."
+        )
@@ -0,0 +1,79 @@
+"""
+Lectura de hojas de Excel con el motor más rápido disponible.
+
+Si está instalado python-calamine (lector en código nativo, pandas >= 2.2) se
+usa ese motor; si no, se usa el de pandas por defecto (openpyxl para .xlsx).
+Se puede forzar uno con la variable de entorno MOTOR_EXCEL=calamine|openpyxl.
+Solo se lee la hoja pedida y, si se indican, solo las columnas necesarias.
+Las hojas ya leídas se guardan en la caché de cache_libros: volver a abrir el
+mismo archivo mapea el resultado guardado en lugar de leer el Excel.
+"""
+import os
+import logging
+import importlib.util
+import pandas as pd
+from cache_libros import cache_disponible, huella_origen, clave_cache, cargar_frame, guardar_frame
+
+logger = logging.getLogger(__name__)
+
+MOTOR_EXCEL = os.environ.get('MOTOR_EXCEL', 'auto')
+
+
+def _calamine_disponible():
+    if importlib.util.find_spec('python_calamine') is None:
+        return False
+    version = tuple(int(parte) for parte in pd.__version__.split('.')[:2])
+    return version >= (2, 2)
+
+
+def motor_excel():
+    """Devuelve el motor de lectura que se usará ('calamine' u 'openpyxl')"""
+    if MOTOR_EXCEL == 'auto':
+        return 'calamine' if _calamine_disponible() else 'openpyxl'
+    return MOTOR_EXCEL
+
+
+def leer_excel(origen, hoja=0, columnas=None, **kwargs):
+    """
+    Lee una hoja del Excel y devuelve un DataFrame.
+
+    `origen` puede ser una ruta o un objeto tipo archivo. `columnas`, si se indica,
+    limita la lectura a esas columnas: una lista de nombres (las que no existan en
+    la hoja se ignoran para que quien llama pueda reportarlas como faltantes) o una
+    función que recibe el nombre de cada columna y dice si se lee. Si el mismo
+    contenido ya se leyó con las mismas opciones, el DataFrame sale de la caché
+    (con columnas de solo lectura: para modificarlo en su lugar, usar una copia).
+    """
+    # Solo se guardan las lecturas sin opciones adicionales de read_excel ni columnas elegidas por función
+    clave = None
+    if not kwargs and not callable(columnas) and cache_disponible():
+        clave = clave_cache('excel', huella_origen(origen), hoja, sorted(columnas) if columnas else None, motor_excel())
+        df = cargar_frame(clave)
+        if df is not None:
+            return df
+
+    df = _leer_hoja(origen, hoja, columnas, **kwargs)
+    # Con hoja=None pandas devuelve un diccionario de hojas, que no se guarda
+    if clave is not None and isinstance(df, pd.DataFrame):
+        guardar_frame(clave, df)
+    return df
+
+
+def _leer_hoja(origen, hoja, columnas, **kwargs):
+    if callable(columnas):
+        kwargs['usecols'] = columnas
+    elif columnas is not None:
+        solicitadas = set(columnas)
+        kwargs['usecols'] = lambda columna: columna in solicitadas
+
+    motor = motor_excel()
+    if motor == 'calamine':
+        try:
+            return pd.read_excel(origen, sheet_name=hoja, engine='calamine', **kwargs)
+        except ImportError as e:
+            logger.warning(f"No se pudo usar calamine, se usará el lector por defecto: {str(e)}")
+            if hasattr(origen, 'seek'):
+                origen.seek(0)
+
+    # Motor por defecto de pandas: openpyxl para .xlsx, xlrd para .xls
+    return pd.read_excel(origen, sheet_name=hoja, **kwargs)
@@ -0,0 +1,139 @@
+"""
+Métricas de rendimiento en formato de texto de Prometheus.
+
+Se registran histogramas de latencia por ruta y por etapa interna (lectura de
+Excel, cálculo, generación de PDF, escritura de Excel), el tamaño de los
+archivos subidos y el estado de los almacenes de artefactos. Los valores son
+por proceso y se exponen en /metrics.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+# Límites de los buckets (segundos) para las latencias
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Límites de los buckets (bytes) para el tamaño de las cargas
+BUCKETS_BYTES = tuple(1024 * 2 ** n for n in range(0, 20, 2))  # 1 KB .. 256 MB (LIMITE_CARGA_PDF_MB es 200)
+
+
+def _limite(limite):
+    """Etiqueta `le` de un bucket: los enteros completos (67108864, no 6.71089e+07)"""
+    return str(limite) if isinstance(limite, int) else f'{limite:g}'
+
+
+class Histograma:
+    def __init__(self, nombre, descripcion, etiqueta, buckets):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiqueta = etiqueta
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor_etiqueta, valor):
+        with self._lock:
+            serie = self._series.get(valor_etiqueta)
+            if serie is None:
+                serie = self._series[valor_etiqueta] = {'buckets': [0] * len(self.buckets), 'suma': 0.0, 'cuenta': 0}
+            for posicion, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie['buckets'][posicion] += 1
+                    break
+            serie['suma'] += valor
+            serie['cuenta'] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            for valor_etiqueta, serie in sorted(self._series.items()):
+                etiqueta = f'{self.etiqueta}="{valor_etiqueta}"'
+                acumulado = 0
+                for limite, cuenta in zip(self.buckets, serie['buckets']):
+                    acumulado += cuenta
+                    lineas.append(f'{self.nombre}_bucket{{{etiqueta},le="{_limite(limite)}"}} {acumulado}')
+                lineas.append(f'{self.nombre}_bucket{{{etiqueta},le="+Inf"}} {serie["cuenta"]}')
+                lineas.append(f'{self.nombre}_sum{{{etiqueta}}} {serie["suma"]:.6f}')
+                lineas.append(f'{self.nombre}_count{{{etiqueta}}} {serie["cuenta"]}')
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, descripcion, etiqueta):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiqueta = etiqueta
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor_etiqueta, cantidad=1):
+        with self._lock:
+            self._valores[valor_etiqueta] = self._valores.get(valor_etiqueta, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.descripcion}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            for valor_etiqueta, valor in sorted(self._valores.items()):
+                lineas.append(f'{self.nombre}{{{self.etiqueta}="{valor_etiqueta}"}} {valor}')
+        return lineas
+
+
+LATENCIA_RUTAS = Histograma(
+    'essalud_solicitud_segundos', 'Latencia de las solicitudes por ruta', 'ruta', BUCKETS_LATENCIA
+)
+LATENCIA_ETAPAS = Histograma(
+    'essalud_etapa_segundos', 'Duración de las etapas internas de procesamiento', 'etapa', BUCKETS_LATENCIA
+)
+TAMAÑO_CARGAS = Histograma(
+    'essalud_carga_bytes', 'Tamaño de los archivos subidos por ruta', 'ruta', BUCKETS_BYTES
+)
+EXPULSIONES = Contador(
+    'essalud_artefactos_expulsados_total', 'Artefactos expulsados de cada almacén por límite de tamaño', 'almacen'
+)
+
+# Funciones que devuelven {almacen: (cantidad, bytes)} al momento de exponer las métricas
+_medidores_almacen = []
+
+
+def registrar_almacen(medidor):
+    """Registra una función que informa el tamaño actual de los almacenes de artefactos"""
+    _medidores_almacen.append(medidor)
+
+
+def registrar_expulsion(almacen, cantidad=1):
+    EXPULSIONES.incrementar(almacen, cantidad)
+
+
+@contextmanager
+def medir_etapa(etapa):
+    """Mide la duración de un bloque de código como etapa interna"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        LATENCIA_ETAPAS.observar(etapa, time.perf_counter() - inicio)
+
+
+def _exponer_almacenes():
+    lineas = [
+        "# HELP essalud_artefactos Artefactos guardados en cada almacén",
+        "# TYPE essalud_artefactos gauge",
+    ]
+    lineas_bytes = [
+        "# HELP essalud_artefactos_bytes Bytes ocupados por los artefactos ya generados de cada almacén",
+        "# TYPE essalud_artefactos_bytes gauge",
+    ]
+    for medidor in _medidores_almacen:
+        for almacen, (cantidad, tamaño) in medidor().items():
+            lineas.append(f'essalud_artefactos{{almacen="{almacen}"}} {cantidad}')
+            lineas_bytes.append(f'essalud_artefactos_bytes{{almacen="{almacen}"}} {tamaño}')
+    return lineas + lineas_bytes
+
+
+def exponer_metricas():
+    """Devuelve todas las métricas en el formato de texto de Prometheus"""
+    lineas = []
+    for metrica in (LATENCIA_RUTAS, LATENCIA_ETAPAS, TAMAÑO_CARGAS, EXPULSIONES):
+        lineas.extend(metrica.exponer())
+    lineas.extend(_exponer_almacenes())
+    return '\n'.join(lineas) + '\n'
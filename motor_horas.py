@@ -0,0 +1,134 @@
+"""
+Motor vectorizado para el cálculo de horas trabajadas.
+
+Las columnas de hora se convierten una sola vez a minutos desde la medianoche
+y todo el cálculo (jornada, refrigerio, turnos que cruzan la medianoche) se
+hace con operaciones sobre arreglos, sin recorrer las filas.
+"""
+import re
+import datetime
+import numpy as np
+import pandas as pd
+from metricas import medir_etapa
+from lector_excel import leer_excel
+
+MINUTOS_DIA = 24 * 60
+
+_PATRON_HORA = re.compile(
+    r'^\s*(\d{1,2})[:.h](\d{2})(?::(\d{2}))?\s*([ap])?\.?\s*(?:m\.?)?\s*$',
+    re.IGNORECASE
+)
+
+
+def _hora_a_minutos(valor):
+    """Convierte un valor de hora individual a minutos desde la medianoche (NaN si no es válido)"""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NaT:
+        return np.nan
+    if isinstance(valor, (datetime.datetime, pd.Timestamp, datetime.time)):
+        return valor.hour * 60 + valor.minute + round(valor.second / 60)
+    if isinstance(valor, datetime.timedelta):
+        return (valor.total_seconds() / 60) % MINUTOS_DIA
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        # Excel guarda las horas como fracción del día (0.5 = 12:00)
+        return round((float(valor) % 1) * MINUTOS_DIA) % MINUTOS_DIA
+    coincidencia = _PATRON_HORA.match(str(valor))
+    if not coincidencia:
+        return np.nan
+    horas, minutos, segundos, meridiano = coincidencia.groups()
+    horas, minutos = int(horas), int(minutos)
+    if meridiano:
+        horas = horas % 12 + (12 if meridiano.lower() == 'p' else 0)
+    if horas > 24 or minutos > 59:
+        return np.nan
+    return (horas * 60 + minutos + round(int(segundos or 0) / 60)) % MINUTOS_DIA
+
+
+def columna_a_minutos(serie):
+    """
+    Convierte una columna de horas a minutos enteros desde la medianoche.
+    Acepta horas de Excel (fracción del día), fechas con hora, objetos time y
+    textos como '08:30', '8:30 pm' o '17.45'. Los valores no válidos quedan como NaN.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        minutos = serie.dt.hour * 60 + serie.dt.minute + (serie.dt.second / 60).round()
+        return minutos.to_numpy(dtype='float64')
+    if pd.api.types.is_timedelta64_dtype(serie):
+        return ((serie.dt.total_seconds() / 60).round() % MINUTOS_DIA).to_numpy(dtype='float64')
+    if pd.api.types.is_numeric_dtype(serie):
+        valores = serie.to_numpy(dtype='float64')
+        return np.round(np.mod(valores, 1) * MINUTOS_DIA) % MINUTOS_DIA
+
+    # Columnas mixtas: las marcaciones se repiten mucho, así que solo se
+    # interpretan los valores distintos y luego se reparten a todas las filas
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    minutos_unicos = np.array([_hora_a_minutos(valor) for valor in unicos] + [np.nan], dtype='float64')
+    return minutos_unicos[codigos]
+
+
+def calcular_horas_df(df, col_inicio='Hora Inicio', col_fin='Hora Fin',
+                      col_refrigerio_inicio='Hora Refrigerio Inicio',
+                      col_refrigerio_fin='Hora Refrigerio Fin', flexible=False):
+    """
+    Calcula las horas trabajadas de cada fila del DataFrame.
+
+    En modo normal se exigen las cuatro columnas. En modo flexible el refrigerio
+    es opcional: si no existe la columna o la fila no lo tiene, no se descuenta.
+    Devuelve (DataFrame, mensaje) con el DataFrame en None si hay un error.
+    """
+    requeridas = [col_inicio, col_fin]
+    if not flexible:
+        requeridas += [col_refrigerio_inicio, col_refrigerio_fin]
+    faltantes = [col for col in requeridas if col not in df.columns]
+    if faltantes:
+        return None, f"Columnas faltantes en el archivo: {', '.join(faltantes)}"
+
+    df = df.copy()
+    inicio = columna_a_minutos(df[col_inicio])
+    fin = columna_a_minutos(df[col_fin])
+
+    if col_refrigerio_inicio in df.columns and col_refrigerio_fin in df.columns:
+        refrigerio_inicio = columna_a_minutos(df[col_refrigerio_inicio])
+        refrigerio_fin = columna_a_minutos(df[col_refrigerio_fin])
+        # Un refrigerio que cruza la medianoche también se resuelve con el módulo
+        refrigerio = np.mod(refrigerio_fin - refrigerio_inicio, MINUTOS_DIA)
+        refrigerio = np.where(np.isnan(refrigerio), 0, refrigerio)
+    else:
+        refrigerio = np.zeros(len(df))
+
+    # Si la hora de fin es menor que la de inicio el turno termina al día siguiente
+    jornada = np.mod(fin - inicio, MINUTOS_DIA)
+    netos = np.clip(jornada - refrigerio, 0, None)
+
+    df['Turno Nocturno'] = fin < inicio
+    df['Horas Refrigerio'] = np.round(refrigerio / 60, 2)
+    df['Horas Trabajadas'] = np.round(netos / 60, 2)
+
+    filas_invalidas = int(np.isnan(jornada).sum())
+    mensaje = f"Se calcularon las horas de {len(df) - filas_invalidas} registros"
+    if filas_invalidas:
+        mensaje += f" ({filas_invalidas} sin hora de inicio o fin válida)"
+    return df, mensaje
+
+
+def calcular_horas_vectorizado(archivo, nombre_hoja='Horas', col_inicio='Hora Inicio', col_fin='Hora Fin',
+                               col_refrigerio_inicio='Hora Refrigerio Inicio',
+                               col_refrigerio_fin='Hora Refrigerio Fin', flexible=False):
+    """
+    Lee la hoja del Excel y calcula las horas con el motor vectorizado.
+    Tiene el mismo contrato que calcular_horas_excel: devuelve (DataFrame, mensaje).
+    """
+    try:
+        with medir_etapa('lectura_excel'):
+            df = leer_excel(archivo, hoja=nombre_hoja)
+    except ValueError as e:
+        return None, f"No se pudo leer la hoja '{nombre_hoja}': {str(e)}"
+
+    with medir_etapa('calculo_horas'):
+        return calcular_horas_df(
+            df,
+            col_inicio=col_inicio,
+            col_fin=col_fin,
+            col_refrigerio_inicio=col_refrigerio_inicio,
+            col_refrigerio_fin=col_refrigerio_fin,
+            flexible=flexible
+        )
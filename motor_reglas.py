@@ -0,0 +1,191 @@
+"""
+Motor de reglas declarativas evaluadas por columnas.
+
+Una tabla de reglas es una lista ordenada de (rama, condición, fórmula): cada
+fila toma la fórmula de la primera rama cuya condición se cumple, igual que una
+cadena if/elif. Las tablas se compilan una sola vez en funciones sobre arreglos
+de numpy y se evalúan con np.select sobre todas las filas a la vez, contando
+cuántas filas tomó cada rama.
+
+Condición: lista de (columna, operador, valor) que deben cumplirse todas, o None
+para la rama final (siempre se cumple). El operador 'presente' no lleva valor
+y pide que la columna no esté vacía.
+
+Fórmula: {'valor': ..., 'entre': ..., 'por': ..., 'redondeo': decimales}, que se
+calcula como valor / entre * por y se redondea con round() de Python. Cada
+operando es un número o el nombre de una columna (convertida a número; lo que
+no es número queda vacío), o de un valor auxiliar calculado fuera de la tabla
+que se pasa al evaluar. Las tablas pueden escribirse en JSON.
+"""
+import operator
+import numpy as np
+import pandas as pd
+
+OPERADORES = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+CLAVES_FORMULA = {'valor', 'entre', 'por', 'redondeo'}
+
+
+class Columnas:
+    """Columnas de un DataFrame (y valores auxiliares) como arreglos numéricos, convertidas una sola vez por evaluación"""
+
+    def __init__(self, df, auxiliares=None):
+        self.df = df
+        self._numericas = dict(auxiliares or {})
+
+    def numerica(self, columna):
+        if columna not in self._numericas:
+            self._numericas[columna] = pd.to_numeric(self.df[columna], errors='coerce').to_numpy()
+        return self._numericas[columna]
+
+    def operando(self, operando):
+        return self.numerica(operando) if isinstance(operando, str) else operando
+
+    def olvidar(self, columna):
+        self._numericas.pop(columna, None)
+
+
+def _compilar_condicion(condicion):
+    """Lista de (columna, operador, valor) -> función(columnas) -> arreglo booleano"""
+    if condicion is None:
+        return lambda columnas: np.ones(len(columnas.df), dtype=bool)
+
+    pruebas = []
+    for termino in condicion:
+        columna, operador, *valor = termino
+        if operador == 'presente':
+            pruebas.append(lambda columnas, columna=columna: columnas.df[columna].notna().to_numpy())
+        elif operador in OPERADORES and len(valor) == 1:
+            pruebas.append(
+                lambda columnas, columna=columna, comparar=OPERADORES[operador], valor=valor[0]:
+                    comparar(columnas.numerica(columna), columnas.operando(valor))
+            )
+        else:
+            raise ValueError(f"Condición no válida: {termino}")
+
+    def evaluar(columnas):
+        resultado = np.ones(len(columnas.df), dtype=bool)
+        for prueba in pruebas:
+            # Las comparaciones con vacíos (NaN) dan False, como en la cadena if/elif
+            resultado &= prueba(columnas)
+        return resultado
+    return evaluar
+
+
+def _redondear(valores, decimales):
+    """round() de Python sobre los valores distintos (np.round difiere en algunos casos de medio centavo)"""
+    unicos, posiciones = np.unique(valores, return_inverse=True)
+    return np.array([round(valor, decimales) for valor in unicos.tolist()])[posiciones]
+
+
+def _compilar_formula(formula):
+    """{'valor', 'entre', 'por', 'redondeo'} -> función(columnas) -> arreglo de valores"""
+    desconocidas = set(formula) - CLAVES_FORMULA
+    if 'valor' not in formula or desconocidas:
+        raise ValueError(f"Fórmula no válida: {formula}")
+    valor, entre, por = formula['valor'], formula.get('entre'), formula.get('por')
+    decimales = formula.get('redondeo')
+
+    def evaluar(columnas):
+        resultado = columnas.operando(valor)
+        if np.ndim(resultado) == 0:
+            resultado = np.full(len(columnas.df), resultado)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if entre is not None:
+                resultado = resultado / columnas.operando(entre)
+            if por is not None:
+                resultado = resultado * columnas.operando(por)
+        if decimales is not None:
+            resultado = _redondear(resultado, decimales)
+        return resultado
+    return evaluar
+
+
+def compilar_tablas(tablas):
+    """
+    {columna de salida: [(rama, condición, fórmula)]} -> plan de evaluación.
+    Las tablas se evalúan en orden, así que una puede usar la salida de otra anterior.
+    """
+    plan = []
+    for salida, reglas in tablas.items():
+        if not reglas or reglas[-1][1] is not None:
+            raise ValueError(f"La última rama de {salida} debe tener condición None")
+        plan.append({
+            'salida': salida,
+            'ramas': [rama for rama, _, _ in reglas],
+            'condiciones': [_compilar_condicion(condicion) for _, condicion, _ in reglas],
+            'formulas': [_compilar_formula(formula) for _, _, formula in reglas],
+            'divisores': [formula.get('entre') for _, _, formula in reglas]
+        })
+    return plan
+
+
+def aplicar_cambios(tablas, cambios):
+    """
+    Copia de las tablas con las fórmulas de `cambios` ({'salida.rama': fórmula})
+    reemplazadas; así se define una variante sin repetir las condiciones.
+    """
+    tablas = {salida: list(reglas) for salida, reglas in tablas.items()}
+    for destino, formula in cambios.items():
+        salida, _, rama = destino.rpartition('.')
+        posiciones = [n for n, (nombre, _, _) in enumerate(tablas.get(salida, [])) if nombre == rama]
+        if not posiciones:
+            raise ValueError(f"Rama desconocida en la variante: {destino}")
+        _, condicion, _ = tablas[salida][posiciones[0]]
+        tablas[salida][posiciones[0]] = (rama, condicion, formula)
+    return tablas
+
+
+def _elegir(paso, columnas):
+    """Posición de la rama que toma cada fila (la primera condición que se cumple)"""
+    condiciones = np.stack([condicion(columnas) for condicion in paso['condiciones']])
+    return condiciones, np.argmax(condiciones, axis=0)
+
+
+def aplicar_plan(plan, df, auxiliares=None):
+    """
+    Calcula en `df` (en su lugar) la columna de salida de cada tabla del plan y
+    devuelve {salida: {rama: filas}}. `auxiliares` ({nombre: arreglo}) son
+    operandos que no están en el DataFrame.
+    """
+    columnas = Columnas(df, auxiliares)
+    conteo = {}
+    for paso in plan:
+        condiciones, elegidas = _elegir(paso, columnas)
+        aciertos = np.bincount(elegidas, minlength=len(paso['ramas']))
+
+        # Solo se calculan las ramas que tomó alguna fila: el tipo del resultado queda
+        # como en la versión fila por fila (enteros si ninguna fila llega a una fórmula con decimales)
+        usadas = [n for n in range(len(paso['ramas'])) if aciertos[n]] or list(range(len(paso['ramas'])))
+        for n in usadas:
+            divisor = paso['divisores'][n]
+            if isinstance(divisor, str) and (columnas.numerica(divisor)[elegidas == n] == 0).any():
+                raise ZeroDivisionError(f"{paso['salida']} ({paso['ramas'][n]}): hay filas con {divisor} = 0")
+        valores = np.select(
+            [elegidas == n for n in usadas],
+            [paso['formulas'][n](columnas) for n in usadas]
+        )
+        df[paso['salida']] = valores
+        columnas.olvidar(paso['salida'])
+        conteo[paso['salida']] = dict(zip(paso['ramas'], aciertos.tolist()))
+    return conteo
+
+
+def elegir_ramas(plan, salida, df, auxiliares=None):
+    """Rama de la tabla `salida` que corresponde a cada fila de un DataFrame (Categorical)"""
+    paso = next(paso for paso in plan if paso['salida'] == salida)
+    _, elegidas = _elegir(paso, Columnas(df, auxiliares))
+    return pd.Categorical.from_codes(elegidas, categories=paso['ramas'])
+
+
+def resumen_ramas(conteo):
+    """Tabla (salida, rama) -> filas a partir de {salida: {rama: filas}} (df.attrs['ramas_reglas'])"""
+    filas = [(salida, rama, n) for salida, ramas in conteo.items() for rama, n in ramas.items()]
+    return pd.DataFrame(filas, columns=['salida', 'rama', 'filas']).set_index(['salida', 'rama'])
@@ -0,0 +1,103 @@
+"""
+Normalización de columnas de fechas leídas de Excel o CSV.
+
+read_excel entrega columnas de fechas con tipos mezclados: textos DD/MM/YYYY,
+fechas nativas y números de serie de Excel. Una planilla tiene miles de filas
+pero pocos cientos de fechas distintas, así que se interpretan solo los
+valores únicos (cada tipo con una operación vectorizada) y el resultado se
+reparte a las filas con los códigos de factorize.
+"""
+import datetime
+import numpy as np
+import pandas as pd
+
+FORMATO_FECHA = '%d/%m/%Y'
+
+# Día 0 de los números de serie de Excel (sistema 1900, con el 29/02/1900 ficticio)
+ORIGEN_SERIAL_EXCEL = np.datetime64('1899-12-30', 'D')
+SERIAL_EXCEL_MAXIMO = 2958465  # 31/12/9999
+
+# Camino por el que se interpretó cada valor, en el orden en que se prueban
+RUTAS_FECHA = ['vacio', 'fecha', 'serial_excel', 'texto', 'iso', 'invalido']
+_VACIO, _FECHA, _SERIAL, _TEXTO, _ISO, _INVALIDO = range(len(RUTAS_FECHA))
+
+_NAT = np.datetime64('NaT', 'us')
+
+
+def _seriales(numeros):
+    """Números de serie de Excel -> datetime64 (solo la parte entera; fuera de rango, NaT)"""
+    numeros = np.asarray(numeros, dtype='float64')
+    validos = (numeros >= 1) & (numeros <= SERIAL_EXCEL_MAXIMO)
+    dias = np.where(validos, np.floor(np.nan_to_num(numeros)), 0).astype('int64')
+    return np.where(validos, (ORIGEN_SERIAL_EXCEL + dias).astype('datetime64[us]'), _NAT)
+
+
+def _textos(textos, formato):
+    """Textos -> (datetime64, ruta): serial de Excel escrito como texto, `formato` o ISO 8601"""
+    textos = pd.Series(textos, dtype='object').astype(str).str.strip()
+    valores = np.full(len(textos), _NAT)
+    rutas = np.full(len(textos), _INVALIDO)
+
+    vacios = (textos == '').to_numpy()
+    rutas[vacios] = _VACIO
+
+    numericos = textos.str.fullmatch(r'\d+(\.\d+)?').to_numpy()
+    valores[numericos] = _seriales(textos[numericos].astype('float64'))
+    rutas[numericos] = _SERIAL
+
+    pendientes = ~(vacios | numericos)
+    con_formato = pd.to_datetime(textos[pendientes], format=formato, errors='coerce').to_numpy('datetime64[us]')
+    valores[pendientes] = con_formato
+    rutas[np.flatnonzero(pendientes)[~np.isnat(con_formato)]] = _TEXTO
+
+    pendientes &= np.isnat(valores)
+    iso = pd.to_datetime(textos[pendientes], format='ISO8601', errors='coerce').to_numpy('datetime64[us]')
+    valores[pendientes] = iso
+    rutas[np.flatnonzero(pendientes)[~np.isnat(iso)]] = _ISO
+    return valores, rutas
+
+
+def normalizar_fechas(valores, formato=FORMATO_FECHA):
+    """
+    Convierte una columna de fechas con tipos mezclados a datetime64 (a medianoche;
+    lo que no se puede interpretar queda en NaT). Devuelve (Series, conteo) donde
+    conteo indica cuántas filas pasaron por cada camino de RUTAS_FECHA.
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    unicos = np.asarray(unicos, dtype='object')
+
+    fechas_unicas = np.full(len(unicos), _NAT)
+    rutas_unicas = np.full(len(unicos), _INVALIDO)
+
+    # Clasificación de los valores únicos por tipo
+    es_fecha = np.fromiter((isinstance(v, (datetime.date, np.datetime64)) for v in unicos), bool, len(unicos))
+    es_numero = np.fromiter(
+        (isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_)) for v in unicos),
+        bool, len(unicos)
+    )
+    es_texto = ~(es_fecha | es_numero)
+
+    if es_fecha.any():
+        fechas_unicas[es_fecha] = pd.to_datetime(pd.Series(unicos[es_fecha]), errors='coerce').to_numpy('datetime64[us]')
+        rutas_unicas[es_fecha] = _FECHA
+    if es_numero.any():
+        fechas_unicas[es_numero] = _seriales(unicos[es_numero])
+        rutas_unicas[es_numero] = _SERIAL
+    if es_texto.any():
+        fechas_unicas[es_texto], rutas_unicas[es_texto] = _textos(unicos[es_texto], formato)
+
+    # Lo que no dio una fecha válida (serial fuera de rango, fecha nativa inválida) es inválido
+    rutas_unicas[np.isnat(fechas_unicas) & (rutas_unicas != _VACIO)] = _INVALIDO
+    fechas_unicas = fechas_unicas.astype('datetime64[D]').astype('datetime64[us]')
+
+    # Reparto a las filas: el código -1 (valor nulo) toma el último elemento agregado
+    fechas = np.append(fechas_unicas, _NAT)[codigos]
+    rutas = np.append(rutas_unicas, _VACIO)[codigos]
+    conteo = dict(zip(RUTAS_FECHA, np.bincount(rutas, minlength=len(RUTAS_FECHA)).tolist()))
+    return pd.Series(fechas, index=serie.index, name=serie.name), conteo
+
+
+def resumen_lectura(lectura):
+    """Tabla columna x camino a partir de {columna: conteo} (df.attrs['lectura_fechas'])"""
+    return pd.DataFrame.from_dict(lectura, orient='index', columns=RUTAS_FECHA)
@@ -0,0 +1,107 @@
+"""
+Preparación de las boletas de pago de una carga.
+
+procesar_boletas_excel devuelve un diccionario anidado por empleado; aquí se
+pasa a una tabla con una fila por boleta para normalizar el neto, los totales,
+el periodo y la fecha de pago con operaciones sobre columnas, una sola vez por
+carga y no en cada descarga. El neto en letras sale de un conversor con memoria:
+en una planilla los importes se repiten mucho.
+"""
+import os
+from functools import lru_cache
+import pandas as pd
+from boletas_pago import numero_a_letras
+from boletas_pdf import periodo_boleta, fecha_pago_boleta, TOTALES_BOLETA
+
+MAX_IMPORTES_EN_LETRAS = int(os.environ.get('MAX_IMPORTES_EN_LETRAS', 65536))
+
+# Total de la boleta -> sección cuyos montos lo forman (si el Excel no trae el total)
+SECCIONES_TOTALES = {
+    'total_remuneracion': 'ingresos',
+    'total_descuentos': 'descuentos',
+    'total_aportes': 'aportes'
+}
+
+# Columnas de la tabla que necesita boletas_pdf para renderizar (datos['resumen'])
+COLUMNAS_RESUMEN = ['mes', 'año', 'fecha_pago', 'neto_pagar', *TOTALES_BOLETA]
+
+
+@lru_cache(maxsize=MAX_IMPORTES_EN_LETRAS)
+def importe_en_letras(importe):
+    """numero_a_letras con memoria: cada importe distinto se convierte una sola vez"""
+    return numero_a_letras(importe)
+
+
+def _numericas(valores):
+    return pd.to_numeric(pd.Series(valores, dtype='object'), errors='coerce')
+
+
+def _montos_por_seccion(empleados, posiciones):
+    """Suma de los montos de ingresos, descuentos y aportes de las boletas en `posiciones` (una columna por total)"""
+    lista = list(empleados.values())
+    conceptos = pd.DataFrame(
+        [
+            (posicion, total, concepto.get('monto'))
+            for posicion in posiciones
+            for total, seccion in SECCIONES_TOTALES.items()
+            for concepto in lista[posicion].get(seccion) or []
+        ],
+        columns=['posicion', 'total', 'monto']
+    )
+    conceptos['monto'] = pd.to_numeric(conceptos['monto'], errors='coerce')
+    sumas = conceptos.groupby(['posicion', 'total'])['monto'].sum().unstack('total')
+    return sumas.reindex(index=posiciones, columns=list(SECCIONES_TOTALES)).fillna(0.0)
+
+
+def _periodos(periodos):
+    """Mes, año y fecha de pago de cada periodo distinto (la planilla suele traer uno solo)"""
+    unicos = {}
+    for periodo in periodos.unique():
+        mes_num, mes, año = periodo_boleta(periodo)
+        unicos[periodo] = (mes, año, fecha_pago_boleta(mes_num, año))
+    return pd.DataFrame(periodos.map(unicos).tolist(), columns=['mes', 'año', 'fecha_pago'], index=periodos.index)
+
+
+def preparar_boletas(empleados):
+    """
+    Tabla con una fila por boleta, en el orden de `empleados` ({nombre: datos}):
+    nombre, dni, periodo, periodo_archivo, neto_pagar, neto_pagar_letras,
+    los totales y el mes, año y fecha de pago del encabezado.
+    """
+    personales = [datos['datos_personales'] for datos in empleados.values()]
+    tabla = pd.DataFrame({
+        'nombre': list(empleados),
+        # DNI y periodo tal como vienen (object), para no cambiar cómo se muestran
+        'dni': pd.Series([datos.get('dni', '') for datos in personales], dtype='object'),
+        'periodo': pd.Series([datos.get('periodo', '') for datos in personales], dtype='object')
+    })
+    tabla['periodo_archivo'] = tabla['periodo'].map(str).str.replace('/', '_', regex=False)
+
+    # Neto y totales como números: lo que no se puede convertir queda en 0 (el neto)
+    # o en la suma de los montos de su sección (los totales)
+    tabla['neto_pagar'] = _numericas([datos.get('neto_pagar', 0) for datos in personales]).fillna(0.0)
+    for total in TOTALES_BOLETA:
+        tabla[total] = _numericas([datos.get(total) for datos in personales])
+    sin_total = tabla.index[tabla[TOTALES_BOLETA].isna().any(axis=1)]
+    if len(sin_total):
+        tabla[TOTALES_BOLETA] = tabla[TOTALES_BOLETA].fillna(_montos_por_seccion(empleados, list(sin_total)))
+
+    netos = tabla['neto_pagar'].unique().tolist()
+    tabla['neto_pagar_letras'] = tabla['neto_pagar'].map({neto: importe_en_letras(neto) for neto in netos})
+
+    periodos = _periodos(tabla['periodo'].map(str))
+    return pd.concat([tabla, periodos], axis=1)
+
+
+def registros(tabla, columnas=None):
+    """
+    Un diccionario por boleta con las columnas indicadas. Se arma desde las
+    listas de cada columna: to_dict('records') es varias veces más lento.
+    """
+    columnas = list(columnas or tabla.columns)
+    return [dict(zip(columnas, valores)) for valores in zip(*(tabla[col].tolist() for col in columnas))]
+
+
+def resumenes(tabla):
+    """Un diccionario por boleta con lo que boletas_pdf usa como datos['resumen']"""
+    return registros(tabla, COLUMNAS_RESUMEN)
@@ -0,0 +1,119 @@
+"""
+Prorrateo de los días del mes por fecha de ingreso y de cese.
+
+Quien ingresa o cesa dentro del periodo de la planilla no trabaja el mes
+completo. Con los límites del periodo (el indicado al procesar o la columna
+Periodo de la planilla) y las fechas ya normalizadas se calculan, con
+aritmética de fechas sobre columnas completas, los días efectivos de cada fila:
+Dias_Mes para quien trabajó todo el periodo y, para el resto, Dias_Mes menos los
+días de calendario del mes que no trabajó (así un cese el 27/02 con Dias_Mes=30
+da 29 días, no 27). Quien no tiene días en el periodo queda con 0. Las filas
+sin periodo conocido quedan con Dias_Mes, como antes.
+"""
+import re
+import datetime
+import numpy as np
+import pandas as pd
+
+# Nombres con los que suele venir la columna del periodo en las planillas
+COLUMNAS_PERIODO = ('Periodo', 'PERIODO', 'periodo')
+
+# Situación de cada fila en el periodo
+CASOS_PRORRATEO = ['completo', 'ingreso', 'cese', 'ingreso_y_cese', 'fuera', 'sin_periodo']
+_COMPLETO, _INGRESO, _CESE, _INGRESO_Y_CESE, _FUERA, _SIN_PERIODO = range(len(CASOS_PRORRATEO))
+
+_PATRONES_PERIODO = [
+    (re.compile(r'(\d{4})(\d{2})'), 1, 2),             # AAAAMM (PLAME)
+    (re.compile(r'(\d{4})[-/.](\d{1,2})'), 1, 2),      # AAAA-MM
+    (re.compile(r'(\d{1,2})[-/.](\d{4})'), 2, 1),      # MM/AAAA
+    (re.compile(r'\d{1,2}[-/.](\d{1,2})[-/.](\d{4})'), 2, 1)  # DD/MM/AAAA
+]
+
+_MES_VACIO = np.datetime64('NaT', 'M')
+
+
+def mes_periodo(valor):
+    """Mes (datetime64[M]) de un periodo AAAAMM, AAAA-MM, MM/AAAA, DD/MM/AAAA o fecha; NaT si no se reconoce"""
+    if isinstance(valor, (datetime.date, np.datetime64)):
+        return np.datetime64(pd.Timestamp(valor).strftime('%Y-%m'), 'M') if pd.notna(valor) else _MES_VACIO
+    if isinstance(valor, (int, np.integer)) or (isinstance(valor, (float, np.floating)) and float(valor).is_integer()):
+        valor = str(int(valor))
+    if not isinstance(valor, str):
+        return _MES_VACIO
+    for patron, grupo_año, grupo_mes in _PATRONES_PERIODO:
+        coincidencia = patron.fullmatch(valor.strip())
+        if coincidencia and 1 <= int(coincidencia.group(grupo_mes)) <= 12:
+            return np.datetime64(f"{coincidencia.group(grupo_año)}-{int(coincidencia.group(grupo_mes)):02d}", 'M')
+    return _MES_VACIO
+
+
+def meses_periodo(df, periodo=None):
+    """
+    Mes del periodo de cada fila: `periodo` para todas si se indica, o la columna
+    Periodo de la planilla (se interpretan solo sus valores distintos).
+    """
+    if periodo is not None:
+        return np.full(len(df), mes_periodo(periodo))
+    columna = next((col for col in COLUMNAS_PERIODO if col in df.columns), None)
+    if columna is None:
+        return np.full(len(df), _MES_VACIO)
+    codigos, unicos = pd.factorize(df[columna], use_na_sentinel=True)
+    meses = np.array([mes_periodo(valor) for valor in unicos] + [_MES_VACIO], dtype='datetime64[M]')
+    return meses[codigos]
+
+
+def _prorrateo(df, periodo=None):
+    """Días efectivos (Series) y caso de CASOS_PRORRATEO (posición) de cada fila"""
+    meses = meses_periodo(df, periodo)
+    inicio = meses.astype('datetime64[D]')
+    fin = (meses + 1).astype('datetime64[D]') - 1
+    ingreso = df['fecha_ingreso'].to_numpy('datetime64[D]')
+    cese = df['fecha_cese'].to_numpy('datetime64[D]')
+
+    # Las comparaciones con NaT dan False: sin fecha (o sin periodo) no se prorratea
+    entra = ingreso > inicio
+    sale = cese < fin
+    desde = np.where(entra, ingreso, inicio)
+    hasta = np.where(sale, cese, fin)
+    calendario = np.maximum((hasta - desde).astype('int64') + 1, 0)
+    faltantes = (fin - inicio).astype('int64') + 1 - calendario
+
+    # Dias_Mes es el mes completo de la planilla (30 aunque el mes tenga 28 o 31 días):
+    # se le descuentan los días de calendario no trabajados
+    parcial = entra | sale
+    dias_mes = pd.to_numeric(df['Dias_Mes'], errors='coerce').to_numpy()
+    prorrateados = np.where(calendario == 0, 0, np.clip(dias_mes - faltantes, 0, dias_mes))
+    dias = df['Dias_Mes'].where(~parcial, pd.Series(prorrateados, index=df.index))
+
+    casos = np.select(
+        [np.isnat(inicio), parcial & (calendario == 0), entra & sale, entra, sale],
+        [_SIN_PERIODO, _FUERA, _INGRESO_Y_CESE, _INGRESO, _CESE],
+        default=_COMPLETO
+    )
+    return dias.rename('DIAS EFECTIVOS'), casos
+
+
+def prorratear(df, periodo=None):
+    """
+    Días efectivos de cada fila en su periodo a partir de fecha_ingreso y
+    fecha_cese (ya convertidas a datetime64). Devuelve (Series, conteo) donde
+    conteo indica cuántas filas hay en cada caso de CASOS_PRORRATEO.
+    """
+    dias, casos = _prorrateo(df, periodo)
+    conteo = dict(zip(CASOS_PRORRATEO, np.bincount(casos, minlength=len(CASOS_PRORRATEO)).tolist()))
+    return dias, conteo
+
+
+def fuera_del_periodo(df, periodo=None):
+    """
+    Filas sin ningún día en su periodo (ingreso posterior o cese anterior), como
+    arreglo booleano. Sin periodo conocido ninguna fila queda fuera, aunque su
+    Dias_Mes sea 0.
+    """
+    _, casos = _prorrateo(df, periodo)
+    return casos == _FUERA
+
+
+def resumen_prorrateo(conteo):
+    """Tabla caso -> filas a partir de df.attrs['prorrateo']"""
+    return pd.DataFrame({'filas': [conteo.get(caso, 0) for caso in CASOS_PRORRATEO]}, index=CASOS_PRORRATEO)
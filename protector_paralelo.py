@@ -0,0 +1,132 @@
+"""
+Protección de PDFs en paralelo y empaquetado en ZIP.
+
+Cada PDF se cifra en un proceso independiente con procesar_pdf_batch, de
+modo que un lote grande de boletas aprovecha todos los núcleos en lugar de
+cifrarse uno tras otro dentro de la petición.
+"""
+import io
+import os
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Procesos dedicados al cifrado de PDFs
+PROCESOS_CIFRADO = int(os.environ.get('PROCESOS_CIFRADO', os.cpu_count() or 1))
+
+_ejecutor = None
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    if _ejecutor is None:
+        # 'spawn' evita heredar los hilos y locks del servidor web al crear procesos
+        _ejecutor = ProcessPoolExecutor(
+            max_workers=PROCESOS_CIFRADO,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _ejecutor
+
+
+def _proteger_un_pdf(nombre, carga, usar_nombre_archivo, contraseña_manual):
+    """
+    Cifra un único PDF. Se ejecuta dentro de un proceso del pool.
+    `carga` son los bytes del PDF o la ruta del temporal en disco, que se abre
+    aquí para no enviar el contenido completo entre procesos.
+    """
+    from pdf_protector import procesar_pdf_batch
+
+    if isinstance(carga, str):
+        with open(carga, 'rb') as origen:
+            resultados = procesar_pdf_batch(
+                [(nombre, origen)],
+                usar_nombre_archivo=usar_nombre_archivo,
+                contraseña_manual=contraseña_manual
+            )
+    else:
+        resultados = procesar_pdf_batch(
+            [(nombre, io.BytesIO(carga))],
+            usar_nombre_archivo=usar_nombre_archivo,
+            contraseña_manual=contraseña_manual
+        )
+    pdf_data, mensaje_o_contraseña = resultados.get(nombre, (None, 'No se obtuvo resultado'))
+
+    # Los BytesIO no se pueden devolver entre procesos; se devuelven los bytes
+    contenido_protegido = pdf_data.getvalue() if pdf_data is not None else None
+    return contenido_protegido, mensaje_o_contraseña
+
+
+def procesar_pdf_paralelo(archivos, usar_nombre_archivo=False, contraseña_manual=None, progreso=None):
+    """
+    Protege una lista de (nombre, carga) repartiendo el trabajo en procesos.
+    Cada carga son los bytes del PDF o la ruta de un archivo temporal.
+
+    Devuelve un diccionario con el mismo formato que procesar_pdf_batch:
+    nombre -> (BytesIO o None, contraseña o mensaje de error).
+    `progreso`, si se indica, se llama como progreso(nombre, completados, total, exito)
+    cada vez que termina un archivo.
+    """
+    resultados = {}
+    total = len(archivos)
+    if total == 0:
+        return resultados
+
+    ejecutor = _obtener_ejecutor()
+    futuros = {
+        ejecutor.submit(_proteger_un_pdf, nombre, carga, usar_nombre_archivo, contraseña_manual): nombre
+        for nombre, carga in archivos
+    }
+
+    for completados, futuro in enumerate(as_completed(futuros), start=1):
+        nombre = futuros[futuro]
+        try:
+            contenido_protegido, mensaje_o_contraseña = futuro.result()
+        except Exception as e:
+            logger.error(f"Error al proteger {nombre}: {str(e)}")
+            contenido_protegido, mensaje_o_contraseña = None, f"Error al proteger el archivo: {str(e)}"
+
+        exito = contenido_protegido is not None
+        pdf_data = io.BytesIO(contenido_protegido) if exito else None
+        resultados[nombre] = (pdf_data, mensaje_o_contraseña)
+
+        logger.debug(f"PDF {completados}/{total} procesado: {nombre} ({'ok' if exito else 'error'})")
+        if progreso is not None:
+            progreso(nombre, completados, total, exito)
+
+    # Conservar el orden en que se subieron los archivos
+    return {nombre: resultados[nombre] for nombre, _ in archivos}
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no posicionable que acumula lo escrito por ZipFile para enviarlo por partes"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        partes, self._partes = self._partes, []
+        return partes
+
+
+def generar_zip(archivos):
+    """
+    Genera un ZIP por partes a partir de un iterable de (nombre, bytes),
+    sin armar el archivo completo en memoria.
+    """
+    salida = _SalidaZip()
+    # Los PDFs ya vienen comprimidos, por eso se guardan sin volver a comprimir
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_STORED) as zip_file:
+        for nombre, contenido in archivos:
+            zip_file.writestr(nombre, contenido)
+            yield from salida.vaciar()
+    yield from salida.vaciar()
@@ -0,0 +1,205 @@
+"""
+Reglas de cálculo de ESSALUD de TAMBO.
+
+Las usan las aplicaciones de Streamlit y la API de cálculo masivo, de modo que
+un mismo registro da el mismo resultado sin importar por dónde se procese.
+Las reglas son tablas declarativas (REGLAS_ESSALUD) con variantes por nombre,
+que motor_reglas compila y evalúa sobre columnas completas.
+"""
+import os
+import sys
+import json
+import logging
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import motor_reglas
+import normalizador_fechas
+import prorrateo_essalud
+from motor_reglas import compilar_tablas, aplicar_cambios, aplicar_plan, elegir_ramas
+from normalizador_fechas import normalizar_fechas
+from prorrateo_essalud import prorratear, fuera_del_periodo, mes_periodo
+from cache_libros import clave_cache, huella_codigo, cargar_frame, guardar_frame
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_REQUERIDAS = ['fecha_ingreso', 'fecha_cese', 'Importe Bruto', 'Días Subsidio', 'Dias_Mes', 'Importe ESSALUD EJB']
+
+COLUMNAS_CALCULADAS = ['DIAS EFECTIVOS', 'DIAS PLAME', 'Importe_Calculado', 'CALCULO DIAS PLAME', 'IMPORTE ESSALUD FINAL']
+
+REMUNERACION_MINIMA = 1130
+TASA_ESSALUD = 0.09
+IMPORTE_MINIMO = REMUNERACION_MINIMA * TASA_ESSALUD
+
+# Reglas en el formato de motor_reglas: por columna calculada, ramas en el orden en que
+# se evalúan (la primera condición que se cumple define la fórmula de la fila)
+REGLAS_ESSALUD = {
+    'Importe_Calculado': [
+        # Sin días en el periodo (ingreso posterior o cese anterior) no se cobra nada
+        ('sin_dias', [('fuera_periodo', '==', 1)], {'valor': 0}),
+        # Con fecha de cese se aplica importe * 9% sin importar el valor
+        ('cese', [('fecha_cese', 'presente')], {'valor': 'Importe Bruto', 'por': TASA_ESSALUD}),
+        ('subsidio', [('Días Subsidio', '>', 0)], {'valor': IMPORTE_MINIMO}),
+        # Quien no trabajó el periodo completo (ingreso o cese en el mes) tiene como
+        # piso la remuneración mínima proporcional a sus días efectivos
+        ('minimo_proporcional',
+         [('DIAS EFECTIVOS', '<', 'Dias_Mes'), ('Importe Bruto', '<', 'minima_proporcional'), ('Importe Bruto', '>', 0)],
+         {'valor': 'minima_proporcional', 'por': TASA_ESSALUD}),
+        ('parcial', [('DIAS EFECTIVOS', '<', 'Dias_Mes')], {'valor': 'Importe Bruto', 'por': TASA_ESSALUD}),
+        # Bajo la remuneración mínima se aplica 1130 * 9%
+        ('minimo', [('Importe Bruto', '<', REMUNERACION_MINIMA), ('Importe Bruto', '>', 0)], {'valor': IMPORTE_MINIMO}),
+        ('normal', None, {'valor': 'Importe Bruto', 'por': TASA_ESSALUD})
+    ],
+    'CALCULO DIAS PLAME': [
+        ('subsidio', [('Días Subsidio', '>', 0)], {'valor': 101.70, 'entre': 'Dias_Mes', 'por': 'DIAS PLAME', 'redondeo': 2}),
+        ('sin_subsidio', None, {'valor': 0})
+    ]
+}
+
+# Variantes de las reglas: {'salida.rama': fórmula que reemplaza a la de REGLAS_ESSALUD}.
+# 'tambo' (streamlit_app) aplica 1130 * 9% a quien tiene subsidio; 'corregida'
+# (calculadora_essalud) no le calcula importe
+VARIANTES_REGLAS = {
+    'tambo': {},
+    'corregida': {'Importe_Calculado.subsidio': {'valor': 0}}
+}
+VARIANTE_PREDETERMINADA = 'tambo'
+
+# Archivo JSON opcional con más variantes ({nombre: {'salida.rama': fórmula}}), para
+# cambiar las fórmulas sin editar el código
+ARCHIVO_VARIANTES_REGLAS = os.environ.get('ARCHIVO_VARIANTES_REGLAS')
+if ARCHIVO_VARIANTES_REGLAS:
+    with open(ARCHIVO_VARIANTES_REGLAS, encoding='utf-8') as archivo:
+        VARIANTES_REGLAS.update(json.load(archivo))
+
+# Rama de Importe_Calculado que aplica a cada fila, en el orden en que se evalúan
+RAMAS_IMPORTE = [rama for rama, _, _ in REGLAS_ESSALUD['Importe_Calculado']]
+
+# Columna que resulta mayor en IMPORTE ESSALUD FINAL (ante un empate gana la primera);
+# las filas sin días en el periodo quedan con 0 y origen 'sin_dias'
+ORIGEN_SIN_DIAS = 'sin_dias'
+ORIGENES_IMPORTE_FINAL = {
+    'calculado': 'Importe_Calculado',
+    'dias_plame': 'CALCULO DIAS PLAME',
+    'ejb': 'Importe ESSALUD EJB'
+}
+
+
+def auxiliares_reglas(df):
+    """
+    Operandos de REGLAS_ESSALUD que no son columnas: la remuneración mínima
+    proporcional a los días efectivos y las filas fuera del periodo prorrateado
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minima = REMUNERACION_MINIMA * pd.to_numeric(df['DIAS EFECTIVOS'], errors='coerce').to_numpy() \
+            / pd.to_numeric(df['Dias_Mes'], errors='coerce').to_numpy()
+    return {'minima_proporcional': minima, 'fuera_periodo': _fuera_periodo(df)}
+
+
+@lru_cache(maxsize=None)
+def plan_reglas(variante=VARIANTE_PREDETERMINADA):
+    """Plan compilado de la variante (se compila una sola vez por proceso)"""
+    return compilar_tablas(aplicar_cambios(REGLAS_ESSALUD, VARIANTES_REGLAS[variante]))
+
+
+def _fuera_periodo(df):
+    """
+    Filas sin días en el periodo con que se prorrateó (df.attrs['periodo_prorrateo']).
+    No basta con DIAS EFECTIVOS == 0: sin periodo conocido queda Dias_Mes, que puede ser 0.
+    """
+    return fuera_del_periodo(df, df.attrs.get('periodo_prorrateo'))
+
+
+def procesar_archivo_essalud(df_input, variante='tambo', periodo=None):
+    """
+    Procesa el archivo de entrada aplicando todas las fórmulas de ESSALUD.
+    `periodo` (AAAAMM) fija el mes para prorratear los días por ingreso y cese;
+    sin él se usa la columna Periodo de la planilla, si la trae.
+    Devuelve (DataFrame, None) o (None, mensaje de error).
+    """
+    if variante not in VARIANTES_REGLAS:
+        return None, f"Variante de reglas desconocida: {variante}"
+    if periodo is not None and np.isnat(mes_periodo(periodo)):
+        return None, f"Periodo no válido: {periodo} (usa AAAAMM)"
+
+    try:
+        # Crear una copia del DataFrame para no modificar el original
+        df = df_input.copy()
+
+        # Convertir las fechas de ingreso y cese a datetime (textos DD/MM/YYYY, fechas
+        # nativas o números de serie de Excel); el conteo por camino queda en df.attrs
+        lectura_fechas = {}
+        for columna in ('fecha_ingreso', 'fecha_cese'):
+            df[columna], lectura_fechas[columna] = normalizar_fechas(df[columna])
+            logger.debug(f"Lectura de {columna}: {lectura_fechas[columna]}")
+        df.attrs['lectura_fechas'] = lectura_fechas
+
+        # Días efectivos del periodo según ingreso y cese (Dias_Mes si trabajó el mes completo)
+        df['DIAS EFECTIVOS'], prorrateo = prorratear(df, periodo)
+        logger.debug(f"Prorrateo de días: {prorrateo}")
+        df.attrs['prorrateo'] = prorrateo
+        df.attrs['periodo_prorrateo'] = periodo
+
+        # Calcular la columna DIAS PLAME (Días efectivos - Días subsidio); el subsidio no
+        # puede pasar de los días efectivos (p. ej. quien ingresó a mitad del mes)
+        df['DIAS PLAME'] = (df['DIAS EFECTIVOS'] - df['Días Subsidio']).clip(lower=0)
+
+        # Importe_Calculado y CALCULO DIAS PLAME con las reglas de la variante; las
+        # filas que tomó cada rama quedan en df.attrs
+        ramas_reglas = aplicar_plan(plan_reglas(variante), df, auxiliares_reglas(df))
+        logger.debug(f"Ramas de las reglas ({variante}): {ramas_reglas}")
+        df.attrs['variante_reglas'] = variante
+        df.attrs['ramas_reglas'] = ramas_reglas
+
+        # Comparar las columnas y registrar el valor mayor en IMPORTE ESSALUD FINAL
+        # Asegurar que las columnas existan antes de aplicar max
+        columnas_comparar = [col for col in ['Importe_Calculado', 'CALCULO DIAS PLAME', 'Importe ESSALUD EJB'] if col in df.columns]
+
+        if columnas_comparar:
+            df['IMPORTE ESSALUD FINAL'] = df[columnas_comparar].max(axis=1)
+        else:
+            df['IMPORTE ESSALUD FINAL'] = 0
+
+        # Quien no tiene días en el periodo no aporta, aunque la planilla traiga un importe EJB
+        df['IMPORTE ESSALUD FINAL'] = df['IMPORTE ESSALUD FINAL'].mask(_fuera_periodo(df), 0)
+
+        return df, None
+
+    except Exception as e:
+        return None, f"Error al procesar el archivo: {str(e)}"
+
+
+def procesar_archivo_essalud_cacheado(df_input, huella_archivo, variante='tambo', periodo=None):
+    """
+    procesar_archivo_essalud con el resultado guardado en cache_libros, por
+    huella del archivo subido, variante, periodo y código de las reglas (si las reglas
+    cambian, los resultados guardados dejan de usarse).
+    """
+    clave = clave_cache('essalud', huella_archivo, variante, VARIANTES_REGLAS.get(variante), periodo,
+                        huella_codigo(sys.modules[__name__], normalizador_fechas, motor_reglas, prorrateo_essalud))
+    df = cargar_frame(clave)
+    if df is not None:
+        return df, None
+
+    df, error = procesar_archivo_essalud(df_input, variante, periodo)
+    if df is not None:
+        guardar_frame(clave, df)
+    return df, error
+
+
+def rama_importe(df):
+    """Rama de Importe_Calculado que corresponde a cada fila de un DataFrame ya procesado (Categorical)"""
+    return elegir_ramas(plan_reglas(), 'Importe_Calculado', df, auxiliares_reglas(df))
+
+
+def origen_importe_final(df):
+    """Columna que definió IMPORTE ESSALUD FINAL en cada fila (Categorical con las claves de ORIGENES_IMPORTE_FINAL)"""
+    valores = np.column_stack([
+        pd.to_numeric(df[columna], errors='coerce').to_numpy(dtype='float64') if columna in df.columns else np.full(len(df), np.nan)
+        for columna in ORIGENES_IMPORTE_FINAL.values()
+    ])
+    posiciones = np.argmax(np.where(np.isnan(valores), -np.inf, valores), axis=1)
+    claves = list(ORIGENES_IMPORTE_FINAL) + [ORIGEN_SIN_DIAS]
+    if {'fecha_ingreso', 'fecha_cese'} <= set(df.columns):
+        posiciones = np.where(_fuera_periodo(df), len(claves) - 1, posiciones)
+    return pd.Categorical.from_codes(posiciones, categories=claves)
@@ -0,0 +1,171 @@
+"""
+Resultados de boletas y certificados servidos por páginas.
+
+Con miles de empleados, mandar el resultado completo en una sola página produce
+HTML de varios megabytes. Aquí cada conjunto de resultados queda en el servidor
+con un índice de prefijos sobre el nombre y el DNI de cada fila, y las vistas
+piden una página (filtrada o no) de tamaño fijo: la respuesta y el render
+cuestan lo mismo con 50 empleados que con 20 000.
+"""
+import os
+import re
+import uuid
+import bisect
+import threading
+import unicodedata
+from collections import OrderedDict
+from cifrado_pdf import contraseña_empleado
+from metricas import registrar_almacen, registrar_expulsion
+
+RESULTADOS_POR_PAGINA = int(os.environ.get('RESULTADOS_POR_PAGINA', 50))
+MAX_RESULTADOS_POR_PAGINA = 500
+
+# Conjuntos de resultados que se mantienen para paginar (los más antiguos se descartan)
+MAX_CONJUNTOS_RESULTADOS = int(os.environ.get('MAX_CONJUNTOS_RESULTADOS', 100))
+
+# Campos de las filas que se muestran en la página pero no salen en la respuesta JSON
+CAMPOS_PRIVADOS = ('contraseña',)
+
+# Campos que equivalen a la contraseña de los PDFs (el DNI): en JSON salen enmascarados,
+# con solo sus últimos DIGITOS_VISIBLES_DNI caracteres
+CAMPOS_ENMASCARADOS = ('dni',)
+DIGITOS_VISIBLES_DNI = 2
+
+_conjuntos = OrderedDict()
+_lock = threading.Lock()
+
+
+def terminos_busqueda(texto):
+    """Palabras en minúsculas y sin tildes: 'Pérez Núñez, Ana' -> ['perez', 'nunez', 'ana']"""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.findall(r'[a-z0-9]+', texto)
+
+
+def crear_indice(filas):
+    """
+    Índice de las filas [(clave, info)]: términos ordenados (para buscar por
+    prefijo con bisect) y {término: posiciones}. Se indexan la clave, el nombre
+    y el DNI, con y sin los ceros iniciales que Excel suele perder.
+    """
+    posiciones = {}
+    for posicion, (clave, info) in enumerate(filas):
+        dni = contraseña_empleado(info.get('dni')) or ''
+        for termino in set(terminos_busqueda(f"{clave} {info.get('nombre') or ''} {dni} {dni.lstrip('0')}")):
+            posiciones.setdefault(termino, []).append(posicion)
+    return sorted(posiciones), posiciones
+
+
+def buscar(indice, consulta):
+    """Posiciones (en orden) de las filas en las que cada término de la consulta es prefijo de alguna palabra"""
+    terminos, posiciones = indice
+    encontradas = None
+    for termino in terminos_busqueda(consulta):
+        coincidencias = set()
+        indice = bisect.bisect_left(terminos, termino)
+        while indice < len(terminos) and terminos[indice].startswith(termino):
+            coincidencias.update(posiciones[terminos[indice]])
+            indice += 1
+        encontradas = coincidencias if encontradas is None else encontradas & coincidencias
+        if not encontradas:
+            return []
+    return sorted(encontradas)
+
+
+def registrar_conjunto(resultado, clave):
+    """
+    Guarda para paginar el diccionario resultado[clave] ({nombre: info}) y
+    devuelve el ID del conjunto. El ID queda en el resultado, así que un
+    resultado reutilizado vuelve a usar el mismo conjunto mientras exista.
+    """
+    with _lock:
+        conjunto_id = resultado.get('conjunto_id')
+        if conjunto_id in _conjuntos:
+            _conjuntos.move_to_end(conjunto_id)
+            return conjunto_id
+
+        conjunto_id = conjunto_id or str(uuid.uuid4())
+        resultado['conjunto_id'] = conjunto_id
+        _conjuntos[conjunto_id] = {
+            'resultado': resultado,
+            'clave': clave,
+            'filas': list(resultado[clave].items()),
+            'indice': None
+        }
+        while len(_conjuntos) > MAX_CONJUNTOS_RESULTADOS:
+            _conjuntos.popitem(last=False)
+            registrar_expulsion('conjuntos_resultados')
+    return conjunto_id
+
+
+def obtener_conjunto(conjunto_id):
+    with _lock:
+        conjunto = _conjuntos.get(conjunto_id)
+        if conjunto is not None:
+            _conjuntos.move_to_end(conjunto_id)
+        return conjunto
+
+
+def paginar(conjunto, consulta='', pagina=1, por_pagina=None):
+    """
+    Página `pagina` (desde 1) del conjunto, filtrado por `consulta` si se indica.
+    Devuelve {'filas': {nombre: info} de la página, 'total', 'coincidencias',
+    'pagina', 'paginas', 'por_pagina', 'consulta'}.
+    """
+    por_pagina = min(max(por_pagina or RESULTADOS_POR_PAGINA, 1), MAX_RESULTADOS_POR_PAGINA)
+    filas = conjunto['filas']
+    consulta = (consulta or '').strip()
+
+    if consulta:
+        # El índice se arma con la primera búsqueda; una carrera solo lo construye dos veces
+        if conjunto['indice'] is None:
+            conjunto['indice'] = crear_indice(filas)
+        posiciones = buscar(conjunto['indice'], consulta)
+    else:
+        posiciones = range(len(filas))
+
+    coincidencias = len(posiciones)
+    paginas = max((coincidencias + por_pagina - 1) // por_pagina, 1)
+    pagina = min(max(pagina, 1), paginas)
+    inicio = (pagina - 1) * por_pagina
+
+    return {
+        'filas': dict(filas[posicion] for posicion in posiciones[inicio:inicio + por_pagina]),
+        'total': len(filas),
+        'coincidencias': coincidencias,
+        'pagina': pagina,
+        'paginas': paginas,
+        'por_pagina': por_pagina,
+        'consulta': consulta
+    }
+
+
+def enmascarar(valor):
+    """'01234567' -> '******67'; los valores vacíos quedan como están"""
+    texto = contraseña_empleado(valor)
+    if texto is None:
+        return valor
+    visibles = texto[-DIGITOS_VISIBLES_DNI:] if len(texto) > DIGITOS_VISIBLES_DNI else ''
+    return '*' * (len(texto) - len(visibles)) + visibles
+
+
+def pagina_publica(pagina):
+    """
+    Página de paginar() para responderla como JSON: sin los CAMPOS_PRIVADOS de
+    cada fila y con los CAMPOS_ENMASCARADOS enmascarados
+    """
+    filas = {
+        nombre: {
+            campo: enmascarar(valor) if campo in CAMPOS_ENMASCARADOS else valor
+            for campo, valor in info.items() if campo not in CAMPOS_PRIVADOS
+        }
+        for nombre, info in pagina['filas'].items()
+    }
+    return dict(pagina, filas=filas)
+
+
+def medir_conjuntos():
+    with _lock:
+        return {'conjuntos_resultados': (len(_conjuntos), 0)}
+
+
+registrar_almacen(medir_conjuntos)
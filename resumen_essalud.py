@@ -0,0 +1,97 @@
+"""
+Cubo de resumen de los resultados de ESSALUD.
+
+Una sola agrupación sobre las filas procesadas produce un cubo pequeño por
+sede, área (centro de costo), periodo, rama de la regla aplicada y columna que
+definió el importe final. Las métricas, gráficos y tablas dinámicas se sacan
+del cubo (unas decenas o cientos de filas) en lugar de volver a recorrer la planilla.
+"""
+import pandas as pd
+from reglas_essalud import rama_importe, origen_importe_final
+
+# Dimensión -> nombres con los que suele venir la columna en las planillas
+DIMENSIONES = {
+    'sede': ('Sede', 'SEDE', 'sede', 'Sucursal'),
+    'area': ('Centro de Costo', 'Centro de costo', 'CENTRO DE COSTO', 'Área', 'Area', 'AREA'),
+    'periodo': ('Periodo', 'PERIODO', 'periodo')
+}
+
+SIN_DATO = '(sin dato)'
+
+# Medidas del cubo: sumas por grupo (empleados, con_cese y con_subsidio son conteos de filas)
+MEDIDAS = ['empleados', 'importe_bruto', 'importe_calculado', 'calculo_dias_plame', 'importe_ejb',
+           'essalud_final', 'dias_plame', 'dias_subsidio', 'con_cese', 'con_subsidio']
+
+
+def columnas_dimension(df):
+    """{dimensión: columna} para las dimensiones presentes en el DataFrame"""
+    encontradas = {}
+    for dimension, candidatas in DIMENSIONES.items():
+        columna = next((col for col in candidatas if col in df.columns), None)
+        if columna is not None:
+            encontradas[dimension] = columna
+    return encontradas
+
+
+def _numerica(df, columna):
+    return pd.to_numeric(df[columna], errors='coerce') if columna in df.columns else pd.Series(0.0, index=df.index)
+
+
+def construir_cubo(df):
+    """
+    Agrupa el DataFrame procesado (salida de procesar_archivo_essalud) por las
+    dimensiones disponibles y devuelve el cubo con una fila por combinación.
+    """
+    claves = {}
+    for dimension, columna in columnas_dimension(df).items():
+        claves[dimension] = df[columna].astype('string').fillna(SIN_DATO).astype('category')
+    claves['rama'] = pd.Series(rama_importe(df), index=df.index)
+    claves['origen_final'] = pd.Series(origen_importe_final(df), index=df.index)
+
+    dias_subsidio = _numerica(df, 'Días Subsidio')
+    filas = pd.DataFrame({
+        **claves,
+        'empleados': 1,
+        'importe_bruto': _numerica(df, 'Importe Bruto'),
+        'importe_calculado': _numerica(df, 'Importe_Calculado'),
+        'calculo_dias_plame': _numerica(df, 'CALCULO DIAS PLAME'),
+        'importe_ejb': _numerica(df, 'Importe ESSALUD EJB'),
+        'essalud_final': _numerica(df, 'IMPORTE ESSALUD FINAL'),
+        'dias_plame': _numerica(df, 'DIAS PLAME'),
+        'dias_subsidio': dias_subsidio,
+        'con_cese': df['fecha_cese'].notna().astype('int64'),
+        'con_subsidio': (dias_subsidio > 0).astype('int64')
+    })
+    return filas.groupby(list(claves), observed=True, sort=True)[MEDIDAS].sum().reset_index()
+
+
+def dimensiones_cubo(cubo):
+    """Dimensiones por las que se puede agrupar el cubo"""
+    return [col for col in cubo.columns if col not in MEDIDAS]
+
+
+def totales(cubo):
+    """Totales de la planilla completa, con los promedios derivados de las sumas"""
+    suma = cubo[MEDIDAS].sum()
+    empleados = suma['empleados'] or 1
+    return {
+        **suma.to_dict(),
+        'promedio_importe_bruto': suma['importe_bruto'] / empleados,
+        'promedio_dias_subsidio': suma['dias_subsidio'] / empleados,
+        'promedio_essalud_final': suma['essalud_final'] / empleados,
+        'promedio_dias_plame': suma['dias_plame'] / empleados
+    }
+
+
+def resumir(cubo, dimensiones, medidas=None):
+    """Agrega el cubo por las dimensiones indicadas (tabla para métricas, gráficos o exportación)"""
+    medidas = medidas or MEDIDAS
+    if not dimensiones:
+        return cubo[medidas].sum().to_frame().T
+    return cubo.groupby(list(dimensiones), observed=True, sort=True)[medidas].sum().reset_index()
+
+
+def tabla_dinamica(cubo, filas, columnas, medida='essalud_final'):
+    """Tabla dinámica de una medida: `filas` y `columnas` son dimensiones del cubo"""
+    return cubo.pivot_table(index=filas, columns=columnas, values=medida, aggfunc='sum',
+                            fill_value=0, observed=True, margins=True, margins_name='Total')
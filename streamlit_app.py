@@ -2,6 +2,14 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from lector_excel import leer_excel
+from reglas_essalud import procesar_archivo_essalud_cacheado, COLUMNAS_REQUERIDAS
+from cache_libros import huella_origen
+from normalizador_fechas import resumen_lectura
+from motor_reglas import resumen_ramas
+from prorrateo_essalud import resumen_prorrateo
+from exportar_plame import exportar_plame_zip, columna_documento, validar_ruc_periodo
+from resumen_essalud import construir_cubo, dimensiones_cubo, totales, resumir, tabla_dinamica
 import base64
 
 # Configuración de la página
@@ -29,68 +37,26 @@ Esta aplicación procesa archivos Excel para calcular los importes de ESSALUD se
 - Exportación de resultados en Excel
 """)
 
-def calcular_importe(row):
-    """
-    Función para calcular el importe según las condiciones específicas
-    """
-    if pd.notna(row['fecha_cese']):  # Si hay fecha de cese
-        return row['Importe Bruto'] * 0.09  # Aplica importe * 9% sin importar el valor
-    elif row['Días Subsidio'] > 0:
-        return 1130 * 0.09  # Si el importe es menor a 1130, aplica la fórmula 1130 * 9%
-    elif row['Importe Bruto'] < 1130 and row['Importe Bruto'] > 0:
-        return 1130 * 0.09  # Si el importe es menor a 1130, aplica la fórmula 1130 * 9%
-    else:
-        return row['Importe Bruto'] * 0.09  # Si el importe es mayor o igual a 1130, aplica importe * 9%
+# Variante de las reglas que aplica esta aplicación
+VARIANTE_APP = 'tambo'
 
-def calcular_calculo_dias_plame(row):
-    """
-    Función para calcular CALCULO DIAS PLAME
-    """
-    if row['Días Subsidio'] > 0:
-        return round((101.70 / row['Dias_Mes']) * row['DIAS PLAME'], 2)
-    else:
-        return 0
+# Nombres para mostrar de las dimensiones y medidas del cubo de resumen
+NOMBRES_DIMENSION = {
+    'sede': 'Sede',
+    'area': 'Centro de costo',
+    'periodo': 'Periodo',
+    'rama': 'Rama de la regla',
+    'origen_final': 'Origen del importe final'
+}
 
-def procesar_archivo_essalud(df_input):
-    """
-    Procesa el archivo de entrada aplicando todas las fórmulas de ESSALUD
-    """
-    try:
-        # Crear una copia del DataFrame para no modificar el original
-        df = df_input.copy()
-        
-        # Convertir las fechas de ingreso y cese a formato datetime
-        df['fecha_ingreso'] = pd.to_datetime(df['fecha_ingreso'], format='%d/%m/%Y', errors='coerce')
-        df['fecha_cese'] = pd.to_datetime(df['fecha_cese'], format='%d/%m/%Y', errors='coerce')
-        
-        # Calcular la columna DIAS PLAME (Días del mes - Días subsidio)
-        df['DIAS PLAME'] = df['Dias_Mes'] - df['Días Subsidio']
-        
-        # Agregar la nueva columna 'Importe_Calculado' con la fórmula
-        df['Importe_Calculado'] = df.apply(calcular_importe, axis=1)
-        
-        # Calcular CALCULO DIAS PLAME para cada fila
-        df['CALCULO DIAS PLAME'] = df.apply(calcular_calculo_dias_plame, axis=1)
-        
-        # Comparar las columnas y registrar el valor mayor en IMPORTE ESSALUD FINAL
-        # Asegurar que las columnas existan antes de aplicar max
-        columnas_comparar = []
-        if 'Importe_Calculado' in df.columns:
-            columnas_comparar.append('Importe_Calculado')
-        if 'CALCULO DIAS PLAME' in df.columns:
-            columnas_comparar.append('CALCULO DIAS PLAME')
-        if 'Importe ESSALUD EJB' in df.columns:
-            columnas_comparar.append('Importe ESSALUD EJB')
-        
-        if columnas_comparar:
-            df['IMPORTE ESSALUD FINAL'] = df[columnas_comparar].max(axis=1)
-        else:
-            df['IMPORTE ESSALUD FINAL'] = 0
-        
-        return df, None
-        
-    except Exception as e:
-        return None, f"Error al procesar el archivo: {str(e)}"
+NOMBRES_MEDIDA = {
+    'essalud_final': 'ESSALUD Final (S/)',
+    'importe_bruto': 'Importe Bruto (S/)',
+    'empleados': 'Empleados',
+    'con_subsidio': 'Empleados con subsidio',
+    'con_cese': 'Empleados con cese',
+    'dias_plame': 'Días PLAME'
+}
 
 def crear_excel_descarga(df):
     """
@@ -118,11 +84,12 @@ with st.sidebar:
     ### Formato requerido del Excel:
     
     **Columnas necesarias:**
-    - `fecha_ingreso` (formato: DD/MM/YYYY)
-    - `fecha_cese` (formato: DD/MM/YYYY, puede estar vacío)
+    - `fecha_ingreso` (DD/MM/YYYY o fecha de Excel)
+    - `fecha_cese` (DD/MM/YYYY o fecha de Excel, puede estar vacío)
     - `Importe Bruto` (número)
     - `Días Subsidio` (número)
-    - `Dias_Mes` (número)
+    - `Dias_Mes` (número, días del mes completo)
+    - `Periodo` (AAAAMM o MM/AAAA, opcional: prorratea por ingreso y cese)
     - `Importe ESSALUD EJB` (número)
     
     ### Proceso:
@@ -135,6 +102,13 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 🔧 Configuración")
     mostrar_calculos = st.checkbox("Mostrar detalles de cálculos", value=False)
+    st.markdown("### 📄 Exportación PLAME")
+    ruc_empleador = st.text_input("RUC del empleador", max_chars=11)
+    periodo_plame = st.text_input("Periodo (AAAAMM)", value=datetime.now().strftime("%Y%m"), max_chars=6)
+    prorratear_periodo = st.checkbox(
+        "Prorratear días por ingreso y cese en este periodo", value=False,
+        help="Sin marcar, se prorratea solo si el Excel trae una columna Periodo"
+    )
 
 # Área principal de la aplicación
 col1, col2 = st.columns([2, 1])
@@ -158,7 +132,7 @@ with col2:
 if archivo_subido is not None:
     try:
         # Leer el archivo Excel
-        df_original = pd.read_excel(archivo_subido)
+        df_original = leer_excel(archivo_subido)
         
         st.header("📊 Vista Previa de Datos")
         
@@ -176,7 +150,7 @@ if archivo_subido is not None:
         st.dataframe(df_original.head(), use_container_width=True)
         
         # Verificar columnas requeridas
-        columnas_requeridas = ['fecha_ingreso', 'fecha_cese', 'Importe Bruto', 'Días Subsidio', 'Dias_Mes', 'Importe ESSALUD EJB']
+        columnas_requeridas = COLUMNAS_REQUERIDAS
         columnas_faltantes = [col for col in columnas_requeridas if col not in df_original.columns]
         
         if columnas_faltantes:
@@ -185,97 +159,190 @@ if archivo_subido is not None:
         else:
             st.success("✅ Todas las columnas requeridas están presentes")
             
+            # El resultado guardado en la sesión vale para este contenido y estas opciones:
+            # otro archivo con el mismo nombre y tamaño, u otro periodo, no lo reutiliza
+            periodo_calculo = periodo_plame if prorratear_periodo else None
+            clave_resultado = (huella_origen(archivo_subido), VARIANTE_APP, periodo_calculo)
+            
             # Botón para procesar
             if st.button("🚀 Procesar Cálculos de ESSALUD", type="primary"):
                 with st.spinner("Procesando cálculos..."):
-                    df_procesado, error = procesar_archivo_essalud(df_original)
+                    df_procesado, error = procesar_archivo_essalud_cacheado(
+                        df_original, clave_resultado[0], variante=VARIANTE_APP, periodo=periodo_calculo
+                    )
                     
                     if error:
+                        st.session_state.pop('resultado_essalud', None)
                         st.error(f"❌ Error durante el procesamiento: {error}")
                     elif df_procesado is not None:
-                        st.success("✅ ¡Procesamiento completado exitosamente!")
-                        
-                        # Mostrar resultados
-                        st.header("📈 Resultados del Procesamiento")
-                        
-                        # Métricas de resultados - verificar que las columnas existan
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            if 'IMPORTE ESSALUD FINAL' in df_procesado.columns:
-                                total_importe_final = df_procesado['IMPORTE ESSALUD FINAL'].sum()
-                                st.metric("Total ESSALUD Final", f"S/ {total_importe_final:,.2f}")
-                            else:
-                                st.metric("Total ESSALUD Final", "No disponible")
-                        with col2:
-                            if 'Días Subsidio' in df_procesado.columns:
-                                empleados_con_subsidio = (df_procesado['Días Subsidio'] > 0).sum()
-                                st.metric("Empleados con Subsidio", empleados_con_subsidio)
-                            else:
-                                st.metric("Empleados con Subsidio", "No disponible")
-                        with col3:
-                            if 'fecha_cese' in df_procesado.columns:
-                                empleados_con_cese = df_procesado['fecha_cese'].notna().sum()
-                                st.metric("Empleados con Cese", empleados_con_cese)
-                            else:
-                                st.metric("Empleados con Cese", "No disponible")
-                        with col4:
-                            if 'DIAS PLAME' in df_procesado.columns:
-                                promedio_dias_plame = df_procesado['DIAS PLAME'].mean()
-                                st.metric("Promedio Días PLAME", f"{promedio_dias_plame:.1f}")
-                            else:
-                                st.metric("Promedio Días PLAME", "No disponible")
-                        
-                        # Mostrar tabla de resultados
-                        st.subheader("Tabla de Resultados Completa:")
-                        st.dataframe(df_procesado, use_container_width=True)
-                        
-                        # Mostrar detalles de cálculos si está habilitado
-                        if mostrar_calculos:
-                            st.subheader("🔍 Detalles de Cálculos")
-                            
-                            # Crear tabs para diferentes vistas
-                            tab1, tab2, tab3 = st.tabs(["Análisis por Subsidio", "Análisis por Cese", "Resumen General"])
-                            
-                            with tab1:
-                                empleados_subsidio = df_procesado[df_procesado['Días Subsidio'] > 0]
-                                if len(empleados_subsidio) > 0:
-                                    st.write("**Empleados con días de subsidio:**")
-                                    st.dataframe(empleados_subsidio[['fecha_ingreso', 'Días Subsidio', 'DIAS PLAME', 'CALCULO DIAS PLAME']], use_container_width=True)
-                                else:
-                                    st.info("No hay empleados con días de subsidio")
-                            
-                            with tab2:
-                                empleados_cese = df_procesado[df_procesado['fecha_cese'].notna()]
-                                if len(empleados_cese) > 0:
-                                    st.write("**Empleados con fecha de cese:**")
-                                    st.dataframe(empleados_cese[['fecha_ingreso', 'fecha_cese', 'Importe Bruto', 'Importe_Calculado']], use_container_width=True)
-                                else:
-                                    st.info("No hay empleados con fecha de cese")
-                            
-                            with tab3:
-                                st.write("**Estadísticas generales:**")
-                                stats_df = pd.DataFrame({
-                                    'Métrica': ['Importe Bruto Promedio', 'Días Subsidio Promedio', 'ESSALUD Final Promedio'],
-                                    'Valor': [
-                                        f"S/ {df_procesado['Importe Bruto'].mean():.2f}",
-                                        f"{df_procesado['Días Subsidio'].mean():.1f}",
-                                        f"S/ {df_procesado['IMPORTE ESSALUD FINAL'].mean():.2f}"
-                                    ]
-                                })
-                                st.dataframe(stats_df, use_container_width=True)
-                        
-                        # Generar enlace de descarga
-                        st.header("💾 Descargar Resultados")
-                        
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        nombre_archivo = f"essalud_procesado_{timestamp}.xlsx"
-                        
-                        st.markdown(
-                            get_table_download_link(df_procesado, nombre_archivo),
-                            unsafe_allow_html=True
+                        # El resultado, su cubo de resumen y las vistas de detalle se calculan
+                        # una sola vez; los reruns (pestañas, selectores) los reutilizan
+                        st.session_state['resultado_essalud'] = {
+                            'clave': clave_resultado,
+                            'df': df_procesado,
+                            'cubo': construir_cubo(df_procesado),
+                            'subsidio': df_procesado.loc[df_procesado['Días Subsidio'] > 0, ['fecha_ingreso', 'Días Subsidio', 'DIAS PLAME', 'CALCULO DIAS PLAME']],
+                            'cese': df_procesado.loc[df_procesado['fecha_cese'].notna(), ['fecha_ingreso', 'fecha_cese', 'DIAS EFECTIVOS', 'Importe Bruto', 'Importe_Calculado']],
+                            'descargas': {}
+                        }
+            
+            resultado = st.session_state.get('resultado_essalud')
+            if resultado is not None and resultado['clave'] == clave_resultado:
+                df_procesado = resultado['df']
+                cubo = resultado['cubo']
+                total = totales(cubo)
+                
+                st.success("✅ ¡Procesamiento completado exitosamente!")
+                
+                # Mostrar resultados
+                st.header("📈 Resultados del Procesamiento")
+                
+                # Métricas de resultados (a partir del cubo, sin recorrer las filas)
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Total ESSALUD Final", f"S/ {total['essalud_final']:,.2f}")
+                with col2:
+                    st.metric("Empleados con Subsidio", int(total['con_subsidio']))
+                with col3:
+                    st.metric("Empleados con Cese", int(total['con_cese']))
+                with col4:
+                    st.metric("Promedio Días PLAME", f"{total['promedio_dias_plame']:.1f}")
+                
+                # Fechas que no se pudieron interpretar y caminos por los que se leyó cada una
+                lectura_fechas = df_procesado.attrs.get('lectura_fechas')
+                if lectura_fechas:
+                    fechas_invalidas = sum(conteo['invalido'] for conteo in lectura_fechas.values())
+                    if fechas_invalidas:
+                        st.warning(f"⚠️ {fechas_invalidas} fechas no se pudieron interpretar y quedaron vacías")
+                    with st.expander("🗓️ Lectura de fechas"):
+                        st.dataframe(resumen_lectura(lectura_fechas), use_container_width=True)
+                
+                # Filas cuyo mes se prorrateó por ingreso o cese (y las que quedaron sin días)
+                prorrateo = df_procesado.attrs.get('prorrateo')
+                if prorrateo and prorrateo['sin_periodo'] < len(df_procesado):
+                    if prorrateo['fuera']:
+                        st.warning(f"⚠️ {prorrateo['fuera']} empleados no tienen días en el periodo (ingreso posterior o cese anterior): su importe queda en 0")
+                    with st.expander("📅 Prorrateo de días por ingreso y cese"):
+                        st.dataframe(resumen_prorrateo(prorrateo), use_container_width=True)
+                
+                # Filas que tomó cada rama de las reglas en este cálculo
+                ramas_reglas = df_procesado.attrs.get('ramas_reglas')
+                if ramas_reglas:
+                    with st.expander(f"🧮 Ramas de las reglas (variante {df_procesado.attrs.get('variante_reglas')})"):
+                        st.dataframe(resumen_ramas(ramas_reglas), use_container_width=True)
+                
+                # Mostrar tabla de resultados
+                st.subheader("Tabla de Resultados Completa:")
+                st.dataframe(df_procesado, use_container_width=True)
+                
+                # Resúmenes por sede, área, periodo y rama de la regla
+                st.subheader("📊 Resúmenes")
+                dimensiones = dimensiones_cubo(cubo)
+                col1, col2 = st.columns(2)
+                with col1:
+                    dimension_grafico = st.selectbox("Agrupar por", dimensiones, format_func=NOMBRES_DIMENSION.get)
+                with col2:
+                    medida_grafico = st.selectbox("Medida", list(NOMBRES_MEDIDA), format_func=NOMBRES_MEDIDA.get)
+                resumen = resumir(cubo, [dimension_grafico]).set_index(dimension_grafico)
+                st.bar_chart(resumen[medida_grafico])
+                
+                with st.expander("Tabla dinámica"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        filas_pivote = st.multiselect("Filas", dimensiones, default=dimensiones[:1], format_func=NOMBRES_DIMENSION.get)
+                    with col2:
+                        columnas_pivote = st.multiselect("Columnas", [d for d in dimensiones if d not in filas_pivote],
+                                                         default=['rama'] if 'rama' not in filas_pivote else [], format_func=NOMBRES_DIMENSION.get)
+                    if filas_pivote and columnas_pivote:
+                        pivote = tabla_dinamica(cubo, filas_pivote, columnas_pivote, medida_grafico)
+                        st.dataframe(pivote, use_container_width=True)
+                        st.download_button(
+                            label="📥 Descargar tabla dinámica (CSV)",
+                            data=pivote.to_csv().encode('utf-8-sig'),
+                            file_name=f"resumen_essalud_{medida_grafico}.csv",
+                            mime="text/csv"
                         )
+                    else:
+                        st.info("Selecciona al menos una dimensión para filas y otra para columnas")
+                
+                # Mostrar detalles de cálculos si está habilitado
+                if mostrar_calculos:
+                    st.subheader("🔍 Detalles de Cálculos")
+                    
+                    # Crear tabs para diferentes vistas
+                    tab1, tab2, tab3 = st.tabs(["Análisis por Subsidio", "Análisis por Cese", "Resumen General"])
+                    
+                    with tab1:
+                        empleados_subsidio = resultado['subsidio']
+                        if len(empleados_subsidio) > 0:
+                            st.write("**Empleados con días de subsidio:**")
+                            st.dataframe(empleados_subsidio, use_container_width=True)
+                        else:
+                            st.info("No hay empleados con días de subsidio")
+                    
+                    with tab2:
+                        empleados_cese = resultado['cese']
+                        if len(empleados_cese) > 0:
+                            st.write("**Empleados con fecha de cese:**")
+                            st.dataframe(empleados_cese, use_container_width=True)
+                        else:
+                            st.info("No hay empleados con fecha de cese")
+                    
+                    with tab3:
+                        st.write("**Estadísticas generales:**")
+                        stats_df = pd.DataFrame({
+                            'Métrica': ['Importe Bruto Promedio', 'Días Subsidio Promedio', 'ESSALUD Final Promedio'],
+                            'Valor': [
+                                f"S/ {total['promedio_importe_bruto']:.2f}",
+                                f"{total['promedio_dias_subsidio']:.1f}",
+                                f"S/ {total['promedio_essalud_final']:.2f}"
+                            ]
+                        })
+                        st.dataframe(stats_df, use_container_width=True)
                         
-                        st.info("💡 El archivo descargado incluye todas las columnas originales más los nuevos cálculos de ESSALUD")
+                        st.write("**Empleados por rama de la regla:**")
+                        st.dataframe(resumir(cubo, ['rama', 'origen_final'], ['empleados', 'essalud_final']), use_container_width=True)
+                
+                # Generar enlace de descarga (el Excel se arma una sola vez por resultado)
+                st.header("💾 Descargar Resultados")
+                
+                if 'excel' not in resultado['descargas']:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    nombre_archivo = f"essalud_procesado_{timestamp}.xlsx"
+                    resultado['descargas']['excel'] = get_table_download_link(df_procesado, nombre_archivo)
+                
+                st.markdown(
+                    resultado['descargas']['excel'],
+                    unsafe_allow_html=True
+                )
+                
+                st.info("💡 El archivo descargado incluye todas las columnas originales más los nuevos cálculos de ESSALUD")
+                
+                # Exportación a PLAME (requiere la columna del DNI)
+                st.subheader("📄 Archivos para PLAME")
+                st.caption("El .rem declara el Importe Bruto como remuneración básica (concepto 0121), la base sobre la que "
+                           "PLAME calcula el aporte a ESSALUD; el IMPORTE ESSALUD FINAL de esta tabla no se exporta.")
+                error_plame = validar_ruc_periodo(ruc_empleador, periodo_plame)
+                if error_plame:
+                    st.warning(f"Para exportar a PLAME indica el RUC y el periodo en la barra lateral: {error_plame}")
+                elif columna_documento(df_procesado) is None:
+                    st.warning("No se encontró la columna del DNI, necesaria para los archivos de PLAME")
+                else:
+                    clave_plame = ('plame', ruc_empleador, periodo_plame)
+                    try:
+                        if clave_plame not in resultado['descargas']:
+                            archivo_plame = io.BytesIO()
+                            exportar_plame_zip(df_procesado, ruc_empleador, periodo_plame, archivo_plame)
+                            resultado['descargas'][clave_plame] = archivo_plame.getvalue()
+                    except ValueError as e:
+                        st.error(f"❌ No se pudieron generar los archivos de PLAME: {e}")
+                    else:
+                        st.download_button(
+                            label="📥 Descargar archivos PLAME (.jor, .snl, .rem)",
+                            data=resultado['descargas'][clave_plame],
+                            file_name=f"plame_{periodo_plame}_{ruc_empleador}.zip",
+                            mime="application/zip"
+                        )
     
     except Exception as e:
         st.error(f"❌ Error al leer el archivo: {str(e)}")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos de la aplicación están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Las pruebas no escriben en la caché de libros del usuario
+os.environ.setdefault('CACHE_LIBROS', '0')
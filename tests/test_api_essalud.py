@@ -0,0 +1,50 @@
+import io
+import json
+import pandas as pd
+import pytest
+from api_essalud import generar_respuesta, leer_bloques, MARCA_ERROR_CSV
+
+REGISTRO = {'fecha_ingreso': '01/01/2020', 'fecha_cese': None, 'Importe Bruto': 1200,
+            'Días Subsidio': 0, 'Dias_Mes': 30, 'Importe ESSALUD EJB': 108}
+# Con subsidio y Dias_Mes = 0 el cálculo falla
+REGISTRO_INVALIDO = dict(REGISTRO, **{'Días Subsidio': 3, 'Dias_Mes': 0})
+
+
+def responder(registros, formato, filas_por_bloque=2):
+    if formato == 'json':
+        cuerpo = json.dumps(registros)
+    elif formato == 'ndjson':
+        cuerpo = '\n'.join(json.dumps(registro) for registro in registros)
+    else:
+        cuerpo = pd.DataFrame(registros).to_csv(index=False)
+    bloques = leer_bloques(io.BytesIO(cuerpo.encode('utf-8')), formato, filas_por_bloque)
+    return ''.join(generar_respuesta(bloques, formato, solo_calculadas=True))
+
+
+def test_json_completo():
+    registros = json.loads(responder([REGISTRO] * 3, 'json'))
+    assert [registro['IMPORTE ESSALUD FINAL'] for registro in registros] == [108.0] * 3
+
+
+def test_error_en_el_primer_bloque_se_lanza_antes_de_responder():
+    with pytest.raises(ValueError, match='Dias_Mes = 0'):
+        responder([REGISTRO_INVALIDO, REGISTRO], 'ndjson')
+
+
+def test_error_en_un_bloque_posterior_json():
+    registros = json.loads(responder([REGISTRO] * 3 + [REGISTRO_INVALIDO], 'json'))
+    assert len(registros) == 3
+    assert registros[-1]['registro'] == 3
+    assert 'Dias_Mes = 0' in registros[-1]['error']
+
+
+def test_error_en_un_bloque_posterior_ndjson():
+    lineas = responder([REGISTRO] * 3 + [REGISTRO_INVALIDO], 'ndjson').splitlines()
+    assert json.loads(lineas[-1])['registro'] == 3
+    assert all('error' not in json.loads(linea) for linea in lineas[:-1])
+
+
+def test_error_en_un_bloque_posterior_csv():
+    lineas = responder([REGISTRO] * 3 + [REGISTRO_INVALIDO], 'csv').splitlines()
+    assert len(lineas) == 4
+    assert lineas[-1].startswith(f'{MARCA_ERROR_CSV} registro 3:')
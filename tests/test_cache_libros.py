@@ -0,0 +1,55 @@
+import datetime
+import os
+import pandas as pd
+import pytest
+import cache_libros
+from cache_libros import cargar_frame, clave_cache, guardar_frame, huella_origen, ruta_cache
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_libros, 'CACHE_LIBROS', 'auto')
+    monkeypatch.setattr(cache_libros, 'DIRECTORIO_CACHE_LIBROS', str(tmp_path / 'cache'))
+
+
+def test_ida_y_vuelta():
+    df = pd.DataFrame({
+        'DNI': ['00000001', '00000002'],
+        'Importe': [1130.5, 2000.0],
+        'Ingreso': pd.to_datetime(['2023-02-15', '2020-01-01']),
+        # Columna con tipos mezclados, como las fechas leídas de Excel
+        'Cese': [datetime.date(2023, 3, 1), '31/01/2023']
+    })
+    df.attrs['periodo'] = '202302'
+    clave = clave_cache(huella_origen(b'planilla'), 'Hoja')
+    assert guardar_frame(clave, df)
+
+    leido = cargar_frame(clave)
+    pd.testing.assert_frame_equal(leido, df)
+    assert leido['Cese'].map(type).tolist() == [datetime.date, str]
+    assert leido.attrs == {'periodo': '202302'}
+    assert os.stat(ruta_cache(clave)).st_mode & 0o777 == 0o600
+
+
+def test_clave_inexistente():
+    assert cargar_frame(clave_cache('otra')) is None
+
+
+def test_archivo_dañado_se_descarta():
+    clave = clave_cache('dañado')
+    assert guardar_frame(clave, pd.DataFrame({'a': [1]}))
+    with open(ruta_cache(clave), 'wb') as archivo:
+        archivo.write(b'no es arrow')
+    assert cargar_frame(clave) is None
+    assert not os.path.exists(ruta_cache(clave))
+
+
+def test_indice_no_guardable():
+    assert not guardar_frame(clave_cache('indice'), pd.DataFrame({'a': [1, 2]}, index=[5, 6]))
+
+
+def test_deshabilitada(monkeypatch):
+    monkeypatch.setattr(cache_libros, 'CACHE_LIBROS', '0')
+    assert not guardar_frame(clave_cache('x'), pd.DataFrame({'a': [1]}))
@@ -0,0 +1,53 @@
+import io
+import os
+import pytest
+from werkzeug.datastructures import FileStorage
+import cargas
+from cargas import abrir_carga, flujo_carga, guardar_carga, huella_cargas, leer_carga, liberar_carga
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(cargas, 'UMBRAL_CARGA_DISCO', 10)
+    monkeypatch.setattr(cargas, 'DIRECTORIO_CARGAS', str(tmp_path))
+    return tmp_path
+
+
+def subida(contenido, stream=None):
+    stream = stream or io.BytesIO()
+    stream.write(contenido)
+    stream.seek(0)
+    return FileStorage(stream, filename='planilla.xlsx')
+
+
+def test_carga_pequeña_en_memoria():
+    carga = guardar_carga(subida(b'corta'))
+    assert carga == b'corta'
+    assert abrir_carga(carga).read() == b'corta'
+    assert isinstance(flujo_carga(5), io.BytesIO)
+
+
+def test_carga_grande_en_disco(directorio):
+    carga = guardar_carga(subida(b'x' * 100))
+    assert os.path.dirname(carga) == str(directorio) and carga.endswith('.xlsx')
+    assert leer_carga(carga) == b'x' * 100
+    assert abrir_carga(carga) == carga
+    liberar_carga(carga)
+    assert not os.path.exists(carga)
+    liberar_carga(carga)
+
+
+def test_carga_recibida_en_disco_se_enlaza():
+    recibida = flujo_carga(100)
+    carga = guardar_carga(subida(b'y' * 100, recibida))
+    assert os.path.samefile(carga, recibida.name)
+    # Al cerrarse el archivo de la solicitud, la carga conservada sigue existiendo
+    recibida.close()
+    assert leer_carga(carga) == b'y' * 100
+
+
+def test_huella_cargas():
+    grande = guardar_carga(subida(b'z' * 100))
+    assert huella_cargas([b'z' * 100], {'hoja': 'A'}) == huella_cargas([grande], {'hoja': 'A'})
+    assert huella_cargas([b'ab', b'c'], {}) != huella_cargas([b'a', b'bc'], {})
+    assert huella_cargas([b'ab'], {'hoja': 'A'}) != huella_cargas([b'ab'], {'hoja': 'B'})
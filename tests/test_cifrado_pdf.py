@@ -0,0 +1,44 @@
+import io
+import pytest
+from reportlab.pdfgen import canvas
+from pypdf import PdfReader
+from cifrado_pdf import contraseña_empleado, cifrar_pdf, sin_contraseña, validar_contraseñas
+
+
+def pdf_simple():
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer)
+    lienzo.drawString(72, 720, 'Boleta 12345678')
+    lienzo.save()
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('dni, contraseña', [
+    (12345678.0, '12345678'),
+    (1234567, '01234567'),
+    (' 87654321 ', '87654321'),
+    (None, None),
+    (float('nan'), None),
+    ('', None),
+])
+def test_contraseña_empleado(dni, contraseña):
+    assert contraseña_empleado(dni) == contraseña
+
+
+def test_cifrar_pdf_con_aes_256():
+    lector = PdfReader(io.BytesIO(cifrar_pdf(pdf_simple(), '01234567')))
+    assert lector.is_encrypted
+    cifrado = lector.trailer['/Encrypt'].get_object()
+    assert (cifrado['/V'], cifrado['/CF']['/StdCF']['/CFM']) == (5, '/AESV3')
+    assert not lector.decrypt('otra')
+    assert lector.decrypt('01234567')
+    assert '12345678' in lector.pages[0].extract_text()
+
+
+def test_documento_sin_dni_rechaza_la_carga():
+    nombres = ['Ana', 'Luis', 'Rosa']
+    contraseñas = [contraseña_empleado(dni) for dni in (12345678, float('nan'), '')]
+    assert sin_contraseña(nombres, contraseñas) == ['Luis', 'Rosa']
+    with pytest.raises(ValueError, match='falta el DNI de: Luis, Rosa'):
+        validar_contraseñas(nombres, contraseñas, 'las boletas')
+    validar_contraseñas(nombres[:1], contraseñas[:1])
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+import cola_trabajos
+from cola_trabajos import (
+    encolar, registrar_resultado, obtener_trabajo, obtener_resultado, reservar_servidor,
+    ESTADO_COMPLETADO, ESTADO_ERROR
+)
+
+
+@pytest.fixture(autouse=True)
+def base_de_datos(tmp_path, monkeypatch):
+    monkeypatch.setattr(cola_trabajos, 'RUTA_BD_TRABAJOS', str(tmp_path / 'trabajos.db'))
+    cola_trabajos._inicializar()
+
+
+def esperar(trabajo_id):
+    for _ in range(200):
+        trabajo = obtener_trabajo(trabajo_id)
+        if trabajo['estado'] in (ESTADO_COMPLETADO, ESTADO_ERROR):
+            return trabajo
+        time.sleep(0.01)
+    raise AssertionError(f"El trabajo {trabajo_id} no terminó")
+
+
+def sumar(a, b, progreso):
+    progreso(1, 2)
+    progreso(2, 2)
+    return a + b
+
+
+def fallar(progreso):
+    raise ValueError('planilla sin datos')
+
+
+def test_trabajo_completado():
+    trabajo_id = encolar('prueba', sumar, 2, b=3)
+    trabajo = esperar(trabajo_id)
+    assert trabajo['estado'] == ESTADO_COMPLETADO
+    assert trabajo['progreso'] == 100.0
+    assert obtener_resultado(trabajo_id) == 5
+
+
+def test_trabajo_con_error():
+    trabajo = esperar(encolar('prueba', fallar))
+    assert trabajo['estado'] == ESTADO_ERROR
+    assert trabajo['mensaje'] == 'planilla sin datos'
+    assert obtener_resultado(trabajo['id']) is None
+
+
+def test_registrar_resultado():
+    trabajo_id = registrar_resultado('prueba', {'a': 1})
+    assert obtener_trabajo(trabajo_id)['estado'] == ESTADO_COMPLETADO
+    assert obtener_resultado(trabajo_id) == {'a': 1}
+    assert obtener_trabajo('no-existe') is None
+
+
+def reservar_como(pid):
+    with cola_trabajos._conexion() as conexion:
+        conexion.execute("INSERT OR REPLACE INTO servidor (id, pid) VALUES (1, ?)", (pid,))
+
+
+def test_reservar_servidor():
+    assert reservar_servidor()
+    assert reservar_servidor()
+    # Otro proceso activo ya atiende
+    reservar_como(os.getppid())
+    assert not reservar_servidor()
+    # El proceso que atendía terminó
+    terminado = subprocess.Popen([sys.executable, '-c', 'pass'])
+    terminado.wait()
+    reservar_como(terminado.pid)
+    assert reservar_servidor()
@@ -0,0 +1,59 @@
+import importlib.util
+import io
+import os
+import pytest
+
+# La aplicación importa los módulos de cálculo y de PDFs que no están en este repositorio
+for _modulo in ('calculadora', 'horarios_flexibles', 'boletas_pago', 'certificados_utilidades', 'pdf_protector'):
+    pytest.importorskip(_modulo)
+
+RUTA_APLICACION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app (1).py')
+
+PDF = b'%PDF-1.4 ' + bytes(range(256)) * 4
+
+
+@pytest.fixture(scope='module')
+def aplicacion():
+    spec = importlib.util.spec_from_file_location('aplicacion_pruebas', RUTA_APLICACION)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    aplicacion.guardar_pdf('pdf-prueba', io.BytesIO(PDF))
+    return aplicacion.crear_app('desarrollo').test_client()
+
+
+def test_descarga_completa(cliente):
+    respuesta = cliente.get('/descargar-pdf/pdf-prueba/Señal')
+    assert respuesta.status_code == 200
+    assert respuesta.data == PDF
+    assert respuesta.headers['Accept-Ranges'] == 'bytes'
+    assert "filename*=UTF-8''Se%C3%B1al.pdf" in respuesta.headers['Content-Disposition']
+    assert respuesta.get_etag()[0]
+
+
+def test_etag_sin_cambios(cliente):
+    etag = cliente.get('/descargar-pdf/pdf-prueba/a.pdf').get_etag()[0]
+    respuesta = cliente.get('/descargar-pdf/pdf-prueba/a.pdf', headers={'If-None-Match': f'"{etag}"'})
+    assert respuesta.status_code == 304
+    assert respuesta.data == b''
+
+
+def test_rango(cliente):
+    respuesta = cliente.get('/descargar-pdf/pdf-prueba/a.pdf', headers={'Range': 'bytes=100-199'})
+    assert respuesta.status_code == 206
+    assert respuesta.data == PDF[100:200]
+    assert respuesta.headers['Content-Range'] == f'bytes 100-199/{len(PDF)}'
+
+
+def test_rango_fuera_del_archivo(cliente):
+    respuesta = cliente.get('/descargar-pdf/pdf-prueba/a.pdf', headers={'Range': f'bytes={len(PDF) + 10}-'})
+    assert respuesta.status_code == 416
+
+
+def test_archivo_expirado(cliente):
+    respuesta = cliente.get('/descargar-pdf/no-existe/a.pdf')
+    assert respuesta.status_code == 302
@@ -0,0 +1,91 @@
+import io
+import zipfile
+import pandas as pd
+import pytest
+from exportar_plame import exportar_plame_zip, generar_plame, nombre_archivo_plame, validar_ruc_periodo
+
+RUC = '20123456789'
+PERIODO = '202401'
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'DNI': [1234567, '87654321', None, 'AB1234'],
+        'DIAS PLAME': [30, 25, 30, 28.5],
+        'Días Subsidio': [0, 5, 0, 0],
+        'Importe Bruto': [1200, 1500.456, 900, 1000]
+    })
+
+
+def texto(df, extension, **opciones):
+    return ''.join(generar_plame(df, extension, **opciones))
+
+
+def test_jor(df):
+    assert texto(df, 'jor') == (
+        '01|01234567|240|0|0|0|\r\n'
+        '01|87654321|200|0|0|0|\r\n'
+        '01|AB1234|228|0|0|0|\r\n'
+    )
+
+
+def test_snl_solo_con_subsidio(df):
+    assert texto(df, 'snl') == '01|87654321|21|5|\r\n'
+
+
+def test_rem(df):
+    assert texto(df, 'rem').splitlines()[1] == '01|87654321|0121|1500.46|1500.46|'
+
+
+def test_bloques_no_cambian_el_resultado(df):
+    for extension in ('jor', 'snl', 'rem'):
+        assert texto(df, extension, filas_por_bloque=1) == texto(df, extension)
+
+
+def test_tipo_de_documento_desde_la_planilla(df):
+    df['Tipo Documento'] = [1, 'DNI', None, 'CE']
+    lineas = texto(df, 'jor').splitlines()
+    assert [linea.split('|')[0] for linea in lineas] == ['01', '01', '04']
+    df['Tipo Documento'] = ['07', 'Pasaporte', None, 4.0]
+    lineas = texto(df, 'jor').splitlines()
+    assert [linea.split('|')[0] for linea in lineas] == ['07', '07', '04']
+    # Solo los DNI se completan a 8 dígitos
+    assert lineas[0].split('|')[1] == '1234567'
+
+
+def test_tipo_de_documento_desconocido(df):
+    df['Tipo Documento'] = ['XX', None, None, None]
+    with pytest.raises(ValueError, match='Tipo de documento desconocido'):
+        texto(df, 'jor')
+
+
+def test_sin_columna_de_documento(df):
+    with pytest.raises(ValueError, match='columna del DNI'):
+        texto(df.drop(columns='DNI'), 'jor')
+
+
+def test_zip(df):
+    destino = io.BytesIO()
+    resumen = exportar_plame_zip(df, RUC, PERIODO, destino)
+    nombres = [nombre_archivo_plame(RUC, PERIODO, extension) for extension in ('jor', 'snl', 'rem')]
+    assert resumen == dict(zip(nombres, [3, 1, 3]))
+    with zipfile.ZipFile(destino) as zf:
+        assert zf.namelist() == nombres
+        assert zf.read(nombres[0]).decode('latin-1') == texto(df, 'jor')
+
+
+def test_caracter_fuera_de_latin1(df):
+    df.loc[3, 'DNI'] = 'AB€1'
+    with pytest.raises(ValueError, match=r'\.jor, línea 3'):
+        exportar_plame_zip(df, RUC, PERIODO, io.BytesIO())
+
+
+@pytest.mark.parametrize('ruc, periodo, valido', [
+    (RUC, PERIODO, True),
+    ('2012345678', PERIODO, False),
+    (RUC, '202413', False),
+    (None, PERIODO, False),
+])
+def test_validar_ruc_periodo(ruc, periodo, valido):
+    assert (validar_ruc_periodo(ruc, periodo) is None) == valido
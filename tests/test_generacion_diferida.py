@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from generacion_diferida import crear_artefacto_diferido, es_artefacto_diferido, obtener_contenido, precargar
+
+
+def contador():
+    llamadas = []
+    evento = threading.Event()
+
+    def generar():
+        evento.wait(1)
+        llamadas.append(1)
+        return b'%PDF contenido'
+    return generar, llamadas, evento
+
+
+def test_se_genera_una_sola_vez_con_descargas_simultaneas():
+    generar, llamadas, evento = contador()
+    artefacto = crear_artefacto_diferido(generar, 'boleta.pdf', tipo='boleta')
+    assert es_artefacto_diferido(artefacto) and artefacto['contenido'] is None
+
+    with ThreadPoolExecutor(4) as ejecutor:
+        futuros = [ejecutor.submit(obtener_contenido, artefacto) for _ in range(4)]
+        evento.set()
+        assert {futuro.result() for futuro in futuros} == {b'%PDF contenido'}
+
+    assert len(llamadas) == 1
+    # La función (y los datos de origen que retiene) se libera al generar
+    assert artefacto['generar'] is None
+    assert obtener_contenido(artefacto) == b'%PDF contenido'
+
+
+def test_precarga_respeta_el_limite():
+    artefactos = []
+    for _ in range(3):
+        generar, _, evento = contador()
+        evento.set()
+        artefactos.append(crear_artefacto_diferido(generar, 'certificado.pdf'))
+    precargar(artefactos, limite=2)
+    obtener_contenido(artefactos[0])
+    obtener_contenido(artefactos[1])
+    assert artefactos[2]['contenido'] is None
+
+
+def test_error_de_precarga_no_se_propaga():
+    def fallar():
+        raise ValueError('sin datos')
+    artefacto = crear_artefacto_diferido(fallar, 'certificado.pdf')
+    precargar([artefacto], limite=1)
+    assert artefacto['contenido'] is None
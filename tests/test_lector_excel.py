@@ -0,0 +1,30 @@
+import io
+import pandas as pd
+from lector_excel import leer_excel, motor_excel
+
+
+def libro():
+    contenido = io.BytesIO()
+    with pd.ExcelWriter(contenido, engine='openpyxl') as writer:
+        pd.DataFrame({'Nombre': ['Ana', 'Luis'], 'DNI': [1234567, 87654321], 'Importe': [1130.0, 2500.5]}) \
+            .to_excel(writer, index=False, sheet_name='Empleados')
+        pd.DataFrame({'Otra': [1]}).to_excel(writer, index=False, sheet_name='Resumen')
+    return contenido.getvalue()
+
+
+def test_lee_la_hoja_pedida():
+    df = leer_excel(io.BytesIO(libro()), hoja='Empleados')
+    assert list(df.columns) == ['Nombre', 'DNI', 'Importe']
+    assert df['Importe'].tolist() == [1130.0, 2500.5]
+    assert motor_excel() in ('calamine', 'openpyxl')
+
+
+def test_proyeccion_por_nombres_ignora_las_faltantes():
+    df = leer_excel(io.BytesIO(libro()), hoja='Empleados', columnas=['Importe', 'No existe'])
+    assert list(df.columns) == ['Importe']
+
+
+def test_proyeccion_por_funcion():
+    df = leer_excel(io.BytesIO(libro()), hoja='Empleados', columnas=lambda columna: 'dni' in str(columna).lower())
+    assert list(df.columns) == ['DNI']
+    assert df['DNI'].tolist() == [1234567, 87654321]
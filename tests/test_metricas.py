@@ -0,0 +1,42 @@
+from metricas import (
+    Histograma, Contador, BUCKETS_BYTES, BUCKETS_LATENCIA, LATENCIA_ETAPAS,
+    medir_etapa, registrar_almacen, exponer_metricas
+)
+
+
+def test_histograma_acumula_por_bucket():
+    histograma = Histograma('prueba_segundos', 'Prueba', 'ruta', BUCKETS_LATENCIA)
+    for valor in (0.003, 0.2, 0.2, 500):
+        histograma.observar('index', valor)
+    lineas = histograma.exponer()
+    assert 'prueba_segundos_bucket{ruta="index",le="0.005"} 1' in lineas
+    assert 'prueba_segundos_bucket{ruta="index",le="0.25"} 3' in lineas
+    assert 'prueba_segundos_bucket{ruta="index",le="120"} 3' in lineas
+    assert 'prueba_segundos_bucket{ruta="index",le="+Inf"} 4' in lineas
+    assert 'prueba_segundos_count{ruta="index"} 4' in lineas
+
+
+def test_buckets_de_bytes_como_enteros():
+    histograma = Histograma('prueba_bytes', 'Prueba', 'ruta', BUCKETS_BYTES)
+    histograma.observar('api', 70 * 2 ** 20)
+    lineas = histograma.exponer()
+    assert 'prueba_bytes_bucket{ruta="api",le="67108864"} 0' in lineas
+    assert 'prueba_bytes_bucket{ruta="api",le="268435456"} 1' in lineas
+    assert not any('e+' in linea for linea in lineas)
+
+
+def test_contador():
+    contador = Contador('prueba_total', 'Prueba', 'almacen')
+    contador.incrementar('pdf')
+    contador.incrementar('pdf', 2)
+    assert 'prueba_total{almacen="pdf"} 3' in contador.exponer()
+
+
+def test_etapas_y_almacenes_en_la_exposicion():
+    with medir_etapa('prueba_etapa'):
+        pass
+    registrar_almacen(lambda: {'prueba_almacen': (2, 512)})
+    texto = exponer_metricas()
+    assert LATENCIA_ETAPAS.nombre + '_count{etapa="prueba_etapa"} 1' in texto
+    assert 'essalud_artefactos{almacen="prueba_almacen"} 2' in texto
+    assert 'essalud_artefactos_bytes{almacen="prueba_almacen"} 512' in texto
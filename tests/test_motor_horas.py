@@ -0,0 +1,33 @@
+import datetime
+import pandas as pd
+from motor_horas import calcular_horas_df
+
+
+def marcaciones(**columnas):
+    filas = {
+        'Hora Inicio': ['08:00', '22:00', datetime.time(9, 30), None],
+        'Hora Fin': ['17:00', '06:00', '18:00', '17:00'],
+        'Hora Refrigerio Inicio': ['13:00', '02:00', None, '13:00'],
+        'Hora Refrigerio Fin': ['14:00', '02:30', None, '14:00']
+    }
+    filas.update(columnas)
+    return pd.DataFrame(filas)
+
+
+def test_horas_trabajadas():
+    df, mensaje = calcular_horas_df(marcaciones())
+    assert df['Horas Trabajadas'].iloc[:3].tolist() == [8.0, 7.5, 8.5]
+    assert df['Turno Nocturno'].tolist()[:3] == [False, True, False]
+    assert df['Horas Refrigerio'].iloc[:3].tolist() == [1.0, 0.5, 0.0]
+    assert '1 sin hora de inicio o fin válida' in mensaje
+
+
+def test_columnas_faltantes():
+    df, mensaje = calcular_horas_df(marcaciones().drop(columns='Hora Refrigerio Fin'))
+    assert df is None
+    assert 'Hora Refrigerio Fin' in mensaje
+
+
+def test_flexible_sin_refrigerio():
+    df, _ = calcular_horas_df(marcaciones().drop(columns=['Hora Refrigerio Inicio', 'Hora Refrigerio Fin']), flexible=True)
+    assert df['Horas Trabajadas'].iloc[:3].tolist() == [9.0, 8.0, 8.5]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from motor_reglas import compilar_tablas, aplicar_cambios, aplicar_plan, elegir_ramas, resumen_ramas
+
+TABLAS = {
+    'Resultado': [
+        ('vacio', [('Texto', 'presente'), ('Monto', '<=', 0)], {'valor': 0}),
+        ('grande', [('Monto', '>=', 'Limite')], {'valor': 'Monto', 'entre': 'Partes', 'redondeo': 2}),
+        ('resto', None, {'valor': 'Monto', 'por': 0.5})
+    ]
+}
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'Texto': ['a', None, 'b', 'c'],
+        'Monto': [0, 10, 100, 'x'],
+        'Limite': [50, 50, 50, 50],
+        'Partes': [3, 3, 3, 3]
+    })
+
+
+def test_primera_rama_que_se_cumple(df):
+    conteo = aplicar_plan(compilar_tablas(TABLAS), df)
+    assert conteo == {'Resultado': {'vacio': 1, 'grande': 1, 'resto': 2}}
+    assert df['Resultado'].iloc[:3].tolist() == [0, 5.0, round(100 / 3, 2)]
+    # Lo que no es número queda vacío
+    assert np.isnan(df['Resultado'].iloc[3])
+
+
+def test_elegir_ramas(df):
+    ramas = elegir_ramas(compilar_tablas(TABLAS), 'Resultado', df)
+    assert list(ramas) == ['vacio', 'resto', 'grande', 'resto']
+
+
+def test_auxiliares(df):
+    tablas = {'Resultado': [('aux', [('Monto', '>', 'tope')], {'valor': 'tope'}), ('resto', None, {'valor': 1})]}
+    aplicar_plan(compilar_tablas(tablas), df, {'tope': np.array([5, 5, 5, 5])})
+    assert df['Resultado'].tolist() == [1, 5, 5, 1]
+
+
+def test_tablas_encadenadas(df):
+    tablas = {
+        'Primero': [('doble', None, {'valor': 'Limite', 'por': 2})],
+        'Segundo': [('usa_primero', [('Primero', '==', 100)], {'valor': 1}), ('resto', None, {'valor': 0})]
+    }
+    aplicar_plan(compilar_tablas(tablas), df)
+    assert df['Segundo'].tolist() == [1, 1, 1, 1]
+
+
+def test_division_por_cero(df):
+    df['Partes'] = 0
+    with pytest.raises(ZeroDivisionError, match='Partes = 0'):
+        aplicar_plan(compilar_tablas(TABLAS), df)
+
+
+def test_aplicar_cambios():
+    tablas = aplicar_cambios(TABLAS, {'Resultado.grande': {'valor': 7}})
+    assert tablas['Resultado'][1] == ('grande', [('Monto', '>=', 'Limite')], {'valor': 7})
+    assert TABLAS['Resultado'][1][2] == {'valor': 'Monto', 'entre': 'Partes', 'redondeo': 2}
+    with pytest.raises(ValueError, match='Rama desconocida'):
+        aplicar_cambios(TABLAS, {'Resultado.otra': {'valor': 0}})
+
+
+@pytest.mark.parametrize('tablas', [
+    {'Resultado': [('unica', [('Monto', '>', 0)], {'valor': 1})]},
+    {'Resultado': [('mala', [('Monto', '~', 0)], {'valor': 1}), ('resto', None, {'valor': 0})]},
+    {'Resultado': [('resto', None, {'valor': 1, 'otra': 2})]},
+])
+def test_tablas_no_validas(tablas):
+    with pytest.raises(ValueError):
+        compilar_tablas(tablas)
+
+
+def test_redondeo_como_round_de_python():
+    df = pd.DataFrame({'Monto': [2.675, 0.125, 1.005]})
+    aplicar_plan(compilar_tablas({'R': [('r', None, {'valor': 'Monto', 'redondeo': 2})]}), df)
+    assert df['R'].tolist() == [round(2.675, 2), round(0.125, 2), round(1.005, 2)]
+
+
+def test_resumen_ramas():
+    resumen = resumen_ramas({'Resultado': {'a': 2, 'b': 0}})
+    assert resumen.loc[('Resultado', 'a'), 'filas'] == 2
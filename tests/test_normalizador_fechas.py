@@ -0,0 +1,24 @@
+import datetime
+import pandas as pd
+from normalizador_fechas import normalizar_fechas
+
+
+def test_tipos_mezclados():
+    valores = pd.Series(['15/02/2023', datetime.date(2023, 3, 1), 45123, None, 'basura', '2023-04-05', '15/02/2023'],
+                        dtype='object')
+    fechas, conteo = normalizar_fechas(valores)
+    assert fechas.tolist()[:3] == [pd.Timestamp('2023-02-15'), pd.Timestamp('2023-03-01'), pd.Timestamp('2023-07-16')]
+    assert pd.isna(fechas.iloc[3]) and pd.isna(fechas.iloc[4])
+    assert fechas.iloc[5] == pd.Timestamp('2023-04-05')
+    assert conteo == {'vacio': 1, 'fecha': 1, 'serial_excel': 1, 'texto': 2, 'iso': 1, 'invalido': 1}
+
+
+def test_hora_se_descarta():
+    fechas, _ = normalizar_fechas(pd.Series([pd.Timestamp('2023-02-15 13:45')]))
+    assert fechas.iloc[0] == pd.Timestamp('2023-02-15')
+
+
+def test_serial_fuera_de_rango_es_invalido():
+    fechas, conteo = normalizar_fechas(pd.Series([0, 99999999], dtype='object'))
+    assert fechas.isna().all()
+    assert conteo['invalido'] == 2
@@ -0,0 +1,44 @@
+import pytest
+
+boletas_pago = pytest.importorskip('boletas_pago')
+
+from preparacion_boletas import preparar_boletas, registros, resumenes, COLUMNAS_RESUMEN
+
+
+@pytest.fixture
+def empleados():
+    return {
+        'Ana Pérez': {
+            'datos_personales': {'dni': '00000001', 'periodo': '03/2024', 'neto_pagar': '1500.50',
+                                 'total_remuneracion': 1800, 'total_descuentos': 299.5, 'total_aportes': 162},
+            'ingresos': [{'concepto': 'Básico', 'monto': 1800}], 'descuentos': [], 'aportes': []
+        },
+        'Luis Soto': {
+            # Sin totales: salen de los montos de cada sección
+            'datos_personales': {'dni': 12345678, 'periodo': '03/2024', 'neto_pagar': 'S/ 900'},
+            'ingresos': [{'concepto': 'Básico', 'monto': 1000}, {'concepto': 'Bono', 'monto': '50'}],
+            'descuentos': [{'concepto': 'AFP', 'monto': 150}], 'aportes': [{'concepto': 'EsSalud', 'monto': 'x'}]
+        }
+    }
+
+
+def test_preparar_boletas(empleados):
+    tabla = preparar_boletas(empleados)
+    assert tabla['nombre'].tolist() == ['Ana Pérez', 'Luis Soto']
+    assert tabla['dni'].tolist() == ['00000001', 12345678]
+    assert tabla['periodo_archivo'].tolist() == ['03_2024', '03_2024']
+    # Lo que no es número queda en 0
+    assert tabla['neto_pagar'].tolist() == [1500.5, 0.0]
+    assert tabla['neto_pagar_letras'].tolist() == [boletas_pago.numero_a_letras(1500.5), boletas_pago.numero_a_letras(0.0)]
+    assert tabla['total_remuneracion'].tolist() == [1800, 1050]
+    assert tabla['total_descuentos'].tolist() == [299.5, 150]
+    assert tabla['total_aportes'].tolist() == [162, 0]
+    assert tabla['fecha_pago'].tolist() == ['31/03/2024', '31/03/2024']
+
+
+def test_resumenes(empleados):
+    tabla = preparar_boletas(empleados)
+    resumen = resumenes(tabla)[1]
+    assert list(resumen) == COLUMNAS_RESUMEN
+    assert resumen['total_remuneracion'] == 1050
+    assert registros(tabla, ['nombre']) == [{'nombre': 'Ana Pérez'}, {'nombre': 'Luis Soto'}]
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from prorrateo_essalud import mes_periodo, prorratear
+
+
+def planilla(ingreso, cese, dias_mes=30):
+    return pd.DataFrame({
+        'fecha_ingreso': pd.to_datetime([ingreso], dayfirst=True),
+        'fecha_cese': pd.to_datetime([cese], dayfirst=True),
+        'Dias_Mes': [dias_mes]
+    })
+
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('202302', '2023-02'),
+    (202302, '2023-02'),
+    ('2023-2', '2023-02'),
+    ('02/2023', '2023-02'),
+    ('15/02/2023', '2023-02'),
+    (pd.Timestamp('2023-02-15'), '2023-02'),
+])
+def test_mes_periodo(valor, esperado):
+    assert mes_periodo(valor) == np.datetime64(esperado, 'M')
+
+
+@pytest.mark.parametrize('valor', ['202313', 'febrero', None, ''])
+def test_mes_periodo_no_reconocido(valor):
+    assert np.isnat(mes_periodo(valor))
+
+
+@pytest.mark.parametrize('ingreso, cese, periodo, dias, caso', [
+    ('01/01/2020', None, '202302', 30, 'completo'),
+    # Se descuentan de Dias_Mes los días de calendario no trabajados
+    ('01/01/2020', '27/02/2023', '202302', 29, 'cese'),
+    ('02/02/2023', None, '202302', 29, 'ingreso'),
+    ('20/06/2023', None, '202306', 11, 'ingreso'),
+    ('10/01/2023', '20/01/2023', '202301', 10, 'ingreso_y_cese'),
+    ('01/01/2020', '30/03/2023', '202303', 29, 'cese'),
+    # Sin días en el periodo
+    ('01/01/2020', '31/01/2023', '202302', 0, 'fuera'),
+    ('01/03/2023', None, '202302', 0, 'fuera'),
+    ('01/01/2020', '27/02/2023', None, 30, 'sin_periodo'),
+])
+def test_prorratear(ingreso, cese, periodo, dias, caso):
+    efectivos, conteo = prorratear(planilla(ingreso, cese), periodo)
+    assert efectivos.name == 'DIAS EFECTIVOS'
+    assert efectivos.iloc[0] == dias
+    assert conteo[caso] == 1
+
+
+def test_prorratear_descuenta_de_dias_mes_reducido():
+    efectivos, _ = prorratear(planilla('02/01/2023', None, dias_mes=20), '202301')
+    assert efectivos.iloc[0] == 19
+
+
+def test_prorratear_con_columna_periodo():
+    df = pd.concat([planilla('01/01/2020', '27/02/2023'), planilla('15/03/2023', None)], ignore_index=True)
+    df['Periodo'] = ['202302', '03/2023']
+    efectivos, conteo = prorratear(df)
+    assert efectivos.tolist() == [29, 16]
+    assert conteo['cese'] == 1 and conteo['ingreso'] == 1
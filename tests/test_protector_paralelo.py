@@ -0,0 +1,50 @@
+import io
+import zipfile
+import pytest
+from pypdf import PdfReader, PdfWriter
+from protector_paralelo import generar_zip, procesar_pdf_paralelo
+
+
+def pdf_en_blanco():
+    escritor = PdfWriter()
+    escritor.add_blank_page(width=200, height=200)
+    salida = io.BytesIO()
+    escritor.write(salida)
+    return salida.getvalue()
+
+
+def test_generar_zip_por_partes():
+    archivos = [('a.pdf', b'%PDF-a'), ('b.pdf', b'%PDF-b' * 1000)]
+    partes = list(generar_zip(iter(archivos)))
+    assert len(partes) > 1
+    with zipfile.ZipFile(io.BytesIO(b''.join(partes))) as zf:
+        assert zf.namelist() == ['a.pdf', 'b.pdf']
+        assert zf.read('b.pdf') == archivos[1][1]
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+
+
+def test_generar_zip_vacio():
+    with zipfile.ZipFile(io.BytesIO(b''.join(generar_zip([])))) as zf:
+        assert zf.namelist() == []
+
+
+def test_procesar_pdf_paralelo(tmp_path):
+    pytest.importorskip('pdf_protector')
+    en_disco = tmp_path / 'disco.pdf'
+    en_disco.write_bytes(pdf_en_blanco())
+    archivos = [('memoria.pdf', pdf_en_blanco()), ('dañado.pdf', b'no es un pdf'), ('disco.pdf', str(en_disco))]
+    avances = []
+
+    resultados = procesar_pdf_paralelo(archivos, contraseña_manual='1234',
+                                       progreso=lambda nombre, completados, total, exito: avances.append((nombre, exito)))
+
+    # Mismo orden en que se subieron
+    assert list(resultados) == ['memoria.pdf', 'dañado.pdf', 'disco.pdf']
+    assert sorted(avances) == [('dañado.pdf', False), ('disco.pdf', True), ('memoria.pdf', True)]
+    assert resultados['dañado.pdf'][0] is None
+    for nombre in ('memoria.pdf', 'disco.pdf'):
+        assert PdfReader(resultados[nombre][0]).is_encrypted
+
+
+def test_procesar_pdf_paralelo_sin_archivos():
+    assert procesar_pdf_paralelo([]) == {}
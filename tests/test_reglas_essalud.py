@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+from reglas_essalud import IMPORTE_MINIMO, procesar_archivo_essalud, origen_importe_final, rama_importe
+
+
+def planilla(**columnas):
+    filas = {
+        'fecha_ingreso': ['01/01/2020'],
+        'fecha_cese': [None],
+        'Importe Bruto': [1200],
+        'Días Subsidio': [0],
+        'Dias_Mes': [30],
+        'Importe ESSALUD EJB': [108.0]
+    }
+    filas.update({columna: [valor] for columna, valor in columnas.items()})
+    return pd.DataFrame(filas)
+
+
+def procesar(df, **opciones):
+    resultado, error = procesar_archivo_essalud(df, **opciones)
+    assert error is None
+    return resultado.iloc[0]
+
+
+@pytest.mark.parametrize('columnas, rama, importe', [
+    ({'fecha_cese': '15/05/2023'}, 'cese', 1200 * 0.09),
+    ({'Días Subsidio': 5}, 'subsidio', IMPORTE_MINIMO),
+    ({'Importe Bruto': 800}, 'minimo', IMPORTE_MINIMO),
+    ({'Importe Bruto': 1500}, 'normal', 1500 * 0.09),
+])
+def test_ramas_importe(columnas, rama, importe):
+    df, error = procesar_archivo_essalud(planilla(**columnas))
+    assert error is None
+    assert df['Importe_Calculado'].iloc[0] == pytest.approx(importe)
+    assert df.attrs['ramas_reglas']['Importe_Calculado'][rama] == 1
+    assert rama_importe(df)[0] == rama
+
+
+def test_variante_corregida_sin_importe_por_subsidio():
+    fila = procesar(planilla(**{'Días Subsidio': 5}), variante='corregida')
+    assert fila['Importe_Calculado'] == 0
+
+
+def test_calculo_dias_plame():
+    fila = procesar(planilla(**{'Días Subsidio': 5}))
+    assert fila['DIAS PLAME'] == 25
+    assert fila['CALCULO DIAS PLAME'] == round(101.70 / 30 * 25, 2)
+
+
+def test_dias_plame_no_es_negativo_con_subsidio_mayor_a_los_dias_efectivos():
+    fila = procesar(planilla(fecha_ingreso='20/06/2023', **{'Días Subsidio': 15}), periodo='202306')
+    assert fila['DIAS EFECTIVOS'] == 11
+    assert fila['DIAS PLAME'] == 0
+    assert fila['CALCULO DIAS PLAME'] == 0
+    assert fila['IMPORTE ESSALUD FINAL'] >= 0
+
+
+def test_fila_sin_dias_en_el_periodo_no_se_cobra():
+    df, error = procesar_archivo_essalud(planilla(fecha_cese='31/01/2023'), periodo='202302')
+    assert error is None
+    fila = df.iloc[0]
+    assert fila['DIAS EFECTIVOS'] == 0
+    assert fila['Importe_Calculado'] == 0
+    assert fila['IMPORTE ESSALUD FINAL'] == 0
+    assert df.attrs['prorrateo']['fuera'] == 1
+    assert df.attrs['ramas_reglas']['Importe_Calculado']['sin_dias'] == 1
+    assert origen_importe_final(df)[0] == 'sin_dias'
+
+
+def test_minimo_proporcional_para_mes_parcial():
+    fila = procesar(planilla(fecha_ingreso='16/06/2023', **{'Importe Bruto': 400}), periodo='202306')
+    assert fila['DIAS EFECTIVOS'] == 15
+    assert fila['Importe_Calculado'] == pytest.approx(1130 * 15 / 30 * 0.09)
+
+
+def test_importe_final_es_el_mayor():
+    fila = procesar(planilla(**{'Importe ESSALUD EJB': 500.0}))
+    assert fila['IMPORTE ESSALUD FINAL'] == 500.0
+
+
+def test_errores():
+    assert procesar_archivo_essalud(planilla(), variante='otra')[1].startswith('Variante de reglas desconocida')
+    assert procesar_archivo_essalud(planilla(), periodo='2023')[1].startswith('Periodo no válido')
+    _, error = procesar_archivo_essalud(planilla(Dias_Mes=0, **{'Días Subsidio': 2}))
+    assert 'Dias_Mes = 0' in error
+
+
+def test_sin_periodo_con_dias_mes_cero_se_calcula_como_antes():
+    # Sin periodo, DIAS EFECTIVOS queda en Dias_Mes (0) pero la fila no está fuera del periodo
+    df, error = procesar_archivo_essalud(planilla(Dias_Mes=0, **{'Importe Bruto': 2500, 'Importe ESSALUD EJB': 200.0}))
+    assert error is None
+    fila = df.iloc[0]
+    assert fila['DIAS EFECTIVOS'] == 0
+    assert fila['Importe_Calculado'] == pytest.approx(225)
+    assert fila['IMPORTE ESSALUD FINAL'] == pytest.approx(225)
+    assert rama_importe(df)[0] == 'normal'
+    assert origen_importe_final(df)[0] == 'calculado'
@@ -0,0 +1,48 @@
+import json
+from resultados_paginados import registrar_conjunto, obtener_conjunto, paginar, pagina_publica
+
+
+def conjunto(cantidad=120):
+    resultado = {'boletas': {
+        f'Empleado_{n}': {'nombre': f'Pérez Núñez {n}', 'dni': f'{n:08d}', 'contraseña': f'{n:08d}'}
+        for n in range(cantidad)
+    }}
+    return obtener_conjunto(registrar_conjunto(resultado, 'boletas')), resultado
+
+
+def test_paginas():
+    datos, _ = conjunto()
+    pagina = paginar(datos, pagina=3, por_pagina=50)
+    assert (pagina['total'], pagina['paginas'], pagina['pagina']) == (120, 3, 3)
+    assert len(pagina['filas']) == 20
+    # Una página fuera de rango devuelve la última
+    assert paginar(datos, pagina=99, por_pagina=50)['pagina'] == 3
+
+
+def test_busqueda_por_prefijo_sin_tildes_y_dni_sin_ceros():
+    datos, _ = conjunto()
+    assert list(paginar(datos, 'nunez 119')['filas']) == ['Empleado_119']
+    assert list(paginar(datos, '7')['filas'])[:1] == ['Empleado_7']
+    assert paginar(datos, 'gomez')['coincidencias'] == 0
+
+
+def test_mismo_resultado_reutiliza_el_conjunto():
+    _, resultado = conjunto(3)
+    assert registrar_conjunto(resultado, 'boletas') == resultado['conjunto_id']
+
+
+def test_pagina_publica_sin_contraseñas():
+    datos, _ = conjunto(3)
+    pagina = paginar(datos)
+    publica = pagina_publica(pagina)
+    assert all('contraseña' not in info for info in publica['filas'].values())
+    assert publica['filas']['Empleado_1']['dni'] == '******01'
+    # La página original (la que usa la vista HTML) no cambia
+    assert 'contraseña' in pagina['filas']['Empleado_1']
+
+
+def test_pagina_publica_no_serializa_ningun_equivalente_de_la_contraseña():
+    datos, resultado = conjunto(12)
+    serializada = json.dumps(pagina_publica(paginar(datos, por_pagina=500)), ensure_ascii=False)
+    for info in resultado['boletas'].values():
+        assert info['contraseña'] not in serializada
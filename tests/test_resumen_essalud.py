@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+from reglas_essalud import procesar_archivo_essalud
+from resumen_essalud import SIN_DATO, construir_cubo, dimensiones_cubo, resumir, tabla_dinamica, totales
+
+
+@pytest.fixture
+def procesado():
+    df, error = procesar_archivo_essalud(pd.DataFrame({
+        'Sede': ['Lima', 'Lima', 'Cusco', None],
+        'Centro de Costo': ['A', 'A', 'B', 'B'],
+        'fecha_ingreso': ['01/01/2020'] * 4,
+        'fecha_cese': [None, '15/05/2023', None, None],
+        'Importe Bruto': [1500, 1200, 800, 2000],
+        'Días Subsidio': [0, 0, 5, 0],
+        'Dias_Mes': [30, 30, 30, 30],
+        'Importe ESSALUD EJB': [135.0, 108.0, 72.0, 180.0]
+    }))
+    assert error is None
+    return df
+
+
+def test_cubo(procesado):
+    cubo = construir_cubo(procesado)
+    assert dimensiones_cubo(cubo) == ['sede', 'area', 'rama', 'origen_final']
+    assert cubo['empleados'].sum() == 4
+    assert set(cubo['sede'].astype(str)) == {'Lima', 'Cusco', SIN_DATO}
+    lima = resumir(cubo, ['sede']).set_index('sede').loc['Lima']
+    assert lima['empleados'] == 2 and lima['con_cese'] == 1
+    assert lima['importe_bruto'] == 2700
+
+
+def test_totales_coinciden_con_la_planilla(procesado):
+    total = totales(construir_cubo(procesado))
+    assert total['empleados'] == 4
+    assert total['con_subsidio'] == 1
+    assert total['essalud_final'] == pytest.approx(procesado['IMPORTE ESSALUD FINAL'].sum())
+    assert total['promedio_importe_bruto'] == pytest.approx(5500 / 4)
+
+
+def test_tabla_dinamica(procesado):
+    tabla = tabla_dinamica(construir_cubo(procesado), 'area', 'rama', medida='empleados')
+    assert tabla.loc['Total', 'Total'] == 4
+    assert tabla.loc['A', 'cese'] == 1
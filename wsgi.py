@@ -0,0 +1,26 @@
+"""
+Punto de entrada WSGI para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Los resultados, los PDFs generados y los trabajos en segundo plano viven en la
+memoria del proceso, así que la aplicación se atiende con un solo worker y
+varios hilos (gunicorn.conf.py no arranca con más de uno). Un segundo proceso
+que la cree mientras el primero siga activo falla al arrancar.
+La aplicación se crea y se calienta al arrancar, antes de la primera
+solicitud. ENTORNO=desarrollo desactiva el calentamiento y activa el modo debug. /metrics responde solo con
+TOKEN_METRICAS (Authorization: Bearer <token>) o con METRICAS_PUBLICAS=1.
+"""
+import os
+import sys
+import importlib.util
+
+_RUTA_APLICACION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app (1).py')
+
+# El nombre del archivo no es un nombre de módulo válido, así que se carga por ruta
+_spec = importlib.util.spec_from_file_location('aplicacion', _RUTA_APLICACION)
+aplicacion = importlib.util.module_from_spec(_spec)
+sys.modules['aplicacion'] = aplicacion
+_spec.loader.exec_module(aplicacion)
+
+app = aplicacion.crear_app(os.environ.get('ENTORNO', 'produccion'))